@@ -0,0 +1,118 @@
+"""
+Per-equipment alert deduplication.
+
+Every immediate upload alert is checked against the last alert sent for the
+same equipment at the same level. Within ``ALERT_COOLDOWN_MINUTES`` a repeat
+is suppressed and counted instead of emailed. States are kept per
+``(equipment, level)``: escalating from warning to critical always goes
+through, equipment listed at both levels is alerted once at each, and the
+critical state stays recorded for the whole window (hysteresis), so
+equipment that drops back to warning and returns to critical within the
+cooldown does not trigger a second critical alert. Names are resolved to
+``Equipment`` first, so spellings that differ in case or spacing share a
+state.
+
+States live in ``EquipmentAlertState`` and are mirrored in a process-local
+cache that is reloaded in one query every ``ALERT_STATE_CACHE_SECONDS``, so
+checking a batch of items costs no per-item queries. Changed states are
+written back with a single upsert and enter the cache once it commits.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .equipment import equipment_ids
+from .models import EquipmentAlertState
+
+
+_lock = threading.Lock()
+_cache = {}
+_loaded_at = None
+
+
+def _states():
+    """(equipment id, level) -> EquipmentAlertState, reloaded from the DB when the cache expires"""
+    global _cache, _loaded_at
+    if _loaded_at is None or time.monotonic() - _loaded_at > django_settings.ALERT_STATE_CACHE_SECONDS:
+        _cache = {(state.equipment_id, state.level): state for state in EquipmentAlertState.objects.all()}
+        _loaded_at = time.monotonic()
+    return _cache
+
+
+def _remember(states):
+    with _lock:
+        _cache.update(states)
+
+
+def clear_cache():
+    global _cache, _loaded_at
+    with _lock:
+        _cache = {}
+        _loaded_at = None
+
+
+def filter_repeats(level, equipment_names, now=None):
+    """
+    Split ``equipment_names`` alerting at ``level`` into those that should be
+    alerted now and those suppressed as repeats. Records the outcome.
+    Returns ``(fresh, suppressed)`` name lists with one name (the first
+    spelling given) per equipment.
+    """
+    now = now or timezone.now()
+    cooldown = timedelta(minutes=django_settings.ALERT_COOLDOWN_MINUTES)
+    names = {}
+    for name, equipment_id in zip(equipment_names, equipment_ids(equipment_names, [''] * len(equipment_names))):
+        names.setdefault(equipment_id, name)
+    fresh, suppressed, changed = [], [], {}
+
+    with _lock:
+        states = _states()
+        for equipment_id, name in names.items():
+            # Build new instances; the cached ones only change once this commits
+            state = states.get((equipment_id, level))
+            if state is None or now - state.last_alerted_at >= cooldown:
+                changed[(equipment_id, level)] = EquipmentAlertState(
+                    equipment_id=equipment_id, level=level, last_alerted_at=now, suppressed_count=0,
+                    total_suppressed=state.total_suppressed if state else 0,
+                )
+                fresh.append(name)
+            else:
+                changed[(equipment_id, level)] = EquipmentAlertState(
+                    equipment_id=equipment_id, level=level, last_alerted_at=state.last_alerted_at,
+                    suppressed_count=state.suppressed_count + 1, total_suppressed=state.total_suppressed + 1,
+                )
+                suppressed.append(name)
+
+    if changed:
+        # Upsert by (equipment, level); cached copies may be new or stale relative to other workers
+        EquipmentAlertState.objects.bulk_create(
+            list(changed.values()),
+            update_conflicts=True,
+            unique_fields=['equipment', 'level'],
+            update_fields=['last_alerted_at', 'suppressed_count', 'total_suppressed', 'updated_at'],
+        )
+        transaction.on_commit(lambda: _remember(changed))
+    return fresh, suppressed
+
+
+def suppression_summary(limit=50):
+    """Suppressed alert counts for the alert log API"""
+    states = EquipmentAlertState.objects.filter(total_suppressed__gt=0).select_related('equipment').order_by(
+        '-total_suppressed'
+    )
+    return {
+        'total_suppressed': EquipmentAlertState.objects.aggregate(total=Sum('total_suppressed'))['total'] or 0,
+        'cooldown_minutes': django_settings.ALERT_COOLDOWN_MINUTES,
+        'equipment': [{
+            'equipment_name': state.equipment.name,
+            'level': state.level,
+            'last_alerted_at': state.last_alerted_at.isoformat(),
+            'suppressed_since_last_alert': state.suppressed_count,
+            'total_suppressed': state.total_suppressed,
+        } for state in states[:limit]],
+    }
@@ -0,0 +1,204 @@
+"""
+Out-of-band alert dispatch.
+
+Requests never talk to the mail server: alerts are written to the
+``AlertOutbox`` table and a single background dispatcher thread sends them
+once the enqueuing transaction commits. Each batch of due alerts goes out
+over one SMTP connection, ``AlertLog`` rows are written in bulk, and failed
+sends are retried with exponential backoff until ``ALERT_MAX_ATTEMPTS``.
+The ``dispatch_alerts`` management command drains the outbox as well, e.g.
+after a restart.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .equipment import existing_ids
+from .models import AlertLog, AlertOutbox
+
+
+SUBJECTS = {
+    'critical': '🚨 CRITICAL: Equipment Alert',
+    'warning': '⚠️ WARNING: Equipment Alert',
+    'maintenance': '🔧 Maintenance Reminder'
+}
+
+
+def alert_subject(alert_type, equipment_name):
+    return f"{SUBJECTS.get(alert_type, 'Alert')} - {equipment_name}"
+
+
+def from_email():
+    return getattr(django_settings, 'DEFAULT_FROM_EMAIL', None) or 'noreply@chemviz.local'
+
+
+_dispatcher_lock = threading.Lock()
+_dispatcher = None
+_scheduled = False
+_retry_timer = None
+
+
+def _executor():
+    """Lazily create the single dispatcher thread"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alert-dispatch')
+    return _dispatcher
+
+
+def enqueue_alert(alert_type, equipment_name, message, email_address):
+    """Add an alert to the outbox; it is sent after the current transaction commits"""
+    alert = AlertOutbox.objects.create(
+        alert_type=alert_type,
+        equipment_name=equipment_name,
+        message=message,
+        email_address=email_address,
+    )
+    transaction.on_commit(wake_dispatcher)
+    return alert
+
+
+def wake_dispatcher():
+    """Schedule a drain of the outbox unless one is already waiting to run"""
+    global _scheduled
+    with _dispatcher_lock:
+        if _scheduled:
+            return
+        _scheduled = True
+        _executor().submit(_run_in_dispatcher)
+
+
+def _run_in_dispatcher():
+    global _scheduled
+    with _dispatcher_lock:
+        # Alerts enqueued from now on need another run
+        _scheduled = False
+    try:
+        close_old_connections()
+        dispatch_pending()
+        _schedule_retry()
+    except Exception as e:
+        print(f"Alert dispatch error: {e}")
+    finally:
+        # The dispatcher thread holds its own DB connection; release it between runs
+        connection.close()
+
+
+def _schedule_retry():
+    """Wake the dispatcher again when the earliest backed-off alert becomes due"""
+    global _retry_timer
+    next_due = (
+        AlertOutbox.objects.filter(status='pending')
+        .order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    )
+    if next_due is None:
+        return
+    delay = max(0.0, (next_due - timezone.now()).total_seconds())
+    with _dispatcher_lock:
+        if _retry_timer is not None:
+            _retry_timer.cancel()
+        _retry_timer = threading.Timer(delay, wake_dispatcher)
+        _retry_timer.daemon = True
+        _retry_timer.start()
+
+
+def _claim_batch(batch_size):
+    """Mark up to ``batch_size`` due alerts as sending and return them"""
+    now = timezone.now()
+    due_ids = list(
+        AlertOutbox.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size]
+    )
+    if not due_ids:
+        return []
+    # Conditional update so concurrent dispatchers never send the same alert twice
+    AlertOutbox.objects.filter(id__in=due_ids, status='pending').update(status='sending', claimed_at=now)
+    return list(AlertOutbox.objects.filter(id__in=due_ids, status='sending', claimed_at=now).order_by('id'))
+
+
+def _backoff(attempts):
+    return timedelta(seconds=django_settings.ALERT_RETRY_BASE_SECONDS * (2 ** (attempts - 1)))
+
+
+def send_batch(alerts):
+    """
+    Send a batch of claimed alerts over one SMTP connection and record the
+    outcome. Returns the number of alerts delivered.
+    """
+    sent, failed = [], []
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+        for alert in alerts:
+            email = EmailMessage(
+                subject=alert_subject(alert.alert_type, alert.equipment_name),
+                body=alert.message,
+                from_email=from_email(),
+                to=[alert.email_address],
+                connection=mail_connection,
+            )
+            try:
+                email.send()
+                sent.append(alert)
+            except Exception as e:
+                failed.append((alert, str(e)))
+                # Reconnect in case the failure broke the connection
+                mail_connection.close()
+                mail_connection.open()
+    except Exception as e:
+        # Could not reach the mail server at all
+        done = {alert.id for alert in sent} | {alert.id for alert, _ in failed}
+        failed += [(alert, str(e)) for alert in alerts if alert.id not in done]
+    finally:
+        mail_connection.close()
+
+    now = timezone.now()
+    logs = [
+        AlertLog(alert_type=alert.alert_type, equipment_name=alert.equipment_name,
+                 message=alert.message, sent_to=alert.email_address, was_successful=True)
+        for alert in sent
+    ]
+    with transaction.atomic():
+        AlertOutbox.objects.filter(id__in=[alert.id for alert in sent]).update(status='sent', sent_at=now)
+        for alert, error in failed:
+            print(f"ERROR: Email send failed: {error}")
+            alert.attempts += 1
+            alert.last_error = error
+            if alert.attempts >= django_settings.ALERT_MAX_ATTEMPTS:
+                alert.status = 'failed'
+                logs.append(AlertLog(alert_type=alert.alert_type, equipment_name=alert.equipment_name,
+                                     message=alert.message, sent_to=alert.email_address, was_successful=False))
+            else:
+                alert.status = 'pending'
+                alert.next_attempt_at = now + _backoff(alert.attempts)
+        AlertOutbox.objects.bulk_update(
+            [alert for alert, _ in failed], ['attempts', 'last_error', 'status', 'next_attempt_at']
+        )
+        # Link the logs of alerts about one known piece of equipment
+        linked = existing_ids({log.equipment_name for log in logs})
+        for log in logs:
+            log.equipment_id = linked.get(log.equipment_name)
+        AlertLog.objects.bulk_create(logs)
+    return len(sent)
+
+
+def dispatch_pending(batch_size=None):
+    """Send every due alert in the outbox, one SMTP connection per batch"""
+    batch_size = batch_size or django_settings.ALERT_DISPATCH_BATCH_SIZE
+    delivered = 0
+    while True:
+        alerts = _claim_batch(batch_size)
+        if not alerts:
+            return delivered
+        delivered += send_batch(alerts)
+
+
+def requeue_stale(older_than=timedelta(minutes=10)):
+    """Return alerts stuck in 'sending' (e.g. the process died mid-batch) to the queue"""
+    cutoff = timezone.now() - older_than
+    return AlertOutbox.objects.filter(status='sending', claimed_at__lt=cutoff).update(status='pending')
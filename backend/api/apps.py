@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connects the signals that invalidate cached configuration snapshots
+        # and memoized predictions
+        from . import config, prediction_cache  # noqa: F401
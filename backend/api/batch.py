@@ -0,0 +1,219 @@
+"""
+Multi-file batch uploads.
+
+Parsing and scoring are CPU-bound, so each file of a batch is analyzed in a
+separate process from a shared ``ProcessPoolExecutor``. Worker processes
+never touch the database: they write the file's columnar sidecar to a
+temporary file and send back only its path and a compact summary, so rows
+are never pickled between processes. The request process reads the columns
+it ingests from the sidecar and persists each file in its own transaction,
+in request order, as results come back. A failing file (or worker) is
+reported without affecting the rest of the batch.
+"""
+import io
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings as django_settings
+
+from .dedup import file_fingerprint, find_duplicate_upload
+from .readers import REQUIRED_COLUMNS, UploadValidationError, read_upload_frame
+from .scoring import threshold_version
+from .storage import compact_summary, load_sidecar_file, write_sidecar
+
+
+_pool_lock = threading.Lock()
+_pool_instance = None
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _pool():
+    """Lazily create the shared process pool"""
+    global _pool_instance
+    with _pool_lock:
+        if _pool_instance is None:
+            _pool_instance = ProcessPoolExecutor(
+                max_workers=django_settings.UPLOAD_BATCH_WORKERS or os.cpu_count(),
+                initializer=_init_worker,
+            )
+        return _pool_instance
+
+
+def analyze_file(source, name, thresholds):
+    """
+    Parse and score one file and write its columnar sidecar. Runs in a worker process.
+
+    ``source`` is the file's bytes or a path on disk. Returns
+    ``(sidecar_path, summary)`` or ``(None, error)`` where ``error`` is a
+    dict, because exceptions with extra state (``UploadValidationError``) do
+    not survive pickling. The summary builds no row-level sections, so like a
+    streamed upload it lists only the first ``UPLOAD_STREAM_TOP_N`` critical
+    and warning items (for alerts) next to their exact counts.
+    """
+    from .views import analyze_upload
+
+    try:
+        if isinstance(source, bytes):
+            file_obj = io.BytesIO(source)
+            df = read_upload_frame(file_obj)
+        else:
+            with open(source, 'rb') as file_obj:
+                df = read_upload_frame(file_obj)
+
+        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+        return write_sidecar(df), analyze_upload(df, thresholds, sections=())
+    except UploadValidationError as e:
+        return None, {"error": str(e), "validation_errors": e.errors}
+    except Exception as e:
+        return None, {"error": f"{name}: {e}"}
+
+
+def _result(future, name):
+    """A worker's result, or an error entry if the worker itself failed (e.g. it was killed)"""
+    try:
+        return future.result()
+    except Exception as e:
+        return None, {"error": f"{name}: {e}"}
+
+
+def _source(file_obj):
+    """Hand large uploads to workers by path; small in-memory ones by value"""
+    if hasattr(file_obj, 'temporary_file_path'):
+        return file_obj.temporary_file_path()
+    file_obj.seek(0)
+    source = file_obj.read()
+    file_obj.seek(0)
+    return source
+
+
+def fleet_summary(results):
+    """Combine the per-file summaries of a batch into one fleet-wide view"""
+    summaries = [result['summary'] for result in results if result.get('summary')]
+    total = sum(summary['total_count'] for summary in summaries)
+
+    def weighted(key):
+        if not total:
+            return None
+        return sum(summary[key] * summary['total_count'] for summary in summaries) / total
+
+    type_distribution = {}
+    for summary in summaries:
+        for equipment_type, count in summary['type_distribution'].items():
+            type_distribution[equipment_type] = type_distribution.get(equipment_type, 0) + count
+
+    risks = [
+        summary['prediction_summary']['highest_risk'] for summary in summaries
+        if summary['prediction_summary'].get('highest_risk')
+    ]
+    health_scores = [summary['health_score'] for summary in summaries]
+
+    return {
+        "files": len(results),
+        "files_created": sum(1 for result in results if result['status'] == 'created'),
+        "files_duplicate": sum(1 for result in results if result['status'] == 'duplicate'),
+        "files_failed": sum(1 for result in results if result['status'] == 'failed'),
+        "total_count": total,
+        "avg_flowrate": weighted('avg_flowrate'),
+        "avg_pressure": weighted('avg_pressure'),
+        "avg_temperature": weighted('avg_temperature'),
+        "type_distribution": dict(sorted(type_distribution.items(), key=lambda item: -item[1])),
+        "critical_item_count": sum(summary['critical_item_count'] for summary in summaries),
+        "warning_item_count": sum(summary['warning_item_count'] for summary in summaries),
+        "critical_count": sum(summary['prediction_summary']['critical_count'] for summary in summaries),
+        "warning_count": sum(summary['prediction_summary']['warning_count'] for summary in summaries),
+        "avg_health_score": round(sum(health_scores) / len(health_scores), 1) if health_scores else None,
+        "highest_risk": max(risks, key=lambda pred: pred['risk_score']) if risks else None,
+    }
+
+
+def process_batch(files, force=False):
+    """
+    Analyze a list of uploaded files in parallel and persist each one.
+
+    Files already processed with the current thresholds are answered from
+    their stored summary unless ``force`` is set. Returns the per-file
+    results (in request order) and the fleet summary.
+    """
+    from .retention import schedule_retention
+    from .views import get_thresholds, save_analyzed_upload, send_upload_alerts
+
+    started = time.perf_counter()
+    # A ThresholdTable holds plain values and arrays, so it pickles to the workers
+    thresholds = get_thresholds()
+    version = threshold_version(thresholds)
+
+    results = [{"filename": file_obj.name} for file_obj in files]
+    hashes = [file_fingerprint(file_obj) for file_obj in files]
+    pending = {}
+    seen = {}
+    for position, (file_obj, content_hash) in enumerate(zip(files, hashes)):
+        duplicate = None if force else find_duplicate_upload(content_hash, version)
+        if duplicate:
+            results[position].update(status='duplicate', upload_id=duplicate.id, summary=duplicate.summary_data)
+        elif content_hash in seen:
+            results[position].update(status='duplicate', duplicate_of=files[seen[content_hash]].name)
+        else:
+            seen[content_hash] = position
+            pending[position] = (file_obj, _source(file_obj))
+
+    if django_settings.UPLOAD_BATCH_WORKERS < 0:
+        # Inline analysis, for environments without multiprocessing
+        analyzed = (
+            (position, analyze_file(source, file_obj.name, thresholds))
+            for position, (file_obj, source) in pending.items()
+        )
+    else:
+        futures = {
+            position: _pool().submit(analyze_file, source, file_obj.name, thresholds)
+            for position, (file_obj, source) in pending.items()
+        }
+        analyzed = (
+            (position, _result(future, pending[position][0].name)) for position, future in futures.items()
+        )
+
+    created = 0
+    for position, (sidecar, summary) in analyzed:
+        file_obj = pending[position][0]
+        if sidecar is None:
+            results[position].update(status='failed', **summary)
+            continue
+        try:
+            df = load_sidecar_file(sidecar, REQUIRED_COLUMNS)
+            fingerprint = {"content_hash": hashes[position], "threshold_version": version}
+            # One transaction per file; retention runs once for the whole batch below
+            upload_record, ingest_metrics = save_analyzed_upload(
+                file_obj, df, summary, fingerprint, retention=False, sidecar=sidecar
+            )
+        except Exception as e:
+            results[position].update(status='failed', error=str(e))
+            continue
+        finally:
+            # Moved into storage on success; left behind if the file failed
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+        created += 1
+        send_upload_alerts(summary, file_obj.name)
+        results[position].update(
+            status='created',
+            upload_id=upload_record.id,
+            summary=compact_summary(summary),
+            ingest=ingest_metrics,
+        )
+
+    if created:
+        # Never prune files from this batch
+        schedule_retention(keep_uploads=created)
+
+    fleet = fleet_summary(results)
+    fleet["seconds"] = round(time.perf_counter() - started, 4)
+    return results, fleet
@@ -0,0 +1,94 @@
+"""
+Process-local snapshot of ``ThresholdSettings`` (with ``ThresholdProfile``
+overrides) and ``AlertSettings``.
+
+Hot paths read configuration from an in-memory snapshot instead of running
+``get_or_create`` on every request. Saving any of these models bumps the
+``ConfigVersion`` row in the same transaction, so the new version becomes
+visible to other workers exactly when the change does. Each worker reads
+that version (one primary-key lookup) at most once per
+``CONFIG_VERSION_CHECK_SECONDS`` and reloads its snapshot on mismatch.
+Snapshots are also reloaded after ``CONFIG_CACHE_SECONDS`` to cover changes
+made outside the ORM.
+"""
+import threading
+import time
+
+from django.conf import settings as django_settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+
+from .models import AlertSettings, ConfigVersion, ThresholdProfile, ThresholdSettings
+
+
+_lock = threading.Lock()
+_snapshot = {}
+_version = None
+_loaded_at = None
+_checked_at = None
+
+
+def _current_version():
+    return ConfigVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+
+
+def bump_version():
+    """Invalidate configuration snapshots in every worker process, as of the current transaction's commit"""
+    if not ConfigVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        _, created = ConfigVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+        if not created:
+            ConfigVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    clear_cache()
+
+
+def clear_cache():
+    """Drop this process's snapshot"""
+    global _snapshot, _version, _loaded_at, _checked_at
+    with _lock:
+        _snapshot = {}
+        _version = None
+        _loaded_at = None
+        _checked_at = None
+
+
+def cached(key, loader):
+    """Return the snapshot entry for ``key``, loading it with ``loader()`` if stale"""
+    global _snapshot, _version, _loaded_at, _checked_at
+    now = time.monotonic()
+    with _lock:
+        checked = _checked_at is not None and now - _checked_at < django_settings.CONFIG_VERSION_CHECK_SECONDS
+        if checked and key in _snapshot:
+            return _snapshot[key]
+
+    version = _current_version()
+    with _lock:
+        expired = _loaded_at is None or now - _loaded_at > django_settings.CONFIG_CACHE_SECONDS
+        if version != _version or expired:
+            _snapshot = {}
+            _version = version
+            _loaded_at = now
+        _checked_at = now
+        if key in _snapshot:
+            return _snapshot[key]
+
+    # Load outside the lock: creating the default row fires post_save, which clears the cache
+    value = loader()
+    with _lock:
+        if _version == version and _checked_at is not None:
+            _snapshot[key] = value
+    return value
+
+
+def _settings_saved(sender, **kwargs):
+    # Other workers see the new version when the change commits. This process
+    # drops its snapshot now, and again after the commit in case another
+    # thread reloaded the old values in between.
+    bump_version()
+    transaction.on_commit(clear_cache)
+
+
+post_save.connect(_settings_saved, sender=ThresholdSettings, dispatch_uid='config_thresholds_saved')
+post_save.connect(_settings_saved, sender=AlertSettings, dispatch_uid='config_alert_settings_saved')
+post_save.connect(_settings_saved, sender=ThresholdProfile, dispatch_uid='config_profile_saved')
+post_delete.connect(_settings_saved, sender=ThresholdProfile, dispatch_uid='config_profile_deleted')
@@ -0,0 +1,31 @@
+"""
+Content-hash deduplication of repeated uploads.
+
+Uploads are fingerprinted with a SHA-256 computed over the file's chunks,
+so even very large files are hashed without being read into memory. An
+identical file already processed under the same threshold version can be
+answered from the stored summary without re-parsing or writing anything.
+"""
+import hashlib
+
+from .models import UploadHistory
+
+
+def file_fingerprint(file_obj):
+    """SHA-256 hex digest of an uploaded file, read in chunks"""
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for chunk in file_obj.chunks():
+        digest.update(chunk)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def find_duplicate_upload(content_hash, threshold_version):
+    """Most recent upload with the same content processed under the same thresholds"""
+    return (
+        UploadHistory.objects
+        .filter(content_hash=content_hash, threshold_version=threshold_version)
+        .order_by('-upload_date')
+        .first()
+    )
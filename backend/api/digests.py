@@ -0,0 +1,148 @@
+"""
+Hourly and daily alert digests.
+
+When ``AlertSettings.alert_frequency`` is 'hourly' or 'daily', alerts are not
+queued one by one. Each event is buffered as an ``AlertDigestEvent`` keyed by
+alert type and equipment, so repeated alerts for the same equipment collapse
+into one row with an occurrence count. Once per window the buffer is turned
+into a single summarized message on the alert outbox and
+``last_alert_sent`` is updated. Flushing happens opportunistically when new
+events arrive and from the ``flush_alert_digests`` management command.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .alerts import enqueue_alert
+from .config import bump_version, clear_cache
+from .models import AlertDigestEvent, AlertSettings
+
+
+WINDOWS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+# Most severe first; the digest is sent with the most severe type it contains
+SECTIONS = [
+    ('critical', '🚨 CRITICAL'),
+    ('warning', '⚠️ WARNING'),
+    ('maintenance', '🔧 MAINTENANCE'),
+]
+
+# Equipment listed per section before the rest is summarized as a count
+MAX_LINES_PER_SECTION = 50
+
+# Equipment names per lookup query when merging into the buffer
+_LOOKUP_BATCH = 500
+
+
+def digest_mode(alert_settings):
+    return alert_settings.alert_frequency in WINDOWS
+
+
+def buffer_events(alert_type, events, now=None):
+    """
+    Add ``(equipment_name, message)`` events to the digest buffer, merging
+    repeats for the same equipment into one row.
+    """
+    now = now or timezone.now()
+    collapsed = {}
+    for equipment_name, message in events:
+        entry = collapsed.setdefault(equipment_name, [0, message])
+        entry[0] += 1
+        entry[1] = message
+    if not collapsed:
+        return
+
+    names = list(collapsed)
+    with transaction.atomic():
+        existing = {}
+        for start in range(0, len(names), _LOOKUP_BATCH):
+            rows = AlertDigestEvent.objects.select_for_update().filter(
+                alert_type=alert_type, equipment_name__in=names[start:start + _LOOKUP_BATCH]
+            )
+            existing.update({row.equipment_name: row for row in rows})
+
+        for name, row in existing.items():
+            count, message = collapsed[name]
+            row.occurrences += count
+            row.message = message
+            row.last_seen = now
+        AlertDigestEvent.objects.bulk_update(list(existing.values()), ['occurrences', 'message', 'last_seen'])
+        AlertDigestEvent.objects.bulk_create([
+            AlertDigestEvent(alert_type=alert_type, equipment_name=name, message=message,
+                             occurrences=count, first_seen=now, last_seen=now)
+            for name, (count, message) in collapsed.items() if name not in existing
+        ])
+
+
+def digest_due(alert_settings, now=None):
+    """Whether a digest window has passed since the last digest was sent"""
+    window = WINDOWS.get(alert_settings.alert_frequency)
+    if window is None:
+        # Switched back to immediate alerts: send whatever is still buffered
+        return True
+    now = now or timezone.now()
+    return alert_settings.last_alert_sent is None or now - alert_settings.last_alert_sent >= window
+
+
+def build_digest(events, frequency):
+    """Alert type, equipment label and message body summarizing buffered events"""
+    by_type = {}
+    for event in events:
+        by_type.setdefault(event.alert_type, []).append(event)
+
+    since = min(event.first_seen for event in events)
+    total = sum(event.occurrences for event in events)
+    equipment = {event.equipment_name for event in events}
+    label = 'Daily' if frequency == 'daily' else 'Hourly' if frequency == 'hourly' else 'Pending'
+
+    lines = [f"📋 {label} alert digest: {total} alert(s) for {len(equipment)} equipment "
+             f"since {since:%Y-%m-%d %H:%M}"]
+    for alert_type, heading in SECTIONS:
+        section = sorted(by_type.get(alert_type, []), key=lambda event: (-event.occurrences, event.equipment_name))
+        if not section:
+            continue
+        lines += ['', f"{heading} ({len(section)} equipment)"]
+        for event in section[:MAX_LINES_PER_SECTION]:
+            first_line = event.message.splitlines()[0] if event.message else ''
+            lines.append(f" - {event.equipment_name}: {event.occurrences}x, last {event.last_seen:%Y-%m-%d %H:%M} — {first_line}")
+        if len(section) > MAX_LINES_PER_SECTION:
+            lines.append(f" ... and {len(section) - MAX_LINES_PER_SECTION} more")
+
+    alert_type = next(alert_type for alert_type, _ in SECTIONS if alert_type in by_type)
+    return alert_type, f"Digest: {len(equipment)} equipment", '\n'.join(lines)
+
+
+def flush_digest(alert_settings=None, now=None, force=False):
+    """
+    Send the buffered events as one digest if the window has passed (or
+    ``force``). Returns the queued outbox alert, or None if nothing was sent.
+    """
+    now = now or timezone.now()
+    if alert_settings is None:
+        from .views import get_alert_settings
+        alert_settings = get_alert_settings()
+    if not force and not digest_due(alert_settings, now):
+        return None
+
+    with transaction.atomic():
+        events = list(AlertDigestEvent.objects.select_for_update().order_by('first_seen', 'id'))
+        if not events:
+            return None
+
+        alert = None
+        if alert_settings.email_enabled and alert_settings.email_address:
+            alert_type, equipment_name, message = build_digest(events, alert_settings.alert_frequency)
+            alert = enqueue_alert(alert_type, equipment_name, message, alert_settings.email_address)
+
+        AlertDigestEvent.objects.filter(id__in=[event.id for event in events]).delete()
+        # ``alert_settings`` may be the shared cached snapshot, so it is never
+        # modified here; update() skips post_save, so refresh the snapshots
+        AlertSettings.objects.filter(pk=alert_settings.pk).update(last_alert_sent=now)
+        bump_version()
+        transaction.on_commit(clear_cache)
+    return alert
+
@@ -0,0 +1,159 @@
+"""
+The ``Equipment`` dimension.
+
+Readings, rollups, maintenance schedules and alert logs reference equipment
+by integer key instead of repeating names. Names are matched after
+normalization (surrounding and repeated whitespace dropped, case folded), so
+"Pump 1" and " pump  1" are the same equipment; the first spelling and type
+seen are kept for display. Existing equipment is never retyped: readings
+store the type reported with them. Equipment created without a type (e.g. by
+a maintenance schedule) takes the first type reported for it afterwards.
+
+Ingest resolves names through a process-local name -> id map and
+only queries or inserts the names it has not seen. Entries are added once
+the transaction that read or created them commits, so a rolled-back upload
+never leaves ids in the map that do not exist.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+
+from .models import Equipment
+
+
+_lock = threading.Lock()
+_ids = {}
+
+# Names per lookup query
+_LOOKUP_BATCH = 500
+
+
+def normalize_name(name):
+    return ' '.join(str(name).split()).casefold()
+
+
+def display_name(name):
+    return ' '.join(str(name).split()) or 'Unknown'
+
+
+def clear_cache():
+    with _lock:
+        _ids.clear()
+
+
+def _remember(entries):
+    with _lock:
+        _ids.update(entries)
+
+
+def _lookup(keys):
+    """``{normalized name: (id, type)}`` for the keys that exist"""
+    found = {}
+    for start in range(0, len(keys), _LOOKUP_BATCH):
+        batch = keys[start:start + _LOOKUP_BATCH]
+        found.update({
+            key: (equipment_id, equipment_type)
+            for key, equipment_id, equipment_type
+            in Equipment.objects.filter(normalized_name__in=batch).values_list('normalized_name', 'id', 'equipment_type')
+        })
+    return found
+
+
+def _fill_types(keys_by_type):
+    """Type equipment that has none yet; ``keys_by_type`` is ``{type: [normalized name, ...]}``"""
+    for equipment_type, keys in keys_by_type.items():
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            Equipment.objects.filter(
+                normalized_name__in=keys[start:start + _LOOKUP_BATCH], equipment_type=''
+            ).update(equipment_type=equipment_type)
+
+
+def equipment_ids(names, types):
+    """
+    Equipment ids for parallel lists of names and types, creating equipment
+    that does not exist yet, or typing equipment that has no type yet, with
+    the first type seen for it. Returns a list aligned with ``names``.
+    """
+    wanted = {}
+    for name, equipment_type in zip(names, types):
+        wanted.setdefault(normalize_name(name), (display_name(name), str(equipment_type)))
+
+    with _lock:
+        known = {key: _ids[key] for key in wanted if key in _ids}
+    missing = [key for key in wanted if key not in known]
+
+    found = _lookup(missing)
+    untyped = {}
+    for key, (_, equipment_type) in found.items():
+        if not equipment_type and wanted[key][1]:
+            untyped.setdefault(wanted[key][1], []).append(key)
+    _fill_types(untyped)
+
+    looked_up = {key: equipment_id for key, (equipment_id, _) in found.items()}
+    new = [key for key in missing if key not in looked_up]
+    if new:
+        # Concurrent uploads may create the same equipment; keep whichever insert won
+        Equipment.objects.bulk_create(
+            [Equipment(name=wanted[key][0], normalized_name=key, equipment_type=wanted[key][1]) for key in new],
+            ignore_conflicts=True,
+        )
+        looked_up.update({key: equipment_id for key, (equipment_id, _) in _lookup(new).items()})
+
+    if looked_up:
+        transaction.on_commit(lambda: _remember(looked_up))
+    resolved = {**known, **looked_up}
+    return [resolved[normalize_name(name)] for name in names]
+
+
+def find_equipment(name):
+    """Equipment with this name after normalization, or None"""
+    return Equipment.objects.filter(normalized_name=normalize_name(name)).first()
+
+
+def existing_ids(names):
+    """``{name: id}`` for the names that match existing equipment; others are left out"""
+    matched = _lookup(list({normalize_name(name) for name in names}))
+    return {name: matched[normalize_name(name)][0] for name in names if normalize_name(name) in matched}
+
+
+def search_equipment(text):
+    """Equipment whose name contains ``text``, ignoring case and spacing"""
+    return Equipment.objects.filter(normalized_name__contains=normalize_name(text))
+
+
+def get_or_create_equipment(name, equipment_type=''):
+    """
+    Equipment for one name, e.g. a maintenance schedule. The type is used
+    when creating it, or when the equipment has no type yet.
+    """
+    equipment, created = Equipment.objects.get_or_create(
+        normalized_name=normalize_name(name),
+        defaults={'name': display_name(name), 'equipment_type': equipment_type or ''},
+    )
+    if not created and equipment_type and not equipment.equipment_type:
+        _fill_types({equipment_type: [equipment.normalized_name]})
+        # Another request may have typed it first
+        equipment.refresh_from_db(fields=['equipment_type'])
+    return equipment
+
+
+def labels(ids):
+    """``{id: (name, type)}`` for a collection of equipment ids"""
+    ids = list({int(equipment_id) for equipment_id in ids})
+    result = {}
+    for start in range(0, len(ids), _LOOKUP_BATCH):
+        batch = ids[start:start + _LOOKUP_BATCH]
+        result.update({
+            equipment_id: (name, equipment_type)
+            for equipment_id, name, equipment_type
+            in Equipment.objects.filter(id__in=batch).values_list('id', 'name', 'equipment_type')
+        })
+    return result
+
+
+def _equipment_deleted(sender, **kwargs):
+    clear_cache()
+
+
+post_delete.connect(_equipment_deleted, sender=Equipment, dispatch_uid='equipment_deleted')
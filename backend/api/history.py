@@ -0,0 +1,216 @@
+"""
+Time-windowed equipment history queries.
+
+Every series is read newest first through the (equipment, recorded_at)
+index and bounded both by the requested window and by a per-equipment point
+limit, so the cost of a trend query depends on the window and the limit, not
+on how much history is stored.
+
+With ``max_points`` the whole window is read instead and each series is
+reduced with Largest-Triangle-Three-Buckets, which keeps the points that
+shape the plotted line.
+
+Long windows are served from the hourly or daily rollups (api/rollups.py):
+the coarsest resolution that still yields the requested number of points
+over the window is used, and raw rows only when even hourly buckets would
+be too coarse.
+
+Rows are read with their equipment id only; names and types are looked up
+once per query from the ``Equipment`` table when series are grouped.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+
+from .equipment import labels
+from .models import Equipment, EquipmentHistory
+from .rollups import RESOLUTIONS, recent_buckets
+
+
+POINT_FIELDS = ['equipment_id', 'recorded_at', 'pressure', 'temperature', 'flowrate']
+METRICS = ['pressure', 'temperature', 'flowrate']
+
+
+def equipment_names():
+    """Names of the equipment that has history, probed through the index"""
+    has_history = Exists(EquipmentHistory.objects.filter(equipment=OuterRef('pk')))
+    return list(Equipment.objects.filter(has_history).order_by('name').values_list('name', flat=True))
+
+
+def recent_rows(since, equipment_id=None, limit=100):
+    """
+    History rows recorded since ``since``, newest first, at most ``limit``
+    per equipment. Returns value dicts with ``POINT_FIELDS``.
+    """
+    queryset = EquipmentHistory.objects.filter(recorded_at__gte=since)
+    if equipment_id is not None:
+        return list(queryset.filter(equipment_id=equipment_id).order_by('-recorded_at').values(*POINT_FIELDS)[:limit])
+
+    # Number each series newest first and keep the first ``limit`` of every one
+    ranked = queryset.annotate(
+        position=Window(RowNumber(), partition_by=[F('equipment_id')], order_by=F('recorded_at').desc())
+    ).filter(position__lte=limit)
+    return list(ranked.order_by('equipment_id', '-recorded_at').values(*POINT_FIELDS))
+
+
+def _series(history, names, row, raw_counts):
+    """The series of ``history`` that ``row`` belongs to, created on first use"""
+    equipment_id = row['equipment_id']
+    series = history.get(equipment_id)
+    if series is None:
+        name, equipment_type = names[equipment_id]
+        series = history[equipment_id] = {
+            'equipment_name': name,
+            'equipment_type': equipment_type,
+            'data_points': [],
+        }
+        if raw_counts is not None:
+            series['raw_points'] = raw_counts[equipment_id]
+    return series
+
+
+def _by_name(history):
+    return {series['equipment_name']: series for series in history.values()}
+
+
+def group_series(rows, raw_counts=None):
+    """
+    Group rows into per-equipment series in the API's ``history`` format,
+    keyed by equipment name. ``raw_counts`` (per equipment id) adds each
+    series' ``raw_points``.
+    """
+    names = labels(row['equipment_id'] for row in rows)
+    history = {}
+    for row in rows:
+        series = _series(history, names, row, raw_counts)
+        series['data_points'].append({
+            'timestamp': row['recorded_at'].isoformat(),
+            'pressure': row['pressure'],
+            'temperature': row['temperature'],
+            'flowrate': row['flowrate'],
+        })
+    return _by_name(history)
+
+
+def lttb_indices(x, ys, max_points):
+    """
+    Positions of the points kept by Largest-Triangle-Three-Buckets.
+
+    ``x`` is sorted ascending; ``ys`` holds one or more series over ``x``
+    (shape ``(series, n)``). All series share the selected positions: in each
+    bucket the point whose triangles are largest in total wins, with every
+    series scaled by its range so no metric dominates. The first and last
+    points are always kept.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    ys = np.atleast_2d(np.asarray(ys, dtype=np.float64))
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    spans = np.nanmax(ys, axis=1) - np.nanmin(ys, axis=1)
+    ys = ys / np.where(spans > 0, spans, 1.0)[:, None]
+
+    # Bucket edges over the interior points; bucket i is [edges[i], edges[i + 1])
+    edges = (np.arange(max_points - 1) * ((n - 2) / (max_points - 2))).astype(np.intp) + 1
+    edges[-1] = n - 1
+    # Each bucket looks ahead to the mean of the next one (the last point for the final bucket)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(ys[:, 1:n - 1], edges[:-1] - 1, axis=1)
+    counts = np.diff(edges)
+    next_x = np.append(sums_x[1:] / counts[1:], x[-1])
+    next_y = np.column_stack([sums_y[:, 1:] / counts[1:], ys[:, -1]])
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(max_points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        bx, by = x[start:end], ys[:, start:end]
+        ax_, ay = x[a], ys[:, a:a + 1]
+        cx, cy = next_x[bucket], next_y[:, bucket:bucket + 1]
+        area = np.abs((ax_ - cx) * (by - ay) - (ax_ - bx) * (cy - ay))
+        a = start + int(np.argmax(np.nansum(area, axis=0)))
+        selected[bucket + 1] = a
+    return selected
+
+
+def _downsample(frame, time_column, metrics, max_points):
+    """
+    Reduce each equipment series of ``frame`` (sorted by equipment, then time
+    ascending) to ``max_points`` with LTTB. Returns the kept rows, newest
+    first per equipment, and the number of input rows per equipment id.
+    """
+    times = pd.to_datetime(frame[time_column], utc=True)
+    timestamps = ((times - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)).to_numpy(dtype=np.float64)
+    values = frame[metrics].to_numpy(dtype=np.float64).T
+    # Rows are grouped by equipment, so every series is one contiguous slice
+    equipment = frame['equipment_id'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, equipment[1:] != equipment[:-1]])
+    ends = np.r_[starts[1:], len(frame)]
+
+    keep, raw_counts = [], {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        raw_counts[int(equipment[start])] = end - start
+        idx = lttb_indices(timestamps[start:end], values[:, start:end], max_points)
+        keep.append(start + idx[::-1])
+    return frame.iloc[np.concatenate(keep)].to_dict(orient='records'), raw_counts
+
+
+def downsampled_rows(since, equipment_id=None, max_points=500):
+    """
+    Every history row recorded since ``since``, reduced to at most
+    ``max_points`` per equipment with LTTB over all three metrics. Returns
+    ``(rows, raw_counts)``: value dicts newest first per equipment, and the
+    number of stored points per equipment id in the window.
+    """
+    queryset = EquipmentHistory.objects.filter(recorded_at__gte=since)
+    if equipment_id is not None:
+        queryset = queryset.filter(equipment_id=equipment_id)
+    records = queryset.order_by('equipment_id', 'recorded_at').values_list(*POINT_FIELDS)
+    frame = pd.DataFrame.from_records(list(records), columns=POINT_FIELDS)
+    if frame.empty:
+        return [], {}
+    return _downsample(frame, 'recorded_at', METRICS, max_points)
+
+
+def choose_resolution(days, points):
+    """Coarsest rollup resolution giving at least ``points`` buckets over ``days``, else 'raw'"""
+    window = timedelta(days=days)
+    for resolution, (step, _) in RESOLUTIONS.items():
+        if window / step >= points:
+            return resolution
+    return 'raw'
+
+
+def downsampled_buckets(resolution, since, equipment_id=None, max_points=500):
+    """Rollup buckets of the window reduced with LTTB over their means, like ``downsampled_rows``"""
+    rows = recent_buckets(resolution, since, equipment_id)
+    if not rows:
+        return [], {}
+    frame = pd.DataFrame(rows).sort_values(['equipment_id', 'bucket'], kind='stable')
+    for metric in METRICS:
+        frame[f'{metric}_mean'] = frame[f'{metric}_sum'] / frame['count']
+    rows, _ = _downsample(frame.reset_index(drop=True), 'bucket', [f'{metric}_mean' for metric in METRICS], max_points)
+    # Report stored readings, not buckets
+    return rows, {int(key): int(count) for key, count in frame.groupby('equipment_id')['count'].sum().items()}
+
+
+def group_buckets(rows, raw_counts=None):
+    """Group rollup buckets into per-equipment series in the API's ``history`` format, like ``group_series``"""
+    names = labels(row['equipment_id'] for row in rows)
+    history = {}
+    for row in rows:
+        series = _series(history, names, row, raw_counts)
+        # Bucket means in the usual fields, so clients plotting raw points work unchanged
+        point = {'timestamp': row['bucket'].isoformat(), 'count': row['count']}
+        for metric in METRICS:
+            point[metric] = row[f'{metric}_sum'] / row['count']
+            point[f'{metric}_min'] = row[f'{metric}_min']
+            point[f'{metric}_max'] = row[f'{metric}_max']
+            point[f'{metric}_last'] = row[f'{metric}_last']
+        series['data_points'].append(point)
+    return _by_name(history)
@@ -0,0 +1,129 @@
+"""
+Bulk persistence of uploaded equipment readings.
+
+Rows are built straight from DataFrame columns and written with batched
+INSERTs (or COPY on PostgreSQL), and the hourly/daily rollups are updated in
+the same transaction. Equipment names are resolved to ``Equipment`` ids once
+per upload (api/equipment.py). Callers wrap the upload in ``transaction.atomic()`` so
+a failure leaves no partial history behind.
+"""
+import csv
+import io
+import time
+
+from django.conf import settings as django_settings
+from django.db import connection
+from django.utils import timezone
+
+from .equipment import equipment_ids
+from .models import EquipmentHistory
+from .rollups import ingested_frame, update_rollups
+
+
+def _column_values(df, name, default, numeric=False):
+    """Column as a Python list, or a list of ``default`` if the column is missing"""
+    if name not in df.columns:
+        return [default] * len(df)
+    if numeric:
+        return df[name].astype(float).tolist()
+    return df[name].tolist()
+
+
+def history_columns(df):
+    """Extract the EquipmentHistory fields from a DataFrame, column by column"""
+    return (
+        _column_values(df, 'Equipment Name', 'Unknown'),
+        _column_values(df, 'Type', 'Unknown'),
+        _column_values(df, 'Pressure', 0.0, numeric=True),
+        _column_values(df, 'Temperature', 0.0, numeric=True),
+        _column_values(df, 'Flowrate', 0.0, numeric=True),
+    )
+
+
+def _bulk_create(df, equipment, upload_record, batch_size):
+    _, types, pressures, temperatures, flowrates = history_columns(df)
+    records = [
+        EquipmentHistory(
+            equipment_id=equipment_id,
+            equipment_type=eq_type,
+            pressure=pressure,
+            temperature=temperature,
+            flowrate=flowrate,
+            upload_session=upload_record,
+        )
+        for equipment_id, eq_type, pressure, temperature, flowrate
+        in zip(equipment, types, pressures, temperatures, flowrates)
+    ]
+    EquipmentHistory.objects.bulk_create(records, batch_size=batch_size)
+    # auto_now_add stamps each record as it is saved
+    return len(records), [record.recorded_at for record in records]
+
+
+def _copy_rows(df, equipment, upload_record, batch_size):
+    """PostgreSQL fast path: stream rows into the table with COPY ... FROM STDIN"""
+    meta = EquipmentHistory._meta
+    fields = ['equipment', 'equipment_type', 'pressure', 'temperature', 'flowrate', 'recorded_at', 'upload_session']
+    columns = ', '.join(connection.ops.quote_name(meta.get_field(f).column) for f in fields)
+    sql = f"COPY {connection.ops.quote_name(meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    recorded_at = timezone.now()
+    rows = zip(equipment, *history_columns(df)[1:])
+    total = 0
+
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        while True:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            written = 0
+            for row in rows:
+                writer.writerow((*row, recorded_at.isoformat(), upload_record.pk))
+                written += 1
+                if written >= batch_size:
+                    break
+            if not written:
+                break
+            buffer.seek(0)
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+            total += written
+    return total, recorded_at
+
+
+def ingest_equipment_history(df, upload_record, batch_size=None, use_copy=None):
+    """
+    Persist one upload's equipment readings as EquipmentHistory rows.
+
+    Must be called inside ``transaction.atomic()``. Returns ingest metrics:
+    rows written, elapsed seconds, rows per second and the method used.
+    """
+    if batch_size is None:
+        batch_size = getattr(django_settings, 'EQUIPMENT_HISTORY_BATCH_SIZE', 1000)
+    if use_copy is None:
+        use_copy = getattr(django_settings, 'EQUIPMENT_HISTORY_USE_COPY', True)
+    use_copy = use_copy and connection.vendor == 'postgresql'
+
+    start = time.perf_counter()
+    names, types, *_ = history_columns(df)
+    equipment = equipment_ids(names, types)
+    if use_copy:
+        rows, recorded_at = _copy_rows(df, equipment, upload_record, batch_size)
+    else:
+        rows, recorded_at = _bulk_create(df, equipment, upload_record, batch_size)
+    elapsed = time.perf_counter() - start
+
+    rollup_start = time.perf_counter()
+    update_rollups(ingested_frame(df, equipment, recorded_at))
+    rollup_seconds = time.perf_counter() - rollup_start
+
+    return {
+        "rows": rows,
+        "method": "copy" if use_copy else "bulk_create",
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 4),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "rollup_seconds": round(rollup_seconds, 4),
+    }
@@ -0,0 +1,174 @@
+"""
+Background upload processing.
+
+Asynchronous uploads are stored as ``UploadJob`` rows and handed to a
+process-local thread pool once the creating transaction commits. The job
+row is the source of truth: workers claim a job with a conditional UPDATE,
+so a job left queued by a restart can be picked up again by the
+``process_upload_jobs`` management command without running twice. While a
+job runs, a heartbeat thread with its own DB connection touches
+``heartbeat_at`` every ``UPLOAD_JOB_HEARTBEAT_SECONDS`` (the upload itself is
+persisted in one transaction, so progress writes are not visible until it
+commits). Jobs whose heartbeat is older than ``UPLOAD_JOB_TIMEOUT_SECONDS``
+were left by a crashed worker and are requeued.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.files import File
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UploadJob
+
+
+_executor_lock = threading.Lock()
+_executor_instance = None
+
+
+def _executor():
+    """Lazily create the shared worker pool"""
+    global _executor_instance
+    with _executor_lock:
+        if _executor_instance is None:
+            _executor_instance = ThreadPoolExecutor(
+                max_workers=django_settings.UPLOAD_JOB_WORKERS,
+                thread_name_prefix='upload-job',
+            )
+        return _executor_instance
+
+
+def create_upload_job(file_obj, streaming=False):
+    """Store the uploaded file as a queued job and schedule it after commit"""
+    job = UploadJob.objects.create(filename=file_obj.name, file=file_obj, streaming=streaming)
+    transaction.on_commit(lambda: enqueue_upload_job(job.pk))
+    return job
+
+
+def enqueue_upload_job(job_id):
+    """Submit a job to the worker pool"""
+    _executor().submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    try:
+        run_upload_job(job_id)
+    finally:
+        # Worker threads hold their own DB connection; release it between jobs
+        connection.close()
+
+
+def _update(job_id, started, **fields):
+    """Update a job still held by the run that claimed it at ``started``"""
+    return UploadJob.objects.filter(pk=job_id, status='running', started_at=started).update(**fields)
+
+
+def _heartbeat(job_id, started, stop):
+    """Touch the job's heartbeat until ``stop`` is set"""
+    try:
+        while not stop.wait(django_settings.UPLOAD_JOB_HEARTBEAT_SECONDS):
+            try:
+                _update(job_id, started, heartbeat_at=timezone.now())
+            except DatabaseError:
+                # e.g. SQLite locked by the upload transaction; the next beat retries
+                pass
+    finally:
+        connection.close()
+
+
+def run_upload_job(job_id):
+    """
+    Process one queued job through the upload pipeline.
+
+    Returns False if the job was already claimed by another worker.
+    """
+    from .views import process_upload
+
+    close_old_connections()
+    # The claim time also identifies this run, so a run whose job was requeued cannot finish it
+    started = timezone.now()
+    claimed = UploadJob.objects.filter(pk=job_id, status='queued').update(
+        status='running', started_at=started, heartbeat_at=started
+    )
+    if not claimed:
+        return False
+
+    job = UploadJob.objects.get(pk=job_id)
+
+    def progress(stage, percent, rows=None):
+        fields = {'stage': stage, 'progress': round(percent, 1), 'heartbeat_at': timezone.now()}
+        if rows is not None:
+            fields['rows_processed'] = rows
+        _update(job_id, started, **fields)
+
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat, args=(job_id, started, stop), daemon=True,
+                            name=f'upload-job-{job_id}-heartbeat')
+    beat.start()
+    try:
+        # Wrap the stored file so the upload record saves its own copy under the original name.
+        # Jobs only report the stored summary, so no row-level sections are built.
+        with job.file.storage.open(job.file.name, 'rb') as stored:
+            upload_record, summary, ingest_metrics = process_upload(
+                File(stored, name=job.filename), streaming=job.streaming, progress=progress, sections=()
+            )
+    except Exception as e:
+        _update(job_id, started, status='failed', error=str(e), finished_at=timezone.now())
+        return True
+    finally:
+        stop.set()
+        beat.join()
+
+    _update(
+        job_id,
+        started,
+        status='completed',
+        stage='done',
+        progress=100.0,
+        rows_processed=summary.get('total_count', 0),
+        ingest_metrics=ingest_metrics,
+        upload=upload_record,
+        finished_at=timezone.now(),
+    )
+    # The upload record keeps its own copy of the file
+    job.file.delete(save=False)
+    return True
+
+
+def requeue_stale(older_than=None):
+    """
+    Return jobs whose worker stopped sending heartbeats (e.g. it died mid-job)
+    to the queue. One conditional UPDATE, so concurrent runners requeue each
+    job once; running it again goes through the usual claim.
+    """
+    if older_than is None:
+        older_than = timedelta(seconds=django_settings.UPLOAD_JOB_TIMEOUT_SECONDS)
+    cutoff = timezone.now() - older_than
+    # The upload is persisted in one transaction, so a lost run left nothing behind
+    lost = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    return UploadJob.objects.filter(lost, status='running').update(
+        status='queued', stage='queued', progress=0.0, rows_processed=0, started_at=None, heartbeat_at=None
+    )
+
+
+def job_status(job):
+    """API representation of a job; includes the upload summary once completed"""
+    return {
+        'id': job.id,
+        'filename': job.filename,
+        'status': job.status,
+        'stage': job.stage,
+        'progress': job.progress,
+        'rows_processed': job.rows_processed,
+        'streaming': job.streaming,
+        'error': job.error or None,
+        'upload_id': job.upload_id,
+        'ingest': job.ingest_metrics,
+        'summary': job.upload.summary_data if job.status == 'completed' and job.upload else None,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.retention import apply_retention
+
+
+class Command(BaseCommand):
+    help = "Archive and delete raw history past its retention, prune hourly rollups and old uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-archive', action='store_true',
+                            help="Only prune uploads and hourly rollups; leave raw history alone")
+
+    def handle(self, *args, **options):
+        result = apply_retention(archive=not options['no_archive'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['rows_archived']} history rows, deleted {result['rows_deleted']}; "
+            f"deleted {result['hourly_rollups_deleted']} hourly rollups and {result['uploads_deleted']} uploads"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.alerts import dispatch_pending, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Send due alerts from the outbox, e.g. ones left behind by a restart"
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        delivered = dispatch_pending()
+        self.stdout.write(self.style.SUCCESS(f"Sent {delivered} alert(s), requeued {requeued} stale alert(s)"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.resumable import expire_sessions
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions (and their chunks) untouched for RESUMABLE_UPLOAD_TTL_SECONDS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=None,
+                            help="Expire sessions untouched for this many seconds instead")
+
+    def handle(self, *args, **options):
+        deleted = expire_sessions(options['ttl'])
+        self.stdout.write(self.style.SUCCESS(f"Expired {deleted} resumable upload sessions"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.digests import flush_digest
+from api.views import load_alert_settings
+
+
+class Command(BaseCommand):
+    help = "Send the hourly/daily alert digest if its window has passed; run this from cron or a scheduler"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Send buffered alerts even if the window has not passed")
+
+    def handle(self, *args, **options):
+        # Runs rarely; read the settings fresh rather than from a cached snapshot
+        alert = flush_digest(load_alert_settings(), force=options['force'])
+        if alert is None:
+            self.stdout.write("No digest due")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Queued digest: {alert.equipment_name}"))
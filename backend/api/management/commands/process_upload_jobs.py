@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import requeue_stale, run_upload_job
+from api.models import UploadJob
+
+
+class Command(BaseCommand):
+    help = "Process queued background upload jobs, e.g. ones left behind by a restart"
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        job_ids = list(UploadJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True))
+        processed = 0
+        for job_id in job_ids:
+            if run_upload_job(job_id):
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} upload job(s), requeued {requeued} stale job(s)"))
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the hourly/daily equipment rollups from raw history, e.g. after a backfill"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Only rebuild the last N days (default: all history)")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        rows = rebuild_rollups(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups from {rows} history rows"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_alter_alertsettings_email_enabled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255)),
+                ('file', models.FileField(upload_to='jobs/')),
+                ('streaming', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('stage', models.CharField(choices=[('queued', 'Queued'), ('parsing', 'Parsing'), ('scoring', 'Scoring'), ('persisting', 'Persisting'), ('alerting', 'Sending Alerts'), ('done', 'Done')], default='queued', max_length=20)),
+                ('progress', models.FloatField(default=0.0, help_text='Percent complete')),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('ingest_metrics', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('upload', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='api.uploadhistory')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_uploadjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadhistory',
+            name='data_file',
+            field=models.FileField(blank=True, upload_to='columnar/'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+def forwards(apps, schema_editor):
+    """Write each upload's 'data' records to a columnar sidecar and strip row-level sections"""
+    import pandas as pd
+    from api.storage import compact_summary, save_upload_frame
+
+    UploadHistory = apps.get_model('api', 'UploadHistory')
+    for record in UploadHistory.objects.iterator(chunk_size=50):
+        summary = record.summary_data or {}
+        if 'data' in summary and not record.data_file:
+            save_upload_frame(record, pd.DataFrame(summary['data']))
+        record.summary_data = compact_summary(summary)
+        record.save(update_fields=['summary_data'])
+
+
+def backwards(apps, schema_editor):
+    """Restore 'data' records into summary_data from the sidecar"""
+    from api.storage import load_upload_frame
+
+    UploadHistory = apps.get_model('api', 'UploadHistory')
+    for record in UploadHistory.objects.iterator(chunk_size=50):
+        if not record.data_file:
+            continue
+        df = load_upload_frame(record)
+        record.summary_data = {**record.summary_data, 'data': df.fillna('').to_dict(orient='records')}
+        record.save(update_fields=['summary_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_uploadhistory_data_file'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:06
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_uploadhistory_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumableUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField(help_text='Size of the complete file in bytes')),
+                ('chunk_size', models.IntegerField(help_text='Size of every chunk except the last, in bytes')),
+                ('checksum', models.CharField(blank=True, help_text='Optional SHA-256 of the complete file', max_length=64)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('finalized', 'Finalized')], default='active', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_alertoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertDigestEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alert_type', models.CharField(choices=[('critical', 'Critical Alert'), ('warning', 'Warning Alert'), ('maintenance', 'Maintenance Reminder')], max_length=20)),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('message', models.TextField(help_text='Most recent message for this equipment')),
+                ('occurrences', models.IntegerField(default=1)),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['first_seen'],
+                'constraints': [models.UniqueConstraint(fields=('alert_type', 'equipment_name'), name='unique_digest_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_alertdigestevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentAlertState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(max_length=255, unique=True)),
+                ('level', models.CharField(choices=[('warning', 'Warning'), ('critical', 'Critical')], max_length=20)),
+                ('last_alerted_at', models.DateTimeField()),
+                ('suppressed_count', models.IntegerField(default=0, help_text='Repeat alerts suppressed since the last one sent')),
+                ('total_suppressed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['equipment_name'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_equipmentalertstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThresholdProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_type', models.CharField(max_length=100, unique=True)),
+                ('pressure_warning', models.FloatField(blank=True, null=True)),
+                ('pressure_critical', models.FloatField(blank=True, null=True)),
+                ('temperature_warning', models.FloatField(blank=True, null=True)),
+                ('temperature_critical', models.FloatField(blank=True, null=True)),
+                ('flowrate_min', models.FloatField(blank=True, null=True)),
+                ('flowrate_max', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['equipment_type'],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_thresholdprofile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='equipmenthistory',
+            index=models.Index(fields=['equipment_name', '-recorded_at'], name='equiphist_name_recorded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmenthistory',
+            index=models.Index(fields=['recorded_at'], name='equiphist_recorded_idx'),
+        ),
+    ]
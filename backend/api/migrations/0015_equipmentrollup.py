@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_equipmenthistory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=10)),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('equipment_type', models.CharField(max_length=100)),
+                ('bucket', models.DateTimeField(help_text='Start of the hour or day')),
+                ('count', models.IntegerField(default=0)),
+                ('last_recorded_at', models.DateTimeField()),
+                ('pressure_min', models.FloatField()),
+                ('pressure_max', models.FloatField()),
+                ('pressure_sum', models.FloatField()),
+                ('pressure_last', models.FloatField()),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('temperature_sum', models.FloatField()),
+                ('temperature_last', models.FloatField()),
+                ('flowrate_min', models.FloatField()),
+                ('flowrate_max', models.FloatField()),
+                ('flowrate_sum', models.FloatField()),
+                ('flowrate_last', models.FloatField()),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='rollup_resolution_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'equipment_name', 'bucket'), name='unique_rollup_bucket')],
+            },
+        ),
+    ]
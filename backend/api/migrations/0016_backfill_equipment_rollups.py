@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Rollups used to be backfilled here. They are now keyed by equipment id,
+    so the backfill runs in 0020 once the Equipment table is populated.
+    """
+
+    dependencies = [
+        ('api', '0015_equipmentrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, migrations.RunPython.noop),
+    ]
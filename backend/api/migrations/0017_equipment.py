@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_backfill_equipment_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Equipment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+                ('equipment_type', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Equipment',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='alertlog',
+            name='equipment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alert_logs', to='api.equipment'),
+        ),
+        migrations.AddField(
+            model_name='equipmenthistory',
+            name='equipment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='api.equipment'),
+        ),
+        migrations.AddField(
+            model_name='equipmentrollup',
+            name='equipment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.equipment'),
+        ),
+        migrations.AddField(
+            model_name='maintenanceschedule',
+            name='equipment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='maintenance_schedules', to='api.equipment'),
+        ),
+    ]
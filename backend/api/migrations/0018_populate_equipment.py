@@ -0,0 +1,70 @@
+from django.db import migrations
+
+
+# Copies of the api.equipment name helpers as of this migration
+def normalize_name(name):
+    return ' '.join(str(name).split()).casefold()
+
+
+def display_name(name):
+    return ' '.join(str(name).split()) or 'Unknown'
+
+
+def forwards(apps, schema_editor):
+    """Create Equipment from the names in use and point history and schedules at it"""
+    Equipment = apps.get_model('api', 'Equipment')
+    EquipmentHistory = apps.get_model('api', 'EquipmentHistory')
+    EquipmentRollup = apps.get_model('api', 'EquipmentRollup')
+    MaintenanceSchedule = apps.get_model('api', 'MaintenanceSchedule')
+    AlertLog = apps.get_model('api', 'AlertLog')
+
+    # Distinct spellings per table; spellings that normalize alike share one Equipment
+    spellings = {}
+    for model in (EquipmentHistory, MaintenanceSchedule):
+        for name, equipment_type in model.objects.values_list('equipment_name', 'equipment_type').distinct():
+            spellings.setdefault(name, equipment_type)
+
+    equipment = {}
+    for name, equipment_type in sorted(spellings.items()):
+        key = normalize_name(name)
+        if key not in equipment:
+            equipment[key] = Equipment.objects.create(
+                name=display_name(name), normalized_name=key, equipment_type=equipment_type or ''
+            )
+        elif equipment_type and not equipment[key].equipment_type:
+            equipment[key].equipment_type = equipment_type
+            equipment[key].save(update_fields=['equipment_type'])
+
+    # One UPDATE per spelling, through the existing name indexes
+    for name in spellings:
+        target = equipment[normalize_name(name)]
+        EquipmentHistory.objects.filter(equipment_name=name).update(equipment=target)
+        MaintenanceSchedule.objects.filter(equipment_name=name).update(equipment=target)
+
+    # Alerts also carry labels like "3 equipment" or digests; only link real equipment
+    for name in AlertLog.objects.values_list('equipment_name', flat=True).distinct():
+        target = equipment.get(normalize_name(name))
+        if target is not None:
+            AlertLog.objects.filter(equipment_name=name).update(equipment=target)
+
+    # Rebuilt per equipment id in 0020
+    EquipmentRollup.objects.all().delete()
+
+
+def backwards(apps, schema_editor):
+    Equipment = apps.get_model('api', 'Equipment')
+    for equipment in Equipment.objects.all():
+        equipment.history.update(equipment_name=equipment.name)
+        equipment.maintenance_schedules.update(equipment_name=equipment.name, equipment_type=equipment.equipment_type)
+    apps.get_model('api', 'EquipmentRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_equipment'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
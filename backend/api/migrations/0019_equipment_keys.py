@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_populate_equipment'),
+    ]
+
+    # Defaults on the name columns let the migration be reversed; 0018 fills them back in.
+    # Readings keep the type they were reported with.
+    operations = [
+        migrations.AlterField(
+            model_name='equipmenthistory',
+            name='equipment_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='equipmenthistory',
+            name='equipment_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='equipmentrollup',
+            name='equipment_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='equipmentrollup',
+            name='equipment_type',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='maintenanceschedule',
+            name='equipment_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='maintenanceschedule',
+            name='equipment_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RemoveConstraint(
+            model_name='equipmentrollup',
+            name='unique_rollup_bucket',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmenthistory',
+            name='equiphist_name_recorded_idx',
+        ),
+        migrations.RemoveField(
+            model_name='equipmenthistory',
+            name='equipment_name',
+        ),
+        migrations.RemoveField(
+            model_name='equipmentrollup',
+            name='equipment_name',
+        ),
+        migrations.RemoveField(
+            model_name='equipmentrollup',
+            name='equipment_type',
+        ),
+        migrations.RemoveField(
+            model_name='maintenanceschedule',
+            name='equipment_name',
+        ),
+        migrations.RemoveField(
+            model_name='maintenanceschedule',
+            name='equipment_type',
+        ),
+        migrations.AlterField(
+            model_name='equipmenthistory',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='api.equipment'),
+        ),
+        migrations.AlterField(
+            model_name='equipmentrollup',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='api.equipment'),
+        ),
+        migrations.AlterField(
+            model_name='maintenanceschedule',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='maintenance_schedules', to='api.equipment'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmenthistory',
+            index=models.Index(fields=['equipment', '-recorded_at'], name='equiphist_equip_recorded_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentrollup',
+            constraint=models.UniqueConstraint(fields=('resolution', 'equipment', 'bucket'), name='unique_rollup_equipment_bucket'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+from django.db import migrations
+
+
+# Copies of the api.rollups helpers as of this migration (buckets keyed by
+# equipment id), so later changes to the app code cannot alter what it does
+
+FREQUENCIES = {'day': 'D', 'hour': 'h'}
+METRICS = ['pressure', 'temperature', 'flowrate']
+STATS = ['min', 'max', 'sum', 'last']
+KEY = ['equipment_id', 'bucket']
+
+
+def aggregate(frame, frequency):
+    """Per-(equipment, bucket) aggregates of a chunk of history rows"""
+    import pandas as pd
+
+    frame = frame.sort_values('recorded_at', kind='stable')
+    frame = frame.assign(bucket=pd.to_datetime(frame['recorded_at'], utc=True).dt.floor(frequency))
+    grouped = frame.groupby(KEY, sort=False)
+    aggregates = grouped[METRICS].agg(STATS)
+    aggregates.columns = [f'{metric}_{stat}' for metric, stat in aggregates.columns]
+    aggregates['count'] = grouped.size()
+    aggregates['last_recorded_at'] = grouped['recorded_at'].max()
+    return aggregates.reset_index()
+
+
+def combine(parts):
+    """Merge chunk aggregates that may cover the same buckets"""
+    import pandas as pd
+
+    frame = pd.concat(parts).sort_values('last_recorded_at', kind='stable')
+    how = {f'{metric}_{stat}': stat for metric in METRICS for stat in STATS}
+    how.update({'count': 'sum', 'last_recorded_at': 'max'})
+    return frame.groupby(KEY, sort=False).agg(how).reset_index()
+
+
+def history_aggregates(queryset, chunk_rows):
+    """``{resolution: aggregates}`` over a history queryset, read in primary-key chunks"""
+    import numpy as np
+    import pandas as pd
+
+    fields = ['id', 'equipment_id', 'recorded_at'] + METRICS
+    parts = {resolution: [] for resolution in FREQUENCIES}
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_rows])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        frame = pd.DataFrame.from_records(chunk, columns=fields).drop(columns='id')
+        frame[METRICS] = frame[METRICS].astype(np.float64)
+        for resolution, frequency in FREQUENCIES.items():
+            parts[resolution].append(aggregate(frame, frequency))
+    return {resolution: combine(frames) for resolution, frames in parts.items() if frames}
+
+
+def new_rollups(model, aggregates, resolution):
+    """Unsaved rollup instances of ``model`` for aggregate rows"""
+    import pandas as pd
+
+    rollups = []
+    for row in aggregates.to_dict(orient='records'):
+        row['bucket'] = pd.Timestamp(row['bucket']).to_pydatetime()
+        row['last_recorded_at'] = pd.Timestamp(row['last_recorded_at']).to_pydatetime()
+        rollups.append(model(resolution=resolution, **row))
+    return rollups
+
+
+def forwards(apps, schema_editor):
+    """Build the hourly/daily rollups per equipment id from raw history"""
+    EquipmentHistory = apps.get_model('api', 'EquipmentHistory')
+    EquipmentRollup = apps.get_model('api', 'EquipmentRollup')
+    aggregates = history_aggregates(EquipmentHistory.objects.all(), chunk_rows=100000)
+    for resolution, frame in aggregates.items():
+        EquipmentRollup.objects.bulk_create(new_rollups(EquipmentRollup, frame, resolution), batch_size=1000)
+
+
+def backwards(apps, schema_editor):
+    apps.get_model('api', 'EquipmentRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_equipment_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
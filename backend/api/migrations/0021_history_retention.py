@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_backfill_equipment_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='archives/')),
+                ('rows', models.IntegerField(default=0)),
+                ('first_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('last_recorded_at', models.DateTimeField(blank=True, null=True)),
+                ('archived_before', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'History Archives',
+                'ordering': ['-archived_before'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='equipmenthistory',
+            name='upload_session',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='equipment_records', to='api.uploadhistory'),
+        ),
+    ]
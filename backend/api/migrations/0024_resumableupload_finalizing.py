@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_configversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resumableupload',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('finalizing', 'Finalizing'), ('finalized', 'Finalized')], default='active', max_length=20),
+        ),
+    ]
@@ -0,0 +1,84 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copies of the api.equipment name helpers as of this migration
+def normalize_name(name):
+    return ' '.join(str(name).split()).casefold()
+
+
+def display_name(name):
+    return ' '.join(str(name).split()) or 'Unknown'
+
+
+def forwards(apps, schema_editor):
+    """Point alert states at Equipment; spellings of the same equipment and level merge into the latest state"""
+    Equipment = apps.get_model('api', 'Equipment')
+    EquipmentAlertState = apps.get_model('api', 'EquipmentAlertState')
+
+    kept = {}
+    for state in EquipmentAlertState.objects.order_by('last_alerted_at', 'id'):
+        key = normalize_name(state.equipment_name)
+        equipment, _ = Equipment.objects.get_or_create(
+            normalized_name=key, defaults={'name': display_name(state.equipment_name)}
+        )
+        earlier = kept.get((equipment.pk, state.level))
+        if earlier is not None:
+            state.total_suppressed += earlier.total_suppressed
+            earlier.delete()
+        state.equipment = equipment
+        state.save(update_fields=['equipment', 'total_suppressed'])
+        kept[(equipment.pk, state.level)] = state
+
+
+def backwards(apps, schema_editor):
+    """One state per equipment again: keep the most recent level"""
+    EquipmentAlertState = apps.get_model('api', 'EquipmentAlertState')
+    seen = set()
+    for state in EquipmentAlertState.objects.select_related('equipment').order_by('-last_alerted_at', '-id'):
+        if state.equipment_id in seen:
+            state.delete()
+            continue
+        seen.add(state.equipment_id)
+        state.equipment_name = state.equipment.name
+        state.save(update_fields=['equipment_name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_resumableupload_finalizing'),
+    ]
+
+    # The name column loses its unique constraint and gains a default so the
+    # migration can be reversed; backwards() fills it back in.
+    operations = [
+        migrations.AddField(
+            model_name='equipmentalertstate',
+            name='equipment',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='api.equipment'),
+        ),
+        migrations.AlterField(
+            model_name='equipmentalertstate',
+            name='equipment_name',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.AlterModelOptions(
+            name='equipmentalertstate',
+            options={'ordering': ['equipment__name', 'level']},
+        ),
+        migrations.RemoveField(
+            model_name='equipmentalertstate',
+            name='equipment_name',
+        ),
+        migrations.AlterField(
+            model_name='equipmentalertstate',
+            name='equipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_states', to='api.equipment'),
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentalertstate',
+            constraint=models.UniqueConstraint(fields=('equipment', 'level'), name='unique_alert_state'),
+        ),
+    ]
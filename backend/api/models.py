@@ -1,10 +1,18 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
 
 class UploadHistory(models.Model):
     filename = models.CharField(max_length=255)
     upload_date = models.DateTimeField(auto_now_add=True)
     summary_data = models.JSONField()
     file = models.FileField(upload_to='uploads/')
+    # Per-row equipment data as a compressed columnar archive (see api/storage.py)
+    data_file = models.FileField(upload_to='columnar/', blank=True)
+    # SHA-256 of the uploaded file and the thresholds it was analyzed with, for deduplication
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    threshold_version = models.CharField(max_length=64, blank=True)
 
     def __str__(self):
         return f"{self.filename} - {self.upload_date}"
@@ -28,15 +36,65 @@ class ThresholdSettings(models.Model):
         verbose_name_plural = "Threshold Settings"
 
 
+class ConfigVersion(models.Model):
+    """Single row counting configuration changes; workers compare it with their cached snapshot (api/config.py)"""
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Configuration version {self.version}"
+
+
+class ThresholdProfile(models.Model):
+    """Threshold overrides for one equipment Type; empty fields fall back to the default thresholds"""
+    equipment_type = models.CharField(max_length=100, unique=True)
+    pressure_warning = models.FloatField(null=True, blank=True)
+    pressure_critical = models.FloatField(null=True, blank=True)
+    temperature_warning = models.FloatField(null=True, blank=True)
+    temperature_critical = models.FloatField(null=True, blank=True)
+    flowrate_min = models.FloatField(null=True, blank=True)
+    flowrate_max = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Threshold profile: {self.equipment_type}"
+
+    class Meta:
+        ordering = ['equipment_type']
+
+
+class Equipment(models.Model):
+    """One piece of equipment, referenced by history, rollups, maintenance and alerts"""
+    name = models.CharField(max_length=255)
+    # Lower-cased with whitespace collapsed; what names are matched on (see api/equipment.py)
+    normalized_name = models.CharField(max_length=255, unique=True)
+    # Type when first seen; readings keep the type reported with them
+    equipment_type = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = "Equipment"
+
+
 class EquipmentHistory(models.Model):
     """Historical tracking of equipment parameters over time"""
-    equipment_name = models.CharField(max_length=255)
-    equipment_type = models.CharField(max_length=100)
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='history')
+    # Type as reported with this reading, so a later upload cannot retype older history
+    equipment_type = models.CharField(max_length=100, blank=True)
     pressure = models.FloatField()
     temperature = models.FloatField()
     flowrate = models.FloatField()
     recorded_at = models.DateTimeField(auto_now_add=True)
-    upload_session = models.ForeignKey(UploadHistory, on_delete=models.CASCADE, related_name='equipment_records', null=True)
+    # Pruning an upload keeps its readings for trends (see api/retention.py)
+    upload_session = models.ForeignKey(UploadHistory, on_delete=models.SET_NULL, related_name='equipment_records', null=True)
+
+    @property
+    def equipment_name(self):
+        return self.equipment.name
 
     def __str__(self):
         return f"{self.equipment_name} - {self.recorded_at}"
@@ -44,6 +102,75 @@ class EquipmentHistory(models.Model):
     class Meta:
         verbose_name_plural = "Equipment Histories"
         ordering = ['-recorded_at']
+        indexes = [
+            # Per-equipment series, newest first, bounded by a time window
+            models.Index(fields=['equipment', '-recorded_at'], name='equiphist_equip_recorded_idx'),
+            # Fleet-wide time windows
+            models.Index(fields=['recorded_at'], name='equiphist_recorded_idx'),
+        ]
+
+
+class EquipmentRollup(models.Model):
+    """
+    Hourly or daily aggregate of one equipment's readings (see api/rollups.py).
+    Sums are kept instead of means so buckets can be merged incrementally.
+    """
+    RESOLUTION_CHOICES = [
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ]
+
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='rollups')
+    bucket = models.DateTimeField(help_text="Start of the hour or day")
+    count = models.IntegerField(default=0)
+    last_recorded_at = models.DateTimeField()
+
+    pressure_min = models.FloatField()
+    pressure_max = models.FloatField()
+    pressure_sum = models.FloatField()
+    pressure_last = models.FloatField()
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    temperature_sum = models.FloatField()
+    temperature_last = models.FloatField()
+    flowrate_min = models.FloatField()
+    flowrate_max = models.FloatField()
+    flowrate_sum = models.FloatField()
+    flowrate_last = models.FloatField()
+
+    def __str__(self):
+        return f"{self.equipment} - {self.resolution} {self.bucket}"
+
+    class Meta:
+        ordering = ['-bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'equipment', 'bucket'], name='unique_rollup_equipment_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket'], name='rollup_resolution_bucket_idx'),
+        ]
+
+
+class HistoryArchive(models.Model):
+    """
+    Raw EquipmentHistory rows moved out of the database by retention, stored
+    as a compressed columnar file (see api/retention.py)
+    """
+    file = models.FileField(upload_to='archives/')
+    rows = models.IntegerField(default=0)
+    first_recorded_at = models.DateTimeField(null=True, blank=True)
+    last_recorded_at = models.DateTimeField(null=True, blank=True)
+    # Every raw row recorded before this moment is archived
+    archived_before = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archive before {self.archived_before} - {self.rows} rows"
+
+    class Meta:
+        ordering = ['-archived_before']
+        verbose_name_plural = "History Archives"
 
 
 class AlertSettings(models.Model):
@@ -81,7 +208,10 @@ class AlertLog(models.Model):
     ]
     
     alert_type = models.CharField(max_length=20, choices=ALERT_TYPE_CHOICES)
+    # Label as sent; alerts may also name groups ("3 equipment") or digests
     equipment_name = models.CharField(max_length=255)
+    # Set when the alert is about one known piece of equipment
+    equipment = models.ForeignKey(Equipment, on_delete=models.SET_NULL, related_name='alert_logs', null=True, blank=True)
     message = models.TextField()
     sent_to = models.EmailField()
     sent_at = models.DateTimeField(auto_now_add=True)
@@ -111,8 +241,7 @@ class MaintenanceSchedule(models.Model):
         ('critical', 'Critical'),
     ]
     
-    equipment_name = models.CharField(max_length=255)
-    equipment_type = models.CharField(max_length=100, blank=True)
+    equipment = models.ForeignKey(Equipment, on_delete=models.PROTECT, related_name='maintenance_schedules')
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     scheduled_date = models.DateField()
@@ -127,9 +256,163 @@ class MaintenanceSchedule(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @property
+    def equipment_name(self):
+        return self.equipment.name
+
+    @property
+    def equipment_type(self):
+        return self.equipment.equipment_type
+
     def __str__(self):
         return f"{self.title} - {self.equipment_name} - {self.scheduled_date}"
 
     class Meta:
         ordering = ['scheduled_date', 'scheduled_time']
         verbose_name_plural = "Maintenance Schedules"
+
+
+class UploadJob(models.Model):
+    """Background processing job for an asynchronous CSV upload"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    STAGE_CHOICES = [
+        ('queued', 'Queued'),
+        ('parsing', 'Parsing'),
+        ('scoring', 'Scoring'),
+        ('persisting', 'Persisting'),
+        ('alerting', 'Sending Alerts'),
+        ('done', 'Done'),
+    ]
+
+    filename = models.CharField(max_length=255)
+    file = models.FileField(upload_to='jobs/')
+    streaming = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='queued')
+    progress = models.FloatField(default=0.0, help_text="Percent complete")
+    rows_processed = models.IntegerField(default=0)
+    ingest_metrics = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    upload = models.ForeignKey(UploadHistory, on_delete=models.SET_NULL, related_name='jobs', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched by the worker while the job runs; a stale heartbeat means the worker is gone
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Job {self.pk} - {self.filename} - {self.status}"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class ResumableUpload(models.Model):
+    """Chunked upload session that survives dropped connections"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('finalizing', 'Finalizing'),
+        ('finalized', 'Finalized'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(help_text="Size of the complete file in bytes")
+    chunk_size = models.IntegerField(help_text="Size of every chunk except the last, in bytes")
+    checksum = models.CharField(max_length=64, blank=True, help_text="Optional SHA-256 of the complete file")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def expected_chunk_size(self, index):
+        if index == self.total_chunks - 1:
+            return self.total_size - index * self.chunk_size
+        return self.chunk_size
+
+    def __str__(self):
+        return f"{self.filename} - {self.status}"
+
+    class Meta:
+        ordering = ['-created_at']
+
+
+class AlertOutbox(models.Model):
+    """Alert email waiting to be sent by the background dispatcher"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    alert_type = models.CharField(max_length=20, choices=AlertLog.ALERT_TYPE_CHOICES)
+    equipment_name = models.CharField(max_length=255)
+    message = models.TextField()
+    email_address = models.EmailField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.alert_type} - {self.equipment_name} - {self.status}"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+
+
+class AlertDigestEvent(models.Model):
+    """Alert held back for the next hourly/daily digest; repeats per equipment are collapsed"""
+    alert_type = models.CharField(max_length=20, choices=AlertLog.ALERT_TYPE_CHOICES)
+    equipment_name = models.CharField(max_length=255)
+    message = models.TextField(help_text="Most recent message for this equipment")
+    occurrences = models.IntegerField(default=1)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.alert_type} - {self.equipment_name} x{self.occurrences}"
+
+    class Meta:
+        ordering = ['first_seen']
+        constraints = [
+            models.UniqueConstraint(fields=['alert_type', 'equipment_name'], name='unique_digest_event'),
+        ]
+
+
+class EquipmentAlertState(models.Model):
+    """Last alert sent per equipment and level, used to suppress repeats within the cooldown window"""
+    LEVEL_CHOICES = [
+        ('warning', 'Warning'),
+        ('critical', 'Critical'),
+    ]
+
+    equipment = models.ForeignKey(Equipment, on_delete=models.CASCADE, related_name='alert_states')
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    last_alerted_at = models.DateTimeField()
+    suppressed_count = models.IntegerField(default=0, help_text="Repeat alerts suppressed since the last one sent")
+    total_suppressed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.equipment} - {self.level}"
+
+    class Meta:
+        ordering = ['equipment__name', 'level']
+        constraints = [
+            models.UniqueConstraint(fields=['equipment', 'level'], name='unique_alert_state'),
+        ]
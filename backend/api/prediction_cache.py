@@ -0,0 +1,92 @@
+"""
+Memoized maintenance predictions.
+
+``PredictMaintenanceView`` scores the latest upload on every call. Results
+are kept in a process-local LRU keyed by ``(upload id, threshold version)``
+and bounded by ``PREDICTION_CACHE_SIZE`` entries. The threshold version in
+the key keeps other workers from serving results for stale thresholds;
+saving thresholds or profiles also empties this process's cache right away,
+and saving or deleting an upload drops its entries.
+
+Alongside the results, the per-row scores of the most recently predicted
+uploads (``PREDICTION_SCORER_CACHE_SIZE``) are kept as ``IncrementalScores``,
+so a threshold change re-scores only the rows it can affect. These survive
+threshold changes on purpose.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings as django_settings
+from django.db.models.signals import post_delete, post_save
+
+from .models import ThresholdProfile, ThresholdSettings, UploadHistory
+
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_scorers = OrderedDict()
+
+
+def get(upload_id, version):
+    """Cached result for an upload under a threshold version, or None"""
+    key = (upload_id, version)
+    with _lock:
+        result = _entries.get(key)
+        if result is not None:
+            _entries.move_to_end(key)
+        return result
+
+
+def put(upload_id, version, result):
+    with _lock:
+        _entries[(upload_id, version)] = result
+        _entries.move_to_end((upload_id, version))
+        while len(_entries) > django_settings.PREDICTION_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def take_scorer(upload_id):
+    """
+    Remove and return the kept ``IncrementalScores`` of an upload, or None.
+    The caller has exclusive use of it until it is handed back with
+    ``keep_scorer``.
+    """
+    with _lock:
+        return _scorers.pop(upload_id, None)
+
+
+def keep_scorer(upload_id, scorer):
+    with _lock:
+        _scorers[upload_id] = scorer
+        while len(_scorers) > django_settings.PREDICTION_SCORER_CACHE_SIZE:
+            _scorers.popitem(last=False)
+
+
+def clear(scorers=False):
+    with _lock:
+        _entries.clear()
+        if scorers:
+            _scorers.clear()
+
+
+def discard_upload(upload_id):
+    with _lock:
+        for key in [key for key in _entries if key[0] == upload_id]:
+            del _entries[key]
+        _scorers.pop(upload_id, None)
+
+
+def _thresholds_changed(sender, **kwargs):
+    clear()
+
+
+def _upload_changed(sender, instance, **kwargs):
+    # Also on creation, in case the database hands out a previously used id
+    discard_upload(instance.pk)
+
+
+post_save.connect(_thresholds_changed, sender=ThresholdSettings, dispatch_uid='predictions_thresholds_saved')
+post_save.connect(_thresholds_changed, sender=ThresholdProfile, dispatch_uid='predictions_profile_saved')
+post_delete.connect(_thresholds_changed, sender=ThresholdProfile, dispatch_uid='predictions_profile_deleted')
+post_save.connect(_upload_changed, sender=UploadHistory, dispatch_uid='predictions_upload_saved')
+post_delete.connect(_upload_changed, sender=UploadHistory, dispatch_uid='predictions_upload_deleted')
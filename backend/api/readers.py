@@ -0,0 +1,324 @@
+"""
+Upload readers: format detection, streaming decompression and columnar formats.
+
+Compressed uploads (gzip, zstd, single-member zip) are recognised by their
+magic bytes and decompressed as a stream straight into the CSV parser, so
+the decompressed file never exists on disk or in memory as a whole. The
+stored upload keeps its compressed form.
+
+Parquet and Arrow IPC uploads skip text parsing entirely and only the
+required columns are read from them.
+
+CSV uploads are parsed with a typed profile: only the required columns
+(plus ``UPLOAD_EXTRA_COLUMNS``) are read, numeric fields get a declared
+float dtype and ``Type`` is categorical. The pyarrow CSV reader is used
+when available. Malformed numeric cells are reported as structured
+validation errors.
+"""
+import gzip
+import zipfile
+from contextlib import contextmanager
+
+import pandas as pd
+from django.conf import settings as django_settings
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd uploads need the 'zstandard' package
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:  # optional: Parquet/Arrow uploads need the 'pyarrow' package
+    pa = None
+
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Cap on the number of malformed cells reported back to the client
+MAX_VALIDATION_ERRORS = 50
+
+
+class UploadValidationError(ValueError):
+    """Upload rejected because of malformed cells; ``errors`` lists them"""
+
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZIP_MAGIC = b'PK\x03\x04'
+PARQUET_MAGIC = b'PAR1'
+ARROW_FILE_MAGIC = b'ARROW1'
+ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+
+# Rough decompressed/compressed size ratio for CSV exports, used when deciding
+# whether a compressed upload is large enough to need the streaming path
+COMPRESSED_SIZE_RATIO = 10
+
+
+def detect_compression(file_obj):
+    """Return 'gzip', 'zstd', 'zip' or None based on the file's leading bytes"""
+    file_obj.seek(0)
+    head = file_obj.read(4)
+    file_obj.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    if head.startswith(ZIP_MAGIC):
+        return 'zip'
+    return None
+
+
+def detect_format(file_obj):
+    """Return 'parquet', 'arrow', 'arrow_stream' or 'csv' based on the file's leading bytes"""
+    file_obj.seek(0)
+    head = file_obj.read(6)
+    file_obj.seek(0)
+    if head.startswith(PARQUET_MAGIC):
+        return 'parquet'
+    if head.startswith(ARROW_FILE_MAGIC):
+        return 'arrow'
+    if head.startswith(ARROW_STREAM_MAGIC):
+        return 'arrow_stream'
+    return 'csv'
+
+
+def estimated_size(file_obj):
+    """Approximate decompressed size of an upload in bytes"""
+    if detect_compression(file_obj):
+        return file_obj.size * COMPRESSED_SIZE_RATIO
+    return file_obj.size
+
+
+def _zip_member(archive):
+    members = [info for info in archive.infolist() if not info.is_dir()]
+    if len(members) != 1:
+        raise ValueError(f"Zip uploads must contain exactly one file, found {len(members)}")
+    return members[0]
+
+
+@contextmanager
+def open_upload_stream(file_obj):
+    """
+    Yield a binary stream of the upload's decompressed content.
+
+    Plain files are yielded as-is (rewound). Raises ValueError for zip
+    archives without exactly one member, or zstd without 'zstandard'.
+    """
+    compression = detect_compression(file_obj)
+    try:
+        if compression == 'gzip':
+            with gzip.GzipFile(fileobj=file_obj, mode='rb') as stream:
+                yield stream
+        elif compression == 'zstd':
+            if zstandard is None:
+                raise ValueError("zstd uploads require the 'zstandard' package")
+            with zstandard.ZstdDecompressor().stream_reader(file_obj, closefd=False) as stream:
+                yield stream
+        elif compression == 'zip':
+            with zipfile.ZipFile(file_obj) as archive:
+                with archive.open(_zip_member(archive)) as stream:
+                    yield stream
+        else:
+            yield file_obj
+    finally:
+        file_obj.seek(0)
+
+
+def read_csv_header(file_obj):
+    """Return the column names of a CSV upload without reading its body"""
+    with open_upload_stream(file_obj) as stream:
+        return list(pd.read_csv(stream, nrows=0).columns)
+
+
+def _require_pyarrow(fmt):
+    if pa is None:
+        raise ValueError(f"{fmt} uploads require the 'pyarrow' package")
+
+
+def _to_frame(table):
+    """Arrow table/batch to pandas, with ``Type`` as a categorical column"""
+    df = table.to_pandas()
+    if 'Type' in df.columns and not isinstance(df['Type'].dtype, pd.CategoricalDtype):
+        df['Type'] = df['Type'].astype('category')
+    return _finalize(df)
+
+
+def _finalize(df):
+    """
+    Give a categorical ``Type`` an empty-string category when it has missing
+    values, so downstream ``fillna('')`` keeps working.
+    """
+    if 'Type' in df.columns and isinstance(df['Type'].dtype, pd.CategoricalDtype):
+        if df['Type'].hasnans and '' not in df['Type'].cat.categories:
+            df['Type'] = df['Type'].cat.add_categories([''])
+    return df
+
+
+def wanted_columns():
+    """Columns kept from an upload in any format: the required ones plus ``UPLOAD_EXTRA_COLUMNS``"""
+    return set(REQUIRED_COLUMNS) | set(django_settings.UPLOAD_EXTRA_COLUMNS)
+
+
+def parse_columns(header):
+    """Columns of a file's header (CSV, Parquet or Arrow) that are read, in file order"""
+    wanted = wanted_columns()
+    return [col for col in header if col in wanted]
+
+
+def _pandas_dtypes(columns):
+    dtypes = {col: django_settings.UPLOAD_NUMERIC_DTYPE for col in NUMERIC_COLUMNS if col in columns}
+    if 'Type' in columns:
+        dtypes['Type'] = 'category'
+    return dtypes
+
+
+def _arrow_convert_options(columns):
+    numeric = pa.float32() if django_settings.UPLOAD_NUMERIC_DTYPE == 'float32' else pa.float64()
+    column_types = {col: numeric for col in NUMERIC_COLUMNS if col in columns}
+    if 'Type' in columns:
+        column_types['Type'] = pa.dictionary(pa.int32(), pa.string())
+    # strings_can_be_null matches pandas, where empty text cells become NaN
+    return pacsv.ConvertOptions(include_columns=columns, column_types=column_types, strings_can_be_null=True)
+
+
+def find_invalid_numeric_cells(file_obj, columns, limit=MAX_VALIDATION_ERRORS):
+    """
+    Re-scan a CSV upload with numeric columns read as text and list the cells
+    that cannot be parsed as numbers. Only used on the error path.
+    """
+    numeric = [col for col in NUMERIC_COLUMNS if col in columns]
+    errors = []
+    rows_seen = 0
+    with open_upload_stream(file_obj) as stream:
+        for chunk in pd.read_csv(stream, usecols=numeric, dtype=str, chunksize=100_000):
+            for col in numeric:
+                raw = chunk[col]
+                bad = raw.notna() & pd.to_numeric(raw, errors='coerce').isna()
+                for position in bad.to_numpy().nonzero()[0].tolist():
+                    errors.append({
+                        # Line 1 is the header
+                        "line": rows_seen + position + 2,
+                        "column": col,
+                        "value": raw.iloc[position],
+                        "message": f"'{raw.iloc[position]}' is not a number",
+                    })
+            rows_seen += len(chunk)
+            if len(errors) >= limit:
+                break
+    errors.sort(key=lambda error: error["line"])
+    return errors[:limit]
+
+
+def _iter_csv_frames(file_obj, chunk_rows=None):
+    """Typed, projected CSV parse; one frame, or chunks of ``chunk_rows`` rows"""
+    header = read_csv_header(file_obj)
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}")
+    columns = parse_columns(header)
+
+    try:
+        with open_upload_stream(file_obj) as stream:
+            if pa is not None:
+                convert = _arrow_convert_options(columns)
+                if chunk_rows is None:
+                    yield _to_frame(pacsv.read_csv(stream, convert_options=convert))
+                else:
+                    for batch in pacsv.open_csv(stream, convert_options=convert):
+                        # Reader batches are sized in bytes; re-slice to the chunk size
+                        for start in range(0, batch.num_rows, chunk_rows):
+                            yield _to_frame(batch.slice(start, chunk_rows))
+            else:
+                # round_trip parsing gives the same floats as the pyarrow reader
+                options = {'usecols': columns, 'dtype': _pandas_dtypes(columns), 'float_precision': 'round_trip'}
+                if chunk_rows is None:
+                    yield _finalize(pd.read_csv(stream, **options))
+                else:
+                    for chunk in pd.read_csv(stream, chunksize=chunk_rows, **options):
+                        yield _finalize(chunk)
+    except ValueError as exc:
+        errors = find_invalid_numeric_cells(file_obj, columns)
+        if errors:
+            raise UploadValidationError(
+                f"Upload has {len(errors)}{'+' if len(errors) >= MAX_VALIDATION_ERRORS else ''} malformed numeric value(s)",
+                errors,
+            ) from exc
+        raise
+
+
+def _arrow_reader(file_obj, fmt):
+    file_obj.seek(0)
+    if fmt == 'arrow':
+        return pa.ipc.open_file(file_obj)
+    return pa.ipc.open_stream(file_obj)
+
+
+def upload_columns(file_obj):
+    """Column names of an upload in any supported format, without reading its rows"""
+    fmt = detect_format(file_obj)
+    if fmt == 'csv':
+        return read_csv_header(file_obj)
+    _require_pyarrow(fmt)
+    try:
+        if fmt == 'parquet':
+            return pq.ParquetFile(file_obj).schema_arrow.names
+        return _arrow_reader(file_obj, fmt).schema.names
+    finally:
+        file_obj.seek(0)
+
+
+def read_upload_frame(file_obj):
+    """Read a whole upload into a DataFrame"""
+    fmt = detect_format(file_obj)
+    if fmt == 'csv':
+        # Exhaust the generator so the stream is closed and the file rewound
+        frames = list(_iter_csv_frames(file_obj))
+        return frames[0]
+
+    _require_pyarrow(fmt)
+    try:
+        if fmt == 'parquet':
+            parquet = pq.ParquetFile(file_obj)
+            table = parquet.read(columns=parse_columns(parquet.schema_arrow.names))
+        else:
+            reader = _arrow_reader(file_obj, fmt)
+            table = reader.read_all()
+            table = table.select(parse_columns(table.schema.names))
+        return _to_frame(table)
+    finally:
+        file_obj.seek(0)
+
+
+def iter_upload_frames(file_obj, chunk_rows):
+    """Yield an upload as DataFrames of at most ``chunk_rows`` rows"""
+    fmt = detect_format(file_obj)
+    if fmt == 'csv':
+        yield from _iter_csv_frames(file_obj, chunk_rows)
+        return
+
+    _require_pyarrow(fmt)
+    try:
+        if fmt == 'parquet':
+            parquet = pq.ParquetFile(file_obj)
+            columns = parse_columns(parquet.schema_arrow.names)
+            for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+                yield _to_frame(batch)
+        else:
+            reader = _arrow_reader(file_obj, fmt)
+            columns = parse_columns(reader.schema.names)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches)) if fmt == 'arrow' else reader
+            for batch in batches:
+                batch = batch.select(columns)
+                # IPC batch sizes are set by the writer; re-slice to the chunk size
+                for start in range(0, batch.num_rows, chunk_rows):
+                    yield _to_frame(batch.slice(start, chunk_rows))
+    finally:
+        file_obj.seek(0)
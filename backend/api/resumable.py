@@ -0,0 +1,212 @@
+"""
+Resumable chunked uploads.
+
+A client opens a ``ResumableUpload`` session with the file's total size and
+chunk size, then PUTs numbered chunks in any order, each with its SHA-256.
+Chunks are written to their own files under ``RESUMABLE_UPLOAD_DIR`` so a
+dropped connection only loses the chunk in flight; the client asks which
+byte ranges arrived and sends the rest. Finalizing concatenates the chunks
+into one file that goes through the normal upload pipeline.
+
+Finalizing claims the session (``active`` -> ``finalizing``) with a
+conditional update so concurrent finalize calls cannot both run it. The
+chunks are only discarded once the pipeline accepted the file; on failure
+the session goes back to ``active`` and can be finalized again. Sessions
+untouched for ``RESUMABLE_UPLOAD_TTL_SECONDS`` are expired with their chunks.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings as django_settings
+from django.utils import timezone
+
+from .models import ResumableUpload
+
+
+# Read size used when streaming request bodies and chunk files
+_COPY_BUFFER = 1024 * 1024
+
+
+class ChunkError(ValueError):
+    """A chunk was rejected (bad index, size or checksum)"""
+
+
+def session_dir(session):
+    return Path(django_settings.RESUMABLE_UPLOAD_DIR) / str(session.pk)
+
+
+def _chunk_path(session, index):
+    return session_dir(session) / f'{index:06d}.part'
+
+
+def save_chunk(session, index, stream, expected_sha256=None):
+    """
+    Write chunk ``index`` of a session from a binary stream.
+
+    The body is copied in pieces to a temporary file and only moved into
+    place once its size and checksum are verified, so a partial chunk is
+    never recorded as received. Re-sending a chunk replaces it.
+    """
+    if not 0 <= index < session.total_chunks:
+        raise ChunkError(f"Chunk index {index} out of range (0-{session.total_chunks - 1})")
+
+    expected_size = session.expected_chunk_size(index)
+    directory = session_dir(session)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            while True:
+                block = stream.read(_COPY_BUFFER)
+                if not block:
+                    break
+                size += len(block)
+                if size > expected_size:
+                    raise ChunkError(f"Chunk {index} is larger than the expected {expected_size} bytes")
+                digest.update(block)
+                out.write(block)
+
+        if size != expected_size:
+            raise ChunkError(f"Chunk {index} has {size} bytes, expected {expected_size}")
+        checksum = digest.hexdigest()
+        if expected_sha256 and checksum != expected_sha256.lower():
+            raise ChunkError(f"Chunk {index} checksum mismatch")
+
+        os.replace(tmp_path, _chunk_path(session, index))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return {"index": index, "size": size, "sha256": checksum}
+
+
+def received_chunks(session):
+    """Sorted indexes of the chunks stored for a session"""
+    directory = session_dir(session)
+    if not directory.exists():
+        return []
+    return sorted(int(path.stem) for path in directory.glob('*.part'))
+
+
+def received_ranges(session, chunks=None):
+    """Received bytes as merged ``[start, end)`` ranges"""
+    if chunks is None:
+        chunks = received_chunks(session)
+    ranges = []
+    for index in chunks:
+        start = index * session.chunk_size
+        end = start + session.expected_chunk_size(index)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+def session_status(session):
+    """API representation of a session: what arrived and what is still missing"""
+    chunks = received_chunks(session)
+    received = set(chunks)
+    missing = [index for index in range(session.total_chunks) if index not in received]
+    return {
+        "upload_id": str(session.pk),
+        "filename": session.filename,
+        "status": session.status,
+        "total_size": session.total_size,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        "received_chunks": chunks,
+        "received_ranges": received_ranges(session, chunks),
+        "received_bytes": sum(session.expected_chunk_size(index) for index in chunks),
+        "missing_chunks": missing,
+    }
+
+
+def assemble(session):
+    """
+    Concatenate all chunks into a temporary file and return its path.
+
+    Raises ChunkError if chunks are missing or the whole-file checksum
+    given when the session was opened does not match.
+    """
+    chunks = received_chunks(session)
+    if len(chunks) != session.total_chunks:
+        raise ChunkError(f"{session.total_chunks - len(chunks)} chunk(s) missing")
+
+    digest = hashlib.sha256()
+    handle, path = tempfile.mkstemp(dir=session_dir(session), suffix='.upload')
+    with os.fdopen(handle, 'wb') as out:
+        for index in chunks:
+            with open(_chunk_path(session, index), 'rb') as part:
+                while True:
+                    block = part.read(_COPY_BUFFER)
+                    if not block:
+                        break
+                    digest.update(block)
+                    out.write(block)
+
+    if session.checksum and digest.hexdigest() != session.checksum.lower():
+        os.remove(path)
+        raise ChunkError("Assembled file checksum mismatch")
+    return path
+
+
+def discard(session):
+    """Remove all stored chunks for a session"""
+    shutil.rmtree(session_dir(session), ignore_errors=True)
+
+
+def claim(session):
+    """Move an active session to ``finalizing``; False if another request got there first"""
+    claimed = ResumableUpload.objects.filter(pk=session.pk, status='active').update(
+        status='finalizing', updated_at=timezone.now()
+    )
+    if claimed:
+        session.status = 'finalizing'
+    return bool(claimed)
+
+
+def release(session):
+    """Return a claimed session to ``active`` so finalizing can be retried"""
+    ResumableUpload.objects.filter(pk=session.pk, status='finalizing').update(
+        status='active', updated_at=timezone.now()
+    )
+    session.status = 'active'
+
+
+def expire_sessions(ttl_seconds=None):
+    """
+    Delete sessions not touched for ``ttl_seconds`` (default
+    ``RESUMABLE_UPLOAD_TTL_SECONDS``, 0 disables) with their chunks, and chunk
+    directories that no longer have a session. Returns the number of
+    sessions deleted.
+    """
+    if ttl_seconds is None:
+        ttl_seconds = django_settings.RESUMABLE_UPLOAD_TTL_SECONDS
+    if not ttl_seconds:
+        return 0
+
+    expired = ResumableUpload.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=ttl_seconds))
+    deleted = 0
+    for session in expired.iterator():
+        # Re-check the age in the delete so a session touched meanwhile survives
+        if ResumableUpload.objects.filter(pk=session.pk, updated_at=session.updated_at).delete()[0]:
+            discard(session)
+            deleted += 1
+
+    root = Path(django_settings.RESUMABLE_UPLOAD_DIR)
+    if root.exists():
+        known = {str(pk) for pk in ResumableUpload.objects.values_list('pk', flat=True)}
+        cutoff = time.time() - ttl_seconds
+        for directory in root.iterdir():
+            if directory.is_dir() and directory.name not in known and directory.stat().st_mtime < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+    return deleted
@@ -0,0 +1,247 @@
+"""
+Tiered retention for equipment telemetry.
+
+Storage is bounded in three tiers, each configured in settings (0 disables
+a tier):
+
+* raw ``EquipmentHistory`` rows are kept for ``HISTORY_RETENTION_DAYS``.
+  Older rows, whole days at a time, are written to a compressed columnar
+  ``HistoryArchive`` file and their days' hourly/daily rollups are recomputed
+  from exactly those rows before they are deleted, so long-term trends
+  survive;
+* hourly rollups are kept for ``HOURLY_ROLLUP_RETENTION_DAYS``; daily
+  rollups are kept;
+* only the newest ``UPLOAD_RETENTION_COUNT`` uploads (records, stored files
+  and sidecars) are kept. Their readings stay in the history.
+
+Nothing runs on the request path: uploads schedule a run on a single
+background thread once they commit, and the ``apply_retention`` management
+command runs it from cron. Deletes go in batches of ``RETENTION_BATCH_ROWS``
+rows, each in its own short transaction.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings as django_settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .equipment import labels
+from .models import EquipmentHistory, EquipmentRollup, HistoryArchive, UploadHistory
+from .rollups import METRICS, RESOLUTIONS, aggregate, bucket_start, combine, new_rollups
+from .storage import ColumnarWriter
+
+
+ARCHIVE_FIELDS = ['id', 'equipment_id', 'equipment_type', 'recorded_at'] + METRICS + ['upload_session_id']
+
+_lock = threading.Lock()
+_executor_instance = None
+_scheduled = False
+_keep_uploads = 0
+_last_archive = None
+
+
+def archive_horizon():
+    """Moment before which every raw row has been archived, or None"""
+    return HistoryArchive.objects.aggregate(horizon=Max('archived_before'))['horizon']
+
+
+def history_cutoff(now=None):
+    """Start of the oldest day of raw history to keep, or None when raw history is kept forever"""
+    days = django_settings.HISTORY_RETENTION_DAYS
+    if days <= 0:
+        return None
+    return bucket_start((now or timezone.now()) - timedelta(days=days), 'day')
+
+
+def _delete_batches(queryset, batch_rows):
+    """Delete the rows of ``queryset`` ``batch_rows`` at a time; returns the number deleted"""
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:batch_rows])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
+
+
+def _archive_frame(chunk, equipment):
+    """Archive rows of one chunk, with equipment names so the file stands on its own"""
+    frame = pd.DataFrame.from_records(chunk, columns=ARCHIVE_FIELDS)
+    unseen = set(frame['equipment_id'].unique().tolist()) - equipment.keys()
+    if unseen:
+        equipment.update(labels(unseen))
+    frame['equipment_name'] = frame['equipment_id'].map({key: name for key, (name, _) in equipment.items()})
+    frame[METRICS] = frame[METRICS].astype(np.float64)
+    # 0 for readings whose upload was already pruned
+    frame['upload_session_id'] = frame['upload_session_id'].fillna(0).astype(np.int64)
+    return frame
+
+
+def archive_history(cutoff, batch_rows=None):
+    """
+    Archive and delete raw history recorded before ``cutoff`` (a day start).
+    Returns ``(archive or None, rows deleted)``.
+    """
+    batch_rows = batch_rows or django_settings.RETENTION_BATCH_ROWS
+    deleted = 0
+    horizon = archive_horizon()
+    if horizon is not None:
+        # Archived by an earlier run that stopped before deleting them
+        deleted += _delete_batches(EquipmentHistory.objects.filter(recorded_at__lt=horizon), batch_rows)
+        if horizon >= cutoff:
+            return None, deleted
+
+    queryset = EquipmentHistory.objects.filter(recorded_at__lt=cutoff)
+    if horizon is not None:
+        queryset = queryset.filter(recorded_at__gte=horizon)
+
+    writer = ColumnarWriter()
+    parts = {resolution: [] for resolution in RESOLUTIONS}
+    equipment = {}
+    rows, last_id, first, last = 0, 0, None, None
+    try:
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*ARCHIVE_FIELDS)[:batch_rows])
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            frame = _archive_frame(chunk, equipment)
+            writer.append(frame)
+            for resolution in RESOLUTIONS:
+                parts[resolution].append(aggregate(frame, resolution))
+            rows += len(frame)
+            first = min(first, frame['recorded_at'].min()) if first is not None else frame['recorded_at'].min()
+            last = max(last, frame['recorded_at'].max()) if last is not None else frame['recorded_at'].max()
+    except Exception:
+        writer.discard()
+        raise
+    if not rows:
+        writer.discard()
+        return None, deleted
+
+    with transaction.atomic():
+        archive = HistoryArchive(
+            rows=rows,
+            first_recorded_at=first.to_pydatetime(),
+            last_recorded_at=last.to_pydatetime(),
+            archived_before=cutoff,
+        )
+        writer.save_as(archive.file, f"history-before-{cutoff:%Y%m%d}.npz")
+        archive.save()
+        # The archived days' rollups, recomputed from exactly the rows being removed
+        EquipmentRollup.objects.filter(bucket__gte=bucket_start(first, 'day'), bucket__lt=cutoff).delete()
+        for resolution, frames in parts.items():
+            EquipmentRollup.objects.bulk_create(
+                new_rollups(EquipmentRollup, combine(frames), resolution), batch_size=1000
+            )
+
+    deleted += _delete_batches(queryset, batch_rows)
+    return archive, deleted
+
+
+def prune_rollups(now=None, batch_rows=None):
+    """Delete hourly rollups past ``HOURLY_ROLLUP_RETENTION_DAYS``; returns the number deleted"""
+    days = django_settings.HOURLY_ROLLUP_RETENTION_DAYS
+    if days <= 0:
+        return 0
+    cutoff = bucket_start((now or timezone.now()) - timedelta(days=days), 'day')
+    return _delete_batches(
+        EquipmentRollup.objects.filter(resolution='hour', bucket__lt=cutoff),
+        batch_rows or django_settings.RETENTION_BATCH_ROWS,
+    )
+
+
+def prune_uploads(keep, batch_rows=None):
+    """
+    Delete all but the newest ``keep`` uploads with their stored files. Their
+    readings are detached in batches and stay in the history. Returns the
+    number of uploads deleted.
+    """
+    if keep <= 0:
+        return 0
+    batch_rows = batch_rows or django_settings.RETENTION_BATCH_ROWS
+    stale = list(UploadHistory.objects.order_by('-upload_date', '-id')[keep:])
+    for upload in stale:
+        while True:
+            ids = list(
+                EquipmentHistory.objects.filter(upload_session=upload).values_list('id', flat=True)[:batch_rows]
+            )
+            if not ids:
+                break
+            EquipmentHistory.objects.filter(id__in=ids).update(upload_session=None)
+        upload.delete()
+        for field_file in (upload.file, upload.data_file):
+            if field_file:
+                field_file.delete(save=False)
+    return len(stale)
+
+
+def apply_retention(keep_uploads=None, archive=True, now=None):
+    """Apply every retention tier; returns what was removed"""
+    keep_uploads = django_settings.UPLOAD_RETENTION_COUNT if keep_uploads is None else keep_uploads
+    result = {"uploads_deleted": prune_uploads(keep_uploads), "archive_id": None, "rows_archived": 0, "rows_deleted": 0}
+    cutoff = history_cutoff(now)
+    if archive and cutoff is not None:
+        archived, result["rows_deleted"] = archive_history(cutoff)
+        if archived is not None:
+            result["archive_id"], result["rows_archived"] = archived.id, archived.rows
+    result["hourly_rollups_deleted"] = prune_rollups(now)
+    return result
+
+
+def _executor():
+    """Lazily create the single retention thread"""
+    global _executor_instance
+    with _lock:
+        if _executor_instance is None:
+            _executor_instance = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retention')
+        return _executor_instance
+
+
+def schedule_retention(keep_uploads=0):
+    """
+    Run retention in the background once the current transaction commits.
+    ``keep_uploads`` raises the number of uploads kept for that run, e.g. so
+    a batch never prunes its own files.
+    """
+    transaction.on_commit(lambda: _submit(keep_uploads))
+
+
+def _submit(keep_uploads):
+    global _scheduled, _keep_uploads
+    with _lock:
+        _keep_uploads = max(_keep_uploads, keep_uploads)
+        if _scheduled:
+            return
+        _scheduled = True
+    _executor().submit(_run_in_background)
+
+
+def _run_in_background():
+    global _scheduled, _keep_uploads, _last_archive
+    with _lock:
+        # Uploads committed from now on need another run
+        _scheduled = False
+        keep = django_settings.UPLOAD_RETENTION_COUNT
+        if keep > 0:
+            keep = max(keep, _keep_uploads)
+        _keep_uploads = 0
+        # Uploads only add today's rows, so archiving is needed at most every interval
+        started = time.monotonic()
+        archive = _last_archive is None or started - _last_archive >= django_settings.RETENTION_INTERVAL_SECONDS
+        if archive:
+            _last_archive = started
+    try:
+        close_old_connections()
+        apply_retention(keep_uploads=keep, archive=archive)
+    except Exception as e:
+        print(f"Retention error: {e}")
+    finally:
+        # The retention thread holds its own DB connection; release it between runs
+        connection.close()
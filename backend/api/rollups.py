@@ -0,0 +1,262 @@
+"""
+Hourly and daily equipment telemetry rollups.
+
+Each ``EquipmentRollup`` row holds the count, min, max, sum and last value
+of pressure, temperature and flowrate for one equipment in one hour or day.
+Rollups are merged incrementally inside the ingest transaction (with an
+``INSERT ... ON CONFLICT`` upsert where the database supports it), so they
+stay consistent with the raw ``EquipmentHistory`` rows they summarize; the
+``rebuild_rollups`` management command recomputes them from raw history for
+backfills. Trend queries over long windows read these buckets instead of
+scanning raw readings.
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings as django_settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Window
+from django.db.models.functions import RowNumber
+
+from .models import EquipmentHistory, EquipmentRollup, HistoryArchive
+
+
+# Coarsest first, with the pandas frequency used to floor timestamps
+RESOLUTIONS = {
+    'day': (timedelta(days=1), 'D'),
+    'hour': (timedelta(hours=1), 'h'),
+}
+
+METRICS = ['pressure', 'temperature', 'flowrate']
+STATS = ['min', 'max', 'sum', 'last']
+# Stored per bucket besides its key (resolution, equipment, bucket)
+MERGED_FIELDS = ['count', 'last_recorded_at'] + [
+    f'{metric}_{stat}' for metric in METRICS for stat in STATS
+]
+
+# Equipment per lookup query when merging into existing buckets
+_LOOKUP_BATCH = 500
+# Buckets per executemany() call of the upsert
+_UPSERT_BATCH = 1000
+
+
+def bucket_start(moment, resolution):
+    """Start of the bucket containing ``moment``"""
+    return pd.Timestamp(moment).floor(RESOLUTIONS[resolution][1]).to_pydatetime()
+
+
+def aggregate(frame, resolution):
+    """
+    Per-(equipment, bucket) aggregates of a frame with ``equipment_id``,
+    ``recorded_at`` and the metric columns.
+    """
+    frame = frame.sort_values('recorded_at', kind='stable')
+    frame = frame.assign(bucket=pd.to_datetime(frame['recorded_at'], utc=True).dt.floor(RESOLUTIONS[resolution][1]))
+    grouped = frame.groupby(['equipment_id', 'bucket'], sort=False)
+    aggregates = grouped[METRICS].agg(STATS)
+    aggregates.columns = [f'{metric}_{stat}' for metric, stat in aggregates.columns]
+    aggregates['count'] = grouped.size()
+    aggregates['last_recorded_at'] = grouped['recorded_at'].max()
+    return aggregates.reset_index()
+
+
+def _merge(rollup, row):
+    """Fold one aggregate row into an existing rollup bucket"""
+    newer = row['last_recorded_at'] >= rollup.last_recorded_at
+    for metric in METRICS:
+        setattr(rollup, f'{metric}_min', min(getattr(rollup, f'{metric}_min'), row[f'{metric}_min']))
+        setattr(rollup, f'{metric}_max', max(getattr(rollup, f'{metric}_max'), row[f'{metric}_max']))
+        setattr(rollup, f'{metric}_sum', getattr(rollup, f'{metric}_sum') + row[f'{metric}_sum'])
+        if newer:
+            setattr(rollup, f'{metric}_last', row[f'{metric}_last'])
+    if newer:
+        rollup.last_recorded_at = row['last_recorded_at']
+    rollup.count += row['count']
+
+
+def combine(parts):
+    """Merge aggregate frames that may cover the same buckets"""
+    frame = pd.concat(parts).sort_values('last_recorded_at', kind='stable')
+    how = {f'{metric}_{stat}': stat for metric in METRICS for stat in STATS}
+    how.update({'count': 'sum', 'last_recorded_at': 'max'})
+    return frame.groupby(['equipment_id', 'bucket'], sort=False).agg(how).reset_index()
+
+
+def _records(aggregates):
+    rows = aggregates.to_dict(orient='records')
+    for row in rows:
+        row['bucket'] = pd.Timestamp(row['bucket']).to_pydatetime()
+        row['last_recorded_at'] = pd.Timestamp(row['last_recorded_at']).to_pydatetime()
+    return rows
+
+
+def _rollup(model, resolution, row):
+    return model(resolution=resolution, **{key: row[key] for key in ['equipment_id', 'bucket'] + MERGED_FIELDS})
+
+
+def new_rollups(model, aggregates, resolution):
+    """Unsaved rollup instances of ``model`` for aggregate rows"""
+    return [_rollup(model, resolution, row) for row in _records(aggregates)]
+
+
+def _upsert_sql():
+    """
+    INSERT ... ON CONFLICT statement that folds a new aggregate into an
+    existing bucket in the database (SQLite and PostgreSQL)
+    """
+    quote = connection.ops.quote_name
+    meta = EquipmentRollup._meta
+    table = quote(meta.db_table)
+    columns = ['resolution', 'equipment', 'bucket'] + MERGED_FIELDS
+    least, greatest = ('LEAST', 'GREATEST') if connection.vendor == 'postgresql' else ('MIN', 'MAX')
+    newer = f"excluded.{quote('last_recorded_at')} >= {table}.{quote('last_recorded_at')}"
+
+    def latest(column):
+        return f"{quote(column)} = CASE WHEN {newer} THEN excluded.{quote(column)} ELSE {table}.{quote(column)} END"
+
+    updates = [f"{quote('count')} = {table}.{quote('count')} + excluded.{quote('count')}"]
+    for metric in METRICS:
+        updates += [
+            f"{quote(metric + '_min')} = {least}({table}.{quote(metric + '_min')}, excluded.{quote(metric + '_min')})",
+            f"{quote(metric + '_max')} = {greatest}({table}.{quote(metric + '_max')}, excluded.{quote(metric + '_max')})",
+            f"{quote(metric + '_sum')} = {table}.{quote(metric + '_sum')} + excluded.{quote(metric + '_sum')}",
+            latest(metric + '_last'),
+        ]
+    # Last, so the CASE expressions above still see the stored timestamp
+    updates.append(latest('last_recorded_at'))
+    return (
+        f"INSERT INTO {table} ({', '.join(quote(meta.get_field(c).column) for c in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(quote(c) for c in ['resolution', 'equipment_id', 'bucket'])}) "
+        f"DO UPDATE SET {', '.join(updates)}"
+    ), columns
+
+
+def merge_aggregates(aggregates, resolution):
+    """Add aggregate rows into the stored buckets of ``resolution``"""
+    if aggregates.empty:
+        return
+    rows = _records(aggregates)
+    if connection.vendor in ('sqlite', 'postgresql'):
+        # One upsert per bucket, merged by the database; no read-modify-write round trip
+        sql, columns = _upsert_sql()
+        fields = [EquipmentRollup._meta.get_field(column) for column in columns]
+        params = [
+            [field.get_db_prep_save(resolution if field.name == 'resolution' else row[field.attname], connection)
+             for field in fields]
+            for row in rows
+        ]
+        with connection.cursor() as cursor:
+            for start in range(0, len(params), _UPSERT_BATCH):
+                cursor.executemany(sql, params[start:start + _UPSERT_BATCH])
+        return
+
+    buckets = sorted({row['bucket'] for row in rows})
+    equipment = sorted({row['equipment_id'] for row in rows})
+    with transaction.atomic():
+        existing = {}
+        for start in range(0, len(equipment), _LOOKUP_BATCH):
+            stored = EquipmentRollup.objects.select_for_update().filter(
+                resolution=resolution, bucket__in=buckets, equipment_id__in=equipment[start:start + _LOOKUP_BATCH]
+            )
+            existing.update({(rollup.equipment_id, rollup.bucket): rollup for rollup in stored})
+
+        created = []
+        for row in rows:
+            rollup = existing.get((row['equipment_id'], row['bucket']))
+            if rollup is None:
+                created.append(_rollup(EquipmentRollup, resolution, row))
+            else:
+                _merge(rollup, row)
+        EquipmentRollup.objects.bulk_update(list(existing.values()), MERGED_FIELDS, batch_size=1000)
+        EquipmentRollup.objects.bulk_create(created, batch_size=1000)
+
+
+def update_rollups(frame):
+    """Merge freshly ingested readings into every resolution"""
+    for resolution in RESOLUTIONS:
+        merge_aggregates(aggregate(frame, resolution), resolution)
+
+
+def ingested_frame(df, equipment_ids, recorded_at):
+    """
+    Rollup input for an ingested upload chunk: the ``EquipmentHistory`` values
+    derived from ``df`` with the equipment ids and timestamps the rows were
+    stored with.
+    """
+    from .ingest import history_columns
+
+    _, _, pressures, temperatures, flowrates = history_columns(df)
+    return pd.DataFrame({
+        'equipment_id': equipment_ids,
+        'recorded_at': recorded_at,
+        'pressure': pressures,
+        'temperature': temperatures,
+        'flowrate': flowrates,
+    })
+
+
+def history_aggregates(queryset, chunk_rows):
+    """
+    Aggregates of every resolution over the rows of an ``EquipmentHistory``
+    queryset, read in primary-key chunks. Returns ``({resolution: frame}, rows)``.
+    """
+    fields = ['id', 'equipment_id', 'recorded_at'] + METRICS
+    parts = {resolution: [] for resolution in RESOLUTIONS}
+    rows, last_id = 0, 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_rows])
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+        rows += len(chunk)
+        frame = pd.DataFrame.from_records(chunk, columns=fields).drop(columns='id')
+        frame[METRICS] = frame[METRICS].astype(np.float64)
+        for resolution in RESOLUTIONS:
+            parts[resolution].append(aggregate(frame, resolution))
+    return {resolution: combine(frames) for resolution, frames in parts.items() if frames}, rows
+
+
+def rebuild_rollups(since=None, chunk_rows=None):
+    """
+    Recompute rollups from raw history, for all of it or from the day
+    containing ``since``. Days whose raw rows were archived by retention are
+    left alone. Returns the number of raw rows read.
+    """
+    chunk_rows = chunk_rows or django_settings.ROLLUP_REBUILD_CHUNK_ROWS
+    rollups = EquipmentRollup.objects.all()
+    queryset = EquipmentHistory.objects.all()
+    if since is not None:
+        # Whole days, so partially covered hourly and daily buckets are rebuilt entirely
+        since = bucket_start(since, 'day')
+    horizon = HistoryArchive.objects.aggregate(horizon=Max('archived_before'))['horizon']
+    if horizon is not None and (since is None or since < horizon):
+        since = horizon
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=since)
+        queryset = queryset.filter(recorded_at__gte=since)
+
+    # Aggregate first (only the buckets are kept in memory), then swap them in at once
+    aggregates, rows = history_aggregates(queryset, chunk_rows)
+    with transaction.atomic():
+        rollups.delete()
+        for resolution, frame in aggregates.items():
+            EquipmentRollup.objects.bulk_create(new_rollups(EquipmentRollup, frame, resolution), batch_size=1000)
+    return rows
+
+
+def recent_buckets(resolution, since, equipment_id=None, limit=None):
+    """
+    Rollup buckets overlapping the window from ``since``, newest first per
+    equipment, at most ``limit`` per equipment when given.
+    """
+    queryset = EquipmentRollup.objects.filter(resolution=resolution, bucket__gte=bucket_start(since, resolution))
+    if equipment_id is not None:
+        queryset = queryset.filter(equipment_id=equipment_id).order_by('-bucket')
+        return list(queryset.values()[:limit] if limit else queryset.values())
+    if limit:
+        queryset = queryset.annotate(
+            position=Window(RowNumber(), partition_by=[F('equipment_id')], order_by=F('bucket').desc())
+        ).filter(position__lte=limit)
+    return list(queryset.order_by('equipment_id', '-bucket').values())
@@ -0,0 +1,422 @@
+"""
+Vectorized risk scoring engine.
+
+Array counterpart of ``calculate_risk_score``: every step of the scalar
+algorithm is expressed as a NumPy operation over whole columns so a
+DataFrame of any size is scored in a handful of passes.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+
+RISK_LEVELS = np.array(["healthy", "moderate", "warning", "critical"], dtype=object)
+
+THRESHOLD_FIELDS = (
+    'pressure_warning', 'pressure_critical',
+    'temperature_warning', 'temperature_critical',
+    'flowrate_min', 'flowrate_max',
+)
+
+
+class ThresholdTable:
+    """
+    Default thresholds plus per-equipment-type profiles compiled into lookup
+    arrays. Scalar attributes hold the defaults, so a table can be used
+    anywhere a ``ThresholdSettings`` instance is expected.
+    """
+
+    def __init__(self, default, profiles=None, updated_at=None):
+        for field in THRESHOLD_FIELDS:
+            setattr(self, field, float(default[field]))
+        self.updated_at = updated_at
+        # Only the overridden fields of each profile
+        self.profiles = {
+            equipment_type: {field: float(value) for field, value in values.items() if value is not None}
+            for equipment_type, values in (profiles or {}).items()
+        }
+        self.types = list(self.profiles)
+        self._index = {equipment_type: i for i, equipment_type in enumerate(self.types)}
+        # One entry per profile, and a last entry with the defaults for every other type
+        self.arrays = {
+            field: np.array(
+                [self.profiles[t].get(field, getattr(self, field)) for t in self.types] + [getattr(self, field)],
+                dtype=np.float64,
+            )
+            for field in THRESHOLD_FIELDS
+        }
+
+    def profile_index(self, types):
+        """Profile position for each row of a ``Type`` column, via its categorical codes"""
+        if not isinstance(types.dtype, pd.CategoricalDtype):
+            types = types.astype('category')
+        default = len(self.types)
+        lookup = np.array(
+            [self._index.get(category, default) for category in types.cat.categories] + [default],
+            dtype=np.intp,
+        )
+        # Missing types have code -1, which picks the trailing default entry
+        return lookup[types.cat.codes.to_numpy()]
+
+    def for_frame(self, df):
+        """Thresholds for the rows of ``df``: scalars without profiles, aligned arrays with them"""
+        if not self.profiles or 'Type' not in df.columns:
+            return self
+        idx = self.profile_index(df['Type'])
+        return SimpleNamespace(**{field: self.arrays[field][idx] for field in THRESHOLD_FIELDS})
+
+
+def resolve_thresholds(df, thresholds):
+    """Per-row thresholds for ``df`` when ``thresholds`` is a ``ThresholdTable``"""
+    for_frame = getattr(thresholds, 'for_frame', None)
+    return for_frame(df) if for_frame else thresholds
+
+
+def _column(df, name, default):
+    """Return a float64 array for a column, or a constant array if it is missing"""
+    if name in df.columns:
+        return df[name].to_numpy(dtype=np.float64)
+    return np.full(len(df), float(default))
+
+
+def _pressure_component(pressure, warning, critical):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        high = pressure > critical
+        elevated = ~high & (pressure > warning)
+        risk = np.where(
+            high,
+            np.minimum(40, (pressure - critical) * 2),
+            np.where(elevated, (pressure - warning) / (critical - warning) * 20, 0.0),
+        )
+    return risk, {"p_high": high, "p_elev": elevated}
+
+
+def _temperature_component(temperature, warning, critical):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        high = temperature > critical
+        elevated = ~high & (temperature > warning)
+        risk = np.where(
+            high,
+            np.minimum(40, (temperature - critical) * 1.5),
+            np.where(elevated, (temperature - warning) / (critical - warning) * 20, 0.0),
+        )
+    return risk, {"t_high": high, "t_elev": elevated}
+
+
+def _flow_component(flowrate, minimum, maximum):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        low = flowrate < minimum
+        high = ~low & (flowrate > maximum)
+        risk = np.where(
+            low,
+            np.minimum(20, (minimum - flowrate) * 0.5),
+            np.where(high, np.minimum(20, (flowrate - maximum) * 0.3), 0.0),
+        )
+    return risk, {"f_low": low, "f_high": high}
+
+
+# Risk component -> (reading, threshold fields in argument order, component function)
+COMPONENTS = {
+    "pressure_risk": ("pressure", ("pressure_warning", "pressure_critical"), _pressure_component),
+    "temp_risk": ("temperature", ("temperature_warning", "temperature_critical"), _temperature_component),
+    "flow_risk": ("flowrate", ("flowrate_min", "flowrate_max"), _flow_component),
+}
+
+
+def score_components(pressure, temperature, flowrate, thresholds):
+    """
+    Compute the pressure, temperature and flowrate risk components.
+
+    Threshold attributes may be scalars or arrays aligned with the inputs.
+    Returns a dict of float64 arrays plus the masks used to pick factor labels.
+    """
+    readings = {
+        "pressure": np.asarray(pressure, dtype=np.float64),
+        "temperature": np.asarray(temperature, dtype=np.float64),
+        "flowrate": np.asarray(flowrate, dtype=np.float64),
+    }
+    result = {"masks": {}}
+    for component, (reading, fields, function) in COMPONENTS.items():
+        risk, masks = function(readings[reading], *(getattr(thresholds, field) for field in fields))
+        result[component] = risk
+        result["masks"].update(masks)
+    return result
+
+
+def combine_components(pressure_risk, temp_risk, flow_risk):
+    """
+    Sum the risk components and derive level codes and maintenance days.
+
+    Level codes index into ``RISK_LEVELS`` (0=healthy ... 3=critical).
+    """
+    # Same addition order as the scalar version so results are bit-identical
+    risk = np.clip(((0.0 + pressure_risk) + temp_risk) + flow_risk, 0, 100)
+
+    level_code = np.select([risk >= 70, risk >= 40, risk >= 20], [3, 2, 1], default=0)
+    maintenance_days = np.select(
+        [level_code == 3, level_code == 2, level_code == 1],
+        [
+            np.maximum(1, np.trunc(7 - (risk - 70) / 10)),
+            np.maximum(7, np.trunc(30 - (risk - 40) / 2)),
+            np.maximum(30, np.trunc(60 - risk)),
+        ],
+        default=np.maximum(60, np.trunc(90 - risk)),
+    ).astype(np.int64)
+
+    return risk, level_code, maintenance_days
+
+
+def build_factors(pressure, temperature, flowrate, masks):
+    """Build the per-row risk factor string lists, touching only flagged rows"""
+    n = len(pressure)
+    factors = [[] for _ in range(n)]
+    labels = [
+        ("p_high", pressure, "High pressure ({} bar)"),
+        ("p_elev", pressure, "Elevated pressure ({} bar)"),
+        ("t_high", temperature, "High temperature ({}°C)"),
+        ("t_elev", temperature, "Elevated temperature ({}°C)"),
+        ("f_low", flowrate, "Low flowrate ({} L/h)"),
+        ("f_high", flowrate, "High flowrate ({} L/h)"),
+    ]
+    # Labels are applied in the scalar algorithm's order: pressure, temperature, flow
+    for key, values, template in labels:
+        idx = np.flatnonzero(masks[key])
+        for i, value in zip(idx.tolist(), values[idx].tolist()):
+            factors[i].append(template.format(value))
+    return factors
+
+
+def score_frame(df, thresholds):
+    """
+    Score every row of an equipment DataFrame.
+
+    Returns a dict of aligned arrays: the input readings, the three risk
+    components, the combined risk, level codes and maintenance days.
+    """
+    pressure = _column(df, 'Pressure', 0)
+    temperature = _column(df, 'Temperature', 0)
+    flowrate = _column(df, 'Flowrate', 0)
+
+    components = score_components(pressure, temperature, flowrate, resolve_thresholds(df, thresholds))
+    risk, level_code, maintenance_days = combine_components(
+        components["pressure_risk"], components["temp_risk"], components["flow_risk"]
+    )
+
+    return {
+        "pressure": pressure,
+        "temperature": temperature,
+        "flowrate": flowrate,
+        "pressure_risk": components["pressure_risk"],
+        "temp_risk": components["temp_risk"],
+        "flow_risk": components["flow_risk"],
+        "masks": components["masks"],
+        "risk": risk,
+        "level_code": level_code,
+        "maintenance_days": maintenance_days,
+    }
+
+
+def take_scores(scores, idx):
+    """Subset a ``score_frame`` result to the given row positions"""
+    taken = {key: value[idx] for key, value in scores.items() if key != "masks"}
+    taken["masks"] = {key: mask[idx] for key, mask in scores["masks"].items()}
+    return taken
+
+
+# Above this share of affected rows, a component is recomputed for every row
+FULL_RESCORE_FRACTION = 0.25
+
+
+def _rows(value, idx):
+    """Row subset of a threshold that may be a scalar or a per-row array"""
+    return value if np.ndim(value) == 0 else value[idx]
+
+
+class IncrementalScores:
+    """
+    Scores of one DataFrame that can be updated in place for new thresholds.
+
+    The three risk components and their masks are kept per row, and each
+    reading is kept in sorted order. ``rescore`` recomputes only the
+    components whose limits changed, only for rows on the affected side of
+    the changed boundary (found by binary search when the limits are
+    scalars), and recombines only rows whose components actually changed.
+    ``scores`` is always equal to ``score_frame(df, thresholds)``.
+    """
+
+    def __init__(self, df, thresholds):
+        self.df = df
+        self.limits = self._limits(thresholds)
+        self.scores = score_frame(df, thresholds)
+        self.level_counts = np.bincount(self.scores["level_code"], minlength=len(RISK_LEVELS))
+        self._order = {}
+
+    def _limits(self, thresholds):
+        resolved = resolve_thresholds(self.df, thresholds)
+        return {field: getattr(resolved, field) for field in THRESHOLD_FIELDS}
+
+    def _sorted(self, reading):
+        if reading not in self._order:
+            order = np.argsort(self.scores[reading], kind='stable')
+            self._order[reading] = (order, self.scores[reading][order])
+        return self._order[reading]
+
+    def _affected_rows(self, component, old, new):
+        """Rows whose ``component`` can differ between the old and new limits"""
+        reading, fields, _ = COMPONENTS[component]
+        values = self.scores[reading]
+        if any(np.ndim(old[field]) or np.ndim(new[field]) for field in fields):
+            # Per-type limits: rows whose own limits changed
+            changed = np.zeros(len(values), dtype=bool)
+            for field in fields:
+                changed |= np.broadcast_to(old[field] != new[field], values.shape)
+            return np.flatnonzero(changed)
+
+        order, ordered = self._sorted(reading)
+        lower, upper = fields
+        if component == "flow_risk":
+            # Below the low-flow limit, or above the high-flow limit
+            parts = []
+            if old[lower] != new[lower]:
+                parts.append(order[:np.searchsorted(ordered, max(old[lower], new[lower]), side='left')])
+            if old[upper] != new[upper]:
+                parts.append(order[np.searchsorted(ordered, min(old[upper], new[upper]), side='right'):])
+            return np.concatenate(parts)
+        # Rows at or below the warning limit score zero either way
+        return order[np.searchsorted(ordered, min(old[lower], new[lower]), side='right'):]
+
+    def rescore(self, thresholds):
+        """Update the scores for ``thresholds``; returns the positions of reclassified rows"""
+        old, new = self.limits, self._limits(thresholds)
+        scores = self.scores
+
+        n = len(self.df)
+        touched = np.zeros(n, dtype=bool)
+        for component, (reading, fields, function) in COMPONENTS.items():
+            if all(np.array_equal(old[field], new[field]) for field in fields):
+                continue
+            idx = self._affected_rows(component, old, new)
+            if len(idx) > n * FULL_RESCORE_FRACTION:
+                # Gathering most of the rows costs more than recomputing them all
+                idx = slice(None)
+            risk, masks = function(scores[reading][idx], *(_rows(new[field], idx) for field in fields))
+            touched[idx] |= risk != scores[component][idx]
+            scores[component][idx] = risk
+            for key, mask in masks.items():
+                scores["masks"][key][idx] = mask
+        self.limits = new
+
+        idx = np.flatnonzero(touched)
+        if not len(idx):
+            return idx
+        risk, level_code, maintenance_days = combine_components(
+            scores["pressure_risk"][idx], scores["temp_risk"][idx], scores["flow_risk"][idx]
+        )
+        reclassified = idx[level_code != scores["level_code"][idx]]
+        self.level_counts += np.bincount(level_code, minlength=len(RISK_LEVELS))
+        self.level_counts -= np.bincount(scores["level_code"][idx], minlength=len(RISK_LEVELS))
+        scores["risk"][idx] = risk
+        scores["level_code"][idx] = level_code
+        scores["maintenance_days"][idx] = maintenance_days
+        return reclassified
+
+
+def risk_order(scores):
+    """Row positions in prediction order: rounded risk score descending, stable"""
+    rounded = np.array([round(r, 1) for r in scores["risk"].tolist()], dtype=np.float64)
+    return np.argsort(-rounded, kind='stable')
+
+
+def predictions_from_scores(df, scores, now=None):
+    """
+    Turn scored arrays into the prediction dicts returned by the API,
+    sorted by risk score descending (stable, like ``list.sort``).
+    """
+    n = len(df)
+    if n == 0:
+        return []
+
+    now = now or datetime.now()
+    names = df['Equipment Name'].tolist() if 'Equipment Name' in df.columns else ['Unknown'] * n
+    types = df['Type'].tolist() if 'Type' in df.columns else ['Unknown'] * n
+
+    # Python's round() so scores match the scalar path exactly
+    rounded = [round(r, 1) for r in scores["risk"].tolist()]
+    order = np.argsort(-np.asarray(rounded, dtype=np.float64), kind='stable')
+
+    days = scores["maintenance_days"]
+    date_lookup = {
+        int(d): (now + timedelta(days=int(d))).strftime("%Y-%m-%d") for d in np.unique(days)
+    }
+    factors = build_factors(scores["pressure"], scores["temperature"], scores["flowrate"], scores["masks"])
+
+    pressure = scores["pressure"].tolist()
+    temperature = scores["temperature"].tolist()
+    flowrate = scores["flowrate"].tolist()
+    levels = RISK_LEVELS[scores["level_code"]].tolist()
+    days = days.tolist()
+
+    return [{
+        "equipment_name": names[i],
+        "type": types[i],
+        "pressure": pressure[i],
+        "temperature": temperature[i],
+        "flowrate": flowrate[i],
+        "risk_score": rounded[i],
+        "risk_level": levels[i],
+        "maintenance_in_days": days[i],
+        "maintenance_date": date_lookup[days[i]],
+        "risk_factors": factors[i],
+    } for i in order.tolist()]
+
+
+def predict_frame(df, thresholds, now=None):
+    """Vectorized equivalent of scoring each row with ``calculate_risk_score``"""
+    if not isinstance(df, pd.DataFrame):
+        df = pd.DataFrame(df)
+    return predictions_from_scores(df, score_frame(df, thresholds), now=now)
+
+
+def threshold_flags(df, thresholds):
+    """
+    Boolean masks for the threshold-based critical and warning item lists
+    reported in the upload summary (distinct from the risk-level counts).
+    """
+    thresholds = resolve_thresholds(df, thresholds)
+    pressure = df['Pressure']
+    temperature = df['Temperature']
+    critical = (pressure > thresholds.pressure_critical) | (temperature > thresholds.temperature_critical)
+    warning = (
+        ((pressure > thresholds.pressure_warning) & (pressure <= thresholds.pressure_critical)) |
+        ((temperature > thresholds.temperature_warning) & (temperature <= thresholds.temperature_critical))
+    )
+    return critical, warning
+
+
+def thresholds_used(thresholds):
+    """Snapshot of the thresholds applied to an upload, stored alongside its summary"""
+    used = {
+        "pressure_critical": thresholds.pressure_critical,
+        "pressure_warning": thresholds.pressure_warning,
+        "temperature_critical": thresholds.temperature_critical,
+        "temperature_warning": thresholds.temperature_warning,
+        "flowrate_min": thresholds.flowrate_min,
+        "flowrate_max": thresholds.flowrate_max,
+    }
+    profiles = getattr(thresholds, 'profiles', None)
+    if profiles:
+        used["profiles"] = profiles
+    return used
+
+
+def threshold_version(thresholds):
+    """
+    Short stable fingerprint of the threshold values. Results computed under
+    the same version are interchangeable.
+    """
+    payload = json.dumps(thresholds_used(thresholds), sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,164 @@
+"""
+Threshold what-if simulation.
+
+Re-scores the ``EquipmentHistory`` readings of the last N days under the
+current and a candidate set of thresholds and reports how the outcome would
+change, without writing anything. Rows are read in primary-key order with
+keyset pagination, ``SIMULATION_CHUNK_ROWS`` at a time, as plain value tuples;
+each chunk is scored with both threshold sets in one vectorized pass and only
+running totals are kept, so memory use does not grow with the window.
+Readings are scored with the type stored on each of them (for per-type
+threshold profiles); equipment names are looked up once per equipment.
+Readings whose upload was pruned by retention count towards the event totals
+but not towards the per-upload health scores.
+"""
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.conf import settings as django_settings
+from django.utils import timezone
+
+from .equipment import labels
+from .models import EquipmentHistory
+from .scoring import RISK_LEVELS, THRESHOLD_FIELDS, ThresholdTable, score_frame, threshold_flags, thresholds_used
+
+
+COLUMNS = ['id', 'equipment', 'Type', 'Pressure', 'Temperature', 'Flowrate', 'session']
+FIELDS = ['id', 'equipment_id', 'equipment_type', 'pressure', 'temperature', 'flowrate', 'upload_session_id']
+
+# Per-row counters kept for each threshold set
+COUNTERS = ['critical_events', 'warning_events'] + [f'{level}_risk' for level in RISK_LEVELS]
+
+
+def candidate_thresholds(current, values, profiles=None):
+    """
+    Candidate ``ThresholdTable``: ``values`` override the current defaults.
+    The current per-type profiles are kept unless ``profiles`` replaces them.
+    """
+    default = {field: values.get(field, getattr(current, field)) for field in THRESHOLD_FIELDS}
+    if profiles is None:
+        profiles = getattr(current, 'profiles', {})
+    return ThresholdTable(default, profiles)
+
+
+def _chunks(since, chunk_rows, equipment):
+    """
+    History rows recorded since ``since`` as DataFrames of up to ``chunk_rows``
+    rows. ``equipment`` collects ``{id: (name, type)}`` for the equipment
+    seen so far.
+    """
+    queryset = EquipmentHistory.objects.filter(recorded_at__gte=since).order_by('id')
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id).values_list(*FIELDS)[:chunk_rows])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+        unseen = set(frame['equipment'].unique().tolist()) - equipment.keys()
+        if unseen:
+            equipment.update(labels(unseen))
+        yield frame
+
+
+def _counters(frame, thresholds):
+    """Per-row event and risk-level indicators for one threshold set"""
+    critical, warning = threshold_flags(frame, thresholds)
+    level_code = score_frame(frame, thresholds)['level_code']
+    counters = {'critical_events': critical.to_numpy(), 'warning_events': warning.to_numpy()}
+    for code, level in enumerate(RISK_LEVELS):
+        counters[f'{level}_risk'] = level_code == code
+    return pd.DataFrame({key: value.astype(np.int64) for key, value in counters.items()}, index=frame.index)
+
+
+def _totals(parts, key):
+    """Combine per-chunk grouped sums"""
+    if not parts:
+        return pd.DataFrame(columns=COUNTERS)
+    return pd.concat(parts).groupby(level=key, sort=False).sum()
+
+
+def _health_scores(per_upload):
+    """Upload health scores, computed like ``analyze_upload`` does"""
+    return np.maximum(0, 100 - per_upload['critical_events'] * 10 - per_upload['warning_events'] * 3)
+
+
+def simulate(current, candidate, days, chunk_rows=None, max_equipment=None):
+    """
+    Score the last ``days`` of history under both threshold sets.
+
+    Returns total event counts for each set, the equipment whose event counts
+    change (largest changes first, at most ``max_equipment``) and the change
+    in average health score of the uploads that are still kept.
+    """
+    started = time.perf_counter()
+    chunk_rows = chunk_rows or django_settings.SIMULATION_CHUNK_ROWS
+    max_equipment = max_equipment or django_settings.SIMULATION_MAX_EQUIPMENT
+    since = timezone.now() - timedelta(days=days)
+
+    rows, detached = 0, 0
+    by_equipment, by_upload, names = [], [], {}
+    for frame in _chunks(since, chunk_rows, names):
+        rows += len(frame)
+        counts = pd.concat(
+            [_counters(frame, current).add_prefix('current_'), _counters(frame, candidate).add_prefix('candidate_')],
+            axis=1,
+        )
+        by_equipment.append(counts.groupby(frame['equipment'], sort=False).sum())
+        # No upload left to score for readings whose upload was pruned
+        attached = frame['session'].notna()
+        detached += int((~attached).sum())
+        by_upload.append(counts[attached].groupby(frame['session'][attached].astype(np.int64), sort=False).sum())
+
+    prefixed = [f'{which}_{key}' for which in ('current', 'candidate') for key in COUNTERS]
+    equipment = _totals(by_equipment, 'equipment').reindex(columns=prefixed, fill_value=0)
+    uploads = _totals(by_upload, 'session').reindex(columns=prefixed, fill_value=0)
+
+    def totals(which):
+        sums = equipment[[f'{which}_{key}' for key in COUNTERS]].sum()
+        return {key: int(sums[f'{which}_{key}']) for key in COUNTERS}
+
+    current_totals, candidate_totals = totals('current'), totals('candidate')
+
+    current_health = _health_scores(uploads.filter(like='current_').rename(columns=lambda c: c[len('current_'):]))
+    candidate_health = _health_scores(uploads.filter(like='candidate_').rename(columns=lambda c: c[len('candidate_'):]))
+    current_avg = round(float(current_health.mean()), 1) if len(uploads) else None
+    candidate_avg = round(float(candidate_health.mean()), 1) if len(uploads) else None
+
+    critical_change = equipment['candidate_critical_events'] - equipment['current_critical_events']
+    warning_change = equipment['candidate_warning_events'] - equipment['current_warning_events']
+    changed = (critical_change != 0) | (warning_change != 0)
+    magnitude = (critical_change.abs() + warning_change.abs())[changed].sort_values(ascending=False, kind='stable')
+
+    return {
+        "days": days,
+        "rows": rows,
+        "equipment_count": len(equipment),
+        "upload_count": len(uploads),
+        "detached_rows": detached,
+        "thresholds": {"current": thresholds_used(current), "candidate": thresholds_used(candidate)},
+        "current": current_totals,
+        "candidate": candidate_totals,
+        "delta": {key: candidate_totals[key] - current_totals[key] for key in COUNTERS},
+        "health_score": {
+            "current_avg": current_avg,
+            "candidate_avg": candidate_avg,
+            "delta": round(candidate_avg - current_avg, 1) if current_avg is not None else None,
+        },
+        "equipment_changed": int(changed.sum()),
+        "equipment_changes": [{
+            "equipment_name": names[key][0],
+            "equipment_type": names[key][1],
+            "critical_events": {
+                "current": int(equipment.at[key, 'current_critical_events']),
+                "candidate": int(equipment.at[key, 'candidate_critical_events']),
+            },
+            "warning_events": {
+                "current": int(equipment.at[key, 'current_warning_events']),
+                "candidate": int(equipment.at[key, 'candidate_warning_events']),
+            },
+        } for key in magnitude.index[:max_equipment]],
+        "seconds": round(time.perf_counter() - started, 4),
+    }
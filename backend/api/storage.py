@@ -0,0 +1,159 @@
+"""
+Columnar sidecar storage for per-row upload data.
+
+Row-level equipment data is kept once per upload in a compressed NumPy
+``.npz`` archive instead of being repeated inside ``summary_data``. Each
+DataFrame chunk is written as its own set of column arrays
+(``c<chunk>/<column position>.npy``) so the streaming path can append
+without holding the whole file in memory. Readers decompress only the
+columns they ask for.
+"""
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+import pandas as pd
+from django.core.files import File
+
+
+# Sections of the upload summary that repeat row-level data
+ROW_LEVEL_KEYS = ('data', 'critical_items', 'warning_items', 'predictions')
+
+_MANIFEST = 'manifest.json'
+
+
+def compact_summary(summary):
+    """Summary with the row-level sections removed, for ``UploadHistory.summary_data``"""
+    return {key: value for key, value in summary.items() if key not in ROW_LEVEL_KEYS}
+
+
+def _column_array(series):
+    """Numeric columns keep their dtype (NaN included); everything else is stored as text"""
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        values = series.to_numpy()
+        if values.dtype == object:  # nullable extension dtypes
+            values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return values
+    # Matches the fillna('') used by the legacy JSON records
+    return series.fillna('').astype(str).to_numpy(dtype=str)
+
+
+class ColumnarWriter:
+    """Append DataFrame chunks to an ``.npz`` archive on disk"""
+
+    def __init__(self):
+        handle, self.path = tempfile.mkstemp(suffix='.npz')
+        os.close(handle)
+        self._zip = zipfile.ZipFile(self.path, mode='w', compression=zipfile.ZIP_DEFLATED)
+        self.columns = None
+        self.chunks = 0
+        self.rows = 0
+
+    def append(self, df):
+        if self.columns is None:
+            self.columns = [str(col) for col in df.columns]
+        for position, col in enumerate(df.columns):
+            with self._zip.open(f'c{self.chunks}/{position}.npy', mode='w', force_zip64=True) as fh:
+                np.lib.format.write_array(fh, _column_array(df[col]), allow_pickle=False)
+        self.chunks += 1
+        self.rows += len(df)
+
+    def close(self):
+        manifest = {'columns': self.columns or [], 'chunks': self.chunks, 'rows': self.rows}
+        self._zip.writestr(_MANIFEST, json.dumps(manifest))
+        self._zip.close()
+
+    def save_as(self, field_file, name):
+        """Close the archive and store it in ``field_file`` (the model is not saved)"""
+        self.close()
+        _store(field_file, name, self.path)
+
+    def save_to(self, upload_record):
+        """Close the archive and attach it to ``upload_record.data_file``"""
+        self.close()
+        store_sidecar(upload_record, self.path)
+
+    def discard(self):
+        self._zip.close()
+        os.remove(self.path)
+
+
+def _store(field_file, name, path):
+    try:
+        with open(path, 'rb') as fh:
+            field_file.save(name, File(fh), save=False)
+    finally:
+        os.remove(path)
+
+
+def store_sidecar(upload_record, path):
+    """Attach a closed archive at ``path`` to ``upload_record.data_file``; the file is moved into storage"""
+    name = f"{os.path.splitext(os.path.basename(upload_record.filename))[0]}.npz"
+    _store(upload_record.data_file, name, path)
+    upload_record.save(update_fields=['data_file'])
+
+
+def write_sidecar(df):
+    """Write a whole DataFrame to a closed archive in a temporary file and return its path"""
+    writer = ColumnarWriter()
+    writer.append(df)
+    writer.close()
+    return writer.path
+
+
+def save_upload_frame(upload_record, df):
+    """Write a whole DataFrame as the upload's columnar sidecar"""
+    store_sidecar(upload_record, write_sidecar(df))
+
+
+def _read_sidecar(field_file, columns=None):
+    with field_file.open('rb') as fh:
+        return _read_archive(fh, columns)
+
+
+def _read_archive(fh, columns=None):
+    with zipfile.ZipFile(fh) as archive:
+        manifest = json.loads(archive.read(_MANIFEST))
+        names = manifest['columns']
+        wanted = names if columns is None else [col for col in columns if col in names]
+        data = {}
+        for col in wanted:
+            position = names.index(col)
+            parts = []
+            for chunk in range(manifest['chunks']):
+                with archive.open(f'c{chunk}/{position}.npy') as member:
+                    parts.append(np.lib.format.read_array(member, allow_pickle=False))
+            data[col] = np.concatenate(parts) if parts else np.array([])
+    return pd.DataFrame(data, columns=wanted)
+
+
+def load_upload_frame(upload_record, columns=None):
+    """
+    Load an upload's per-row equipment data as a DataFrame.
+
+    Reads the columnar sidecar, or falls back to ``summary_data['data']`` for
+    uploads stored before the sidecar existed. Returns None if neither exists.
+    """
+    if upload_record.data_file:
+        return _read_sidecar(upload_record.data_file, columns)
+
+    data = (upload_record.summary_data or {}).get('data')
+    if not data:
+        return None
+    frame = pd.DataFrame(data)
+    if columns is not None:
+        frame = frame[[col for col in columns if col in frame.columns]]
+    return frame
+
+
+def load_sidecar_file(path, columns=None):
+    """Load columns of an archive that is not attached to a model yet (see ``write_sidecar``)"""
+    with open(path, 'rb') as fh:
+        return _read_archive(fh, columns)
+
+
+def load_archive_frame(archive, columns=None):
+    """Load the rows of a ``HistoryArchive`` file as a DataFrame"""
+    return _read_sidecar(archive.file, columns)
@@ -0,0 +1,145 @@
+"""
+Chunked streaming ingestion for very large uploads.
+
+The upload is read ``UPLOAD_STREAM_CHUNK_ROWS`` rows at a time. Each chunk is
+scored and persisted, then folded into running aggregates, so peak memory
+depends on the chunk size rather than the file size. Only bounded top-N
+lists of items and predictions are kept for the final summary.
+"""
+from collections import Counter
+
+import numpy as np
+from django.conf import settings as django_settings
+
+from .ingest import ingest_equipment_history
+from .readers import iter_upload_frames
+from .scoring import predictions_from_scores, score_frame, take_scores, threshold_flags, thresholds_used
+
+
+class UploadAggregator:
+    """Running aggregates that reproduce ``analyze_upload`` one chunk at a time"""
+
+    def __init__(self, thresholds, top_n):
+        self.thresholds = thresholds
+        self.top_n = top_n
+        self.total_count = 0
+        self.sums = {'Flowrate': 0.0, 'Pressure': 0.0, 'Temperature': 0.0}
+        self.counts = {'Flowrate': 0, 'Pressure': 0, 'Temperature': 0}
+        self.type_counts = Counter()
+        self.critical_item_count = 0
+        self.warning_item_count = 0
+        self.critical_items = []
+        self.warning_items = []
+        self.level_counts = Counter()
+        self.maintenance_days_sum = 0
+        # (risk_score, row_index, prediction) for the highest-risk rows seen so far
+        self.top_predictions = []
+
+    def add_chunk(self, chunk):
+        """Fold one DataFrame chunk into the running aggregates"""
+        offset = self.total_count
+        self.total_count += len(chunk)
+
+        for col in self.sums:
+            self.sums[col] += float(chunk[col].sum())
+            self.counts[col] += int(chunk[col].count())
+        type_counts = chunk['Type'].value_counts()
+        self.type_counts.update(type_counts[type_counts > 0].to_dict())
+
+        critical_mask, warning_mask = threshold_flags(chunk, self.thresholds)
+        self.critical_item_count += int(critical_mask.sum())
+        self.warning_item_count += int(warning_mask.sum())
+        # Keep the first N items in file order, matching critical_items[:N]
+        if len(self.critical_items) < self.top_n:
+            room = self.top_n - len(self.critical_items)
+            self.critical_items += chunk[critical_mask].head(room).fillna('').to_dict(orient='records')
+        if len(self.warning_items) < self.top_n:
+            room = self.top_n - len(self.warning_items)
+            self.warning_items += chunk[warning_mask].head(room).fillna('').to_dict(orient='records')
+
+        scores = score_frame(chunk, self.thresholds)
+        codes, counts = np.unique(scores["level_code"], return_counts=True)
+        self.level_counts.update(dict(zip(codes.tolist(), counts.tolist())))
+        self.maintenance_days_sum += int(scores["maintenance_days"].sum())
+
+        # Only the chunk's own top N can enter the global top N
+        rounded = np.array([round(r, 1) for r in scores["risk"].tolist()])
+        candidates = np.sort(np.argsort(-rounded, kind='stable')[:self.top_n])
+        predictions = predictions_from_scores(chunk.iloc[candidates], take_scores(scores, candidates))
+        ranked = sorted(zip(rounded[candidates].tolist(), candidates.tolist()), key=lambda item: (-item[0], item[1]))
+        self.top_predictions += [
+            (score, offset + pos, pred) for (score, pos), pred in zip(ranked, predictions)
+        ]
+        self.top_predictions.sort(key=lambda item: (-item[0], item[1]))
+        del self.top_predictions[self.top_n:]
+
+    def summary(self):
+        """Final upload summary, shaped like the in-memory ``analyze_upload`` result"""
+        def mean(col):
+            return self.sums[col] / self.counts[col] if self.counts[col] else float('nan')
+
+        predictions = [pred for _, _, pred in self.top_predictions]
+        health_score = max(0, 100 - (self.critical_item_count * 10) - (self.warning_item_count * 3))
+        avg_maintenance_days = self.maintenance_days_sum / self.total_count if self.total_count else 0
+
+        return {
+            "total_count": self.total_count,
+            "avg_flowrate": mean('Flowrate'),
+            "avg_pressure": mean('Pressure'),
+            "avg_temperature": mean('Temperature'),
+            "type_distribution": dict(self.type_counts.most_common()),
+            "critical_items": self.critical_items,
+            "warning_items": self.warning_items,
+            "critical_item_count": self.critical_item_count,
+            "warning_item_count": self.warning_item_count,
+            "health_score": health_score,
+            "predictions": predictions,
+            "prediction_summary": {
+                "critical_count": self.level_counts.get(3, 0),
+                "warning_count": self.level_counts.get(2, 0),
+                "avg_maintenance_days": round(avg_maintenance_days, 1),
+                "next_maintenance": predictions[0]["maintenance_date"] if predictions else None,
+                "highest_risk": predictions[0] if predictions else None
+            },
+            "thresholds_used": thresholds_used(self.thresholds),
+            # Row-level lists above are capped at top_n; the counts are exact
+            "streamed": True,
+            "top_n": self.top_n,
+        }
+
+
+def stream_upload(file_obj, upload_record, thresholds, chunk_rows=None, top_n=None, on_chunk=None, sidecar=None):
+    """
+    Read, score and persist an upload (CSV, compressed CSV, Parquet or Arrow)
+    chunk by chunk.
+
+    Must be called inside ``transaction.atomic()``. ``on_chunk(rows)`` is
+    called after each chunk, and each chunk is appended to ``sidecar`` (a
+    ``ColumnarWriter``) if given. Returns the summary and combined ingest metrics.
+    """
+    if chunk_rows is None:
+        chunk_rows = django_settings.UPLOAD_STREAM_CHUNK_ROWS
+    if top_n is None:
+        top_n = django_settings.UPLOAD_STREAM_TOP_N
+
+    aggregator = UploadAggregator(thresholds, top_n)
+    ingest = {"rows": 0, "seconds": 0.0, "rollup_seconds": 0.0, "chunks": 0}
+
+    for chunk in iter_upload_frames(file_obj, chunk_rows):
+        aggregator.add_chunk(chunk)
+        if sidecar is not None:
+            sidecar.append(chunk)
+        metrics = ingest_equipment_history(chunk, upload_record)
+        ingest["rows"] += metrics["rows"]
+        ingest["seconds"] += metrics["seconds"]
+        ingest["rollup_seconds"] += metrics["rollup_seconds"]
+        ingest["method"] = metrics["method"]
+        ingest["batch_size"] = metrics["batch_size"]
+        ingest["chunks"] += 1
+        if on_chunk:
+            on_chunk(aggregator.total_count)
+
+    ingest["seconds"] = round(ingest["seconds"], 4)
+    ingest["rollup_seconds"] = round(ingest["rollup_seconds"], 4)
+    ingest["rows_per_second"] = round(ingest["rows"] / ingest["seconds"], 1) if ingest["seconds"] > 0 else None
+    return aggregator.summary(), ingest
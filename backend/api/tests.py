@@ -1,12 +1,62 @@
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from unittest import mock
 
-from django.test import TestCase
+import numpy as np
+import pandas as pd
 from django.contrib.auth.models import User
-from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-import pandas as pd
-import io
+from rest_framework.test import APIClient
+
+from . import alert_state, config, equipment, prediction_cache, readers
+from .alerts import dispatch_pending, enqueue_alert
+from .digests import buffer_events, flush_digest
+from .jobs import run_upload_job
+from .models import (
+    AlertDigestEvent, AlertLog, AlertOutbox, AlertSettings, ConfigVersion, Equipment, EquipmentAlertState,
+    EquipmentHistory, EquipmentRollup, HistoryArchive, MaintenanceSchedule, ResumableUpload, ThresholdSettings,
+    UploadHistory, UploadJob,
+)
+from .retention import apply_retention, prune_uploads
+from .rollups import rebuild_rollups
+from .scoring import (
+    IncrementalScores, THRESHOLD_FIELDS, ThresholdTable, predict_frame, predictions_from_scores, score_frame,
+    threshold_flags,
+)
+from .storage import compact_summary, load_archive_frame, load_upload_frame
+from .views import analyze_upload, calculate_risk_score, get_alert_settings, get_thresholds
+
+
+# Stored uploads, sidecars, job files and archives written by the tests
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix='api-tests-media-')
 
-class UploadTests(TestCase):
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT, RESUMABLE_UPLOAD_DIR=os.path.join(TEST_MEDIA_ROOT, 'resumable'))
+class MediaTestCase(TestCase):
+    """Keeps files the tests store out of the real MEDIA_ROOT"""
+
+    def tearDown(self):
+        shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+        super().tearDown()
+
+
+class UploadTests(MediaTestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='admin', password='password')
         self.client = APIClient()
@@ -42,3 +92,1265 @@ class UploadTests(TestCase):
         self.assertEqual(response.data['critical_items'][0]['Equipment Name'], 'Reactor B')
         
         print("Upload Logic Test Passed!")
+
+
+class _Thresholds:
+    pressure_warning = 70.0
+    pressure_critical = 80.0
+    temperature_warning = 130.0
+    temperature_critical = 150.0
+    flowrate_min = 10.0
+    flowrate_max = 200.0
+
+
+def _row_by_row_predictions(df, thresholds):
+    """Reference implementation: the original per-row scoring loop"""
+    predictions = []
+    for _, row in df.iterrows():
+        pressure = float(row.get('Pressure', 0))
+        temperature = float(row.get('Temperature', 0))
+        flowrate = float(row.get('Flowrate', 0))
+        risk_data = calculate_risk_score(pressure, temperature, flowrate, thresholds)
+        predictions.append({
+            "equipment_name": row.get('Equipment Name', 'Unknown'),
+            "type": row.get('Type', 'Unknown'),
+            "pressure": pressure,
+            "temperature": temperature,
+            "flowrate": flowrate,
+            "risk_score": risk_data["score"],
+            "risk_level": risk_data["level"],
+            "maintenance_in_days": risk_data["maintenance_days"],
+            "maintenance_date": (datetime.now() + timedelta(days=risk_data["maintenance_days"])).strftime("%Y-%m-%d"),
+            "risk_factors": risk_data["factors"]
+        })
+    predictions.sort(key=lambda x: x["risk_score"], reverse=True)
+    return predictions
+
+
+class VectorizedScoringTests(MediaTestCase):
+    def test_parity_with_row_by_row_scoring(self):
+        rng = np.random.default_rng(42)
+        n = 5000
+        df = pd.DataFrame({
+            'Equipment Name': [f'Unit {i}' for i in range(n)],
+            'Type': rng.choice(['Pump', 'Reactor', 'Tank'], n),
+            'Flowrate': np.round(rng.uniform(0, 260, n), 2),
+            'Pressure': np.round(rng.uniform(0, 110, n), 1),
+            'Temperature': np.round(rng.uniform(0, 200, n), 1),
+        })
+        # Exact boundary values
+        df.loc[:5, 'Pressure'] = [70.0, 80.0, 70.1, 80.1, 100.0, 0.0]
+        df.loc[:5, 'Temperature'] = [130.0, 150.0, 130.1, 150.1, 200.0, 0.0]
+        df.loc[:5, 'Flowrate'] = [10.0, 200.0, 9.9, 200.1, 0.0, 1000.0]
+
+        thresholds = _Thresholds()
+        self.assertEqual(predict_frame(df, thresholds), _row_by_row_predictions(df, thresholds))
+
+    def test_incremental_rescoring_matches_full_scoring(self):
+        rng = np.random.default_rng(3)
+        n = 20000
+        df = pd.DataFrame({
+            'Type': rng.choice(['Pump', 'Reactor', 'Tank'], n),
+            'Flowrate': np.round(rng.uniform(0, 260, n), 2),
+            'Pressure': np.round(rng.uniform(0, 110, n), 1),
+            'Temperature': np.round(rng.uniform(0, 200, n), 1),
+        })
+        limits = {field: getattr(_Thresholds, field) for field in THRESHOLD_FIELDS}
+        scorer = IncrementalScores(df, ThresholdTable(limits))
+        steps = [
+            ({'pressure_critical': 82.0}, None),
+            ({'pressure_warning': 40.0, 'flowrate_min': 15.0}, None),
+            ({'flowrate_max': 150.0, 'temperature_critical': 170.0}, None),
+            ({}, {'Pump': {'pressure_critical': 60.0}}),
+            ({'temperature_warning': 100.0}, {'Pump': {'pressure_critical': 65.0}, 'Tank': {'flowrate_min': 30.0}}),
+        ]
+        for change, profiles in steps:
+            limits.update(change)
+            thresholds = ThresholdTable(limits, profiles)
+            before = scorer.scores['level_code'].copy()
+            reclassified = scorer.rescore(thresholds)
+            expected = score_frame(df, thresholds)
+            for key in ('pressure_risk', 'temp_risk', 'flow_risk', 'risk', 'level_code', 'maintenance_days'):
+                np.testing.assert_array_equal(scorer.scores[key], expected[key])
+            for key, mask in expected['masks'].items():
+                np.testing.assert_array_equal(scorer.scores['masks'][key], mask)
+            np.testing.assert_array_equal(reclassified, np.flatnonzero(before != expected['level_code']))
+            np.testing.assert_array_equal(scorer.level_counts, np.bincount(expected['level_code'], minlength=4))
+
+    def test_missing_numeric_columns_default_to_zero(self):
+        df = pd.DataFrame({'Equipment Name': ['A'], 'Pressure': [90]})
+        thresholds = _Thresholds()
+        self.assertEqual(predict_frame(df, thresholds), _row_by_row_predictions(df, thresholds))
+
+
+def _csv_upload(df, name='test.csv'):
+    """Encode a DataFrame as an in-memory CSV file upload"""
+    byte_file = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+    byte_file.name = name
+    return byte_file
+
+
+def _sample_frame(n=50):
+    return pd.DataFrame({
+        'Equipment Name': [f'Unit {i}' for i in range(n)],
+        'Type': ['Pump', 'Reactor'] * (n // 2),
+        'Flowrate': [100.0 + i for i in range(n)],
+        'Pressure': [40.0 + i for i in range(n)],
+        'Temperature': [90.0 + i * 2 for i in range(n)],
+    })
+
+
+class BulkIngestTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_upload_writes_all_rows_and_reports_throughput(self):
+        response = self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame())}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(EquipmentHistory.objects.count(), 50)
+        self.assertEqual(response.data['ingest']['rows'], 50)
+        self.assertEqual(response.data['ingest']['method'], 'bulk_create')
+        self.assertIn('rows_per_second', response.data['ingest'])
+
+    def test_failed_ingest_leaves_no_partial_upload(self):
+        with mock.patch.object(EquipmentHistory.objects, 'bulk_create', side_effect=RuntimeError('db down')):
+            response = self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame())}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadHistory.objects.count(), 0)
+        self.assertEqual(EquipmentHistory.objects.count(), 0)
+
+
+class StreamingUploadTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_streaming_summary_matches_in_memory_path(self):
+        rng = np.random.default_rng(7)
+        n = 1000
+        df = pd.DataFrame({
+            'Equipment Name': [f'Unit {i}' for i in range(n)],
+            'Type': rng.choice(['Pump', 'Reactor', 'Tank'], n),
+            'Flowrate': np.round(rng.uniform(0, 260, n), 2),
+            'Pressure': np.round(rng.uniform(0, 110, n), 1),
+            'Temperature': np.round(rng.uniform(0, 200, n), 1),
+        })
+
+        full = self.client.post('/api/upload/?stream=false', {'file': _csv_upload(df)}, format='multipart').data
+        with override_settings(UPLOAD_STREAM_CHUNK_ROWS=64, UPLOAD_STREAM_TOP_N=10):
+            streamed = self.client.post('/api/upload/?stream=true&force=true', {'file': _csv_upload(df)}, format='multipart').data
+
+        self.assertTrue(streamed['streamed'])
+        self.assertEqual(streamed['ingest']['chunks'], 16)
+        self.assertEqual(EquipmentHistory.objects.count(), 2 * n)
+        for key in ('total_count', 'type_distribution', 'health_score', 'critical_item_count', 'warning_item_count'):
+            self.assertEqual(streamed[key], full[key], key)
+        for key in ('avg_flowrate', 'avg_pressure', 'avg_temperature'):
+            self.assertAlmostEqual(streamed[key], full[key], places=9)
+        self.assertEqual(streamed['critical_items'], full['critical_items'][:10])
+        self.assertEqual(streamed['warning_items'], full['warning_items'][:10])
+        self.assertEqual(streamed['predictions'], full['predictions'][:10])
+        self.assertEqual(streamed['prediction_summary'], full['prediction_summary'])
+
+    def test_streaming_rejects_missing_columns_without_writes(self):
+        df = pd.DataFrame({'Equipment Name': ['A'], 'Type': ['Pump']})
+        response = self.client.post('/api/upload/?stream=true', {'file': _csv_upload(df)}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Missing columns', response.data['error'])
+        self.assertEqual(UploadHistory.objects.count(), 0)
+
+
+class UploadJobTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_async_upload_returns_job_and_reports_progress(self):
+        with mock.patch('api.jobs.enqueue_upload_job') as enqueue:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/upload/?async=true', {'file': _csv_upload(_sample_frame())}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        enqueue.assert_called_once_with(job_id)
+        self.assertEqual(EquipmentHistory.objects.count(), 0)
+
+        queued = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual(queued['status'], 'queued')
+        self.assertIsNone(queued['summary'])
+
+        self.assertTrue(run_upload_job(job_id))
+        # A second worker cannot claim the same job
+        self.assertFalse(run_upload_job(job_id))
+
+        done = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual(done['status'], 'completed')
+        self.assertEqual(done['stage'], 'done')
+        self.assertEqual(done['progress'], 100.0)
+        self.assertEqual(done['rows_processed'], 50)
+        self.assertEqual(done['summary']['total_count'], 50)
+        self.assertEqual(EquipmentHistory.objects.count(), 50)
+
+    def test_jobs_left_running_by_a_crash_are_requeued(self):
+        with mock.patch('api.jobs.enqueue_upload_job'):
+            job_id = self.client.post('/api/upload/?async=true', {'file': _csv_upload(_sample_frame())},
+                                      format='multipart').data['job_id']
+        # A long job whose worker is still alive keeps running
+        UploadJob.objects.filter(pk=job_id).update(status='running', stage='persisting',
+                                                   started_at=timezone.now() - timedelta(hours=2),
+                                                   heartbeat_at=timezone.now() - timedelta(seconds=20))
+        call_command('process_upload_jobs', stdout=io.StringIO())
+        self.assertEqual(UploadJob.objects.get(pk=job_id).status, 'running')
+
+        # Its worker died: the heartbeat stopped
+        UploadJob.objects.filter(pk=job_id).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+        call_command('process_upload_jobs', stdout=io.StringIO())
+        job = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual((job['status'], job['rows_processed']), ('completed', 50))
+
+    def test_failed_job_records_error(self):
+        df = pd.DataFrame({'Equipment Name': ['A']})
+        with mock.patch('api.jobs.enqueue_upload_job'):
+            job_id = self.client.post('/api/upload/?async=true', {'file': _csv_upload(df)}, format='multipart').data['job_id']
+        run_upload_job(job_id)
+
+        job = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('Missing columns', job['error'])
+
+
+class ColumnarStorageTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_row_data_moves_to_sidecar(self):
+        df = _sample_frame()
+        response = self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart')
+        self.assertEqual(len(response.data['data']), 50)
+
+        record = UploadHistory.objects.get()
+        for key in ('data', 'critical_items', 'warning_items', 'predictions'):
+            self.assertNotIn(key, record.summary_data)
+        self.assertEqual(record.summary_data['total_count'], 50)
+        self.assertTrue(record.data_file.name.endswith('.npz'))
+
+        loaded = load_upload_frame(record)
+        self.assertEqual(list(loaded.columns), list(df.columns))
+        self.assertEqual(loaded.to_dict(orient='records'), df.to_dict(orient='records'))
+        self.assertEqual(list(load_upload_frame(record, columns=['Pressure']).columns), ['Pressure'])
+
+    def test_predictions_use_sidecar_for_streamed_uploads(self):
+        with override_settings(UPLOAD_STREAM_CHUNK_ROWS=16, UPLOAD_STREAM_TOP_N=5):
+            self.client.post('/api/upload/?stream=true', {'file': _csv_upload(_sample_frame())}, format='multipart')
+
+        response = self.client.get('/api/predict/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['total'], 50)
+
+    def test_legacy_summary_data_is_still_readable(self):
+        records = _sample_frame(4).to_dict(orient='records')
+        record = UploadHistory.objects.create(filename='old.csv', summary_data={'data': records}, file='uploads/old.csv')
+
+        self.assertEqual(load_upload_frame(record).to_dict(orient='records'), records)
+        self.assertEqual(self.client.get('/api/predict/').data['summary']['total'], 4)
+
+
+class UploadDeduplicationTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.df = _sample_frame()
+
+    def upload(self, query=''):
+        return self.client.post(f'/api/upload/{query}', {'file': _csv_upload(self.df)}, format='multipart')
+
+    def test_repeat_upload_returns_cached_summary_without_writes(self):
+        first = self.upload()
+        second = self.upload()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertTrue(second.data['cached'])
+        self.assertEqual(UploadHistory.objects.count(), 1)
+        self.assertEqual(EquipmentHistory.objects.count(), 50)
+        self.assertEqual(second.data['health_score'], first.data['health_score'])
+        self.assertEqual(second.data['critical_items'], first.data['critical_items'])
+        self.assertEqual(len(second.data['data']), 50)
+
+    def test_force_and_threshold_changes_reprocess(self):
+        self.upload()
+        self.assertEqual(self.upload('?force=true').status_code, status.HTTP_201_CREATED)
+
+        self.addCleanup(config.clear_cache)
+        self.client.put('/api/thresholds/', {'pressure_critical': 85}, format='json')
+        self.assertEqual(self.upload().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(UploadHistory.objects.count(), 3)
+
+
+class CompressedUploadTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.csv_bytes = _sample_frame().to_csv(index=False).encode('utf-8')
+
+    def upload(self, payload, name, query=''):
+        byte_file = io.BytesIO(payload)
+        byte_file.name = name
+        return self.client.post(f'/api/upload/{query}', {'file': byte_file}, format='multipart')
+
+    def test_gzip_zip_and_zstd_uploads(self):
+        zipped = io.BytesIO()
+        with zipfile.ZipFile(zipped, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('plant.csv', self.csv_bytes)
+        payloads = [(gzip.compress(self.csv_bytes), 'plant.csv.gz'), (zipped.getvalue(), 'plant.zip')]
+        try:
+            import zstandard
+            payloads.append((zstandard.ZstdCompressor().compress(self.csv_bytes), 'plant.csv.zst'))
+        except ImportError:
+            pass
+
+        for payload, name in payloads:
+            for query in ('', '?stream=true'):
+                response = self.upload(payload, name, query + ('&' if query else '?') + 'force=true')
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED, name)
+                self.assertEqual(response.data['total_count'], 50, name)
+
+            # The stored file keeps its compressed form
+            record = UploadHistory.objects.order_by('-id').first()
+            with record.file.open('rb') as stored:
+                self.assertEqual(stored.read(), payload)
+
+    def test_zip_with_several_members_is_rejected(self):
+        zipped = io.BytesIO()
+        with zipfile.ZipFile(zipped, 'w') as archive:
+            archive.writestr('a.csv', self.csv_bytes)
+            archive.writestr('b.csv', self.csv_bytes)
+
+        response = self.upload(zipped.getvalue(), 'two.zip')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('exactly one file', response.data['error'])
+
+
+class ColumnarUploadFormatTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.df = _sample_frame()
+        self.df['Notes'] = 'extra column'
+
+    def upload(self, payload, name, query=''):
+        byte_file = io.BytesIO(payload)
+        byte_file.name = name
+        return self.client.post(f'/api/upload/{query}', {'file': byte_file}, format='multipart')
+
+    def test_parquet_and_arrow_uploads_match_csv(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow not installed')
+
+        table = pa.Table.from_pandas(self.df, preserve_index=False)
+        parquet, arrow_file, arrow_stream = io.BytesIO(), io.BytesIO(), io.BytesIO()
+        pq.write_table(table, parquet, row_group_size=16)
+        with pa.ipc.new_file(arrow_file, table.schema) as writer:
+            writer.write_table(table, max_chunksize=16)
+        with pa.ipc.new_stream(arrow_stream, table.schema) as writer:
+            writer.write_table(table, max_chunksize=16)
+
+        expected = self.upload(self.df.to_csv(index=False).encode('utf-8'), 'plant.csv').data
+        for payload, name in ((parquet, 'plant.parquet'), (arrow_file, 'plant.arrow'), (arrow_stream, 'plant.arrows')):
+            for query in ('?force=true', '?force=true&stream=true'):
+                response = self.upload(payload.getvalue(), name, query)
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED, name)
+                for key in ('total_count', 'avg_pressure', 'type_distribution', 'health_score', 'prediction_summary'):
+                    self.assertEqual(response.data[key], expected[key], f'{name} {query} {key}')
+                # Columns outside REQUIRED_COLUMNS and UPLOAD_EXTRA_COLUMNS are not read
+                if 'stream' not in query:
+                    self.assertNotIn('Notes', response.data['data'][0])
+
+    def test_parquet_missing_columns_rejected(self):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest('pyarrow not installed')
+
+        parquet = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(self.df.drop(columns=['Pressure'])), parquet)
+        response = self.upload(parquet.getvalue(), 'plant.parquet')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Missing columns: ['Pressure']", response.data['error'])
+
+
+class CsvParsingProfileTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_profile_projects_and_types_columns(self):
+        df = _sample_frame(10)
+        df['Vibration'] = 1.5
+        df['Operator'] = 'night shift'
+
+        for arrow in (readers.pa, None):
+            with mock.patch.object(readers, 'pa', arrow), override_settings(UPLOAD_EXTRA_COLUMNS=['Vibration']):
+                frame = readers.read_upload_frame(_csv_upload(df))
+                chunks = list(readers.iter_upload_frames(_csv_upload(df), 4))
+
+            self.assertEqual(list(frame.columns), readers.REQUIRED_COLUMNS + ['Vibration'])
+            self.assertIsInstance(frame['Type'].dtype, pd.CategoricalDtype)
+            self.assertEqual(str(frame['Pressure'].dtype), 'float64')
+            self.assertEqual([len(chunk) for chunk in chunks], [4, 4, 2])
+            self.assertEqual(frame['Pressure'].tolist(), df['Pressure'].tolist())
+
+        if readers.pa is None:
+            return
+        # Parquet and Arrow uploads keep the same columns as CSV
+        parquet, arrow_file = io.BytesIO(), io.BytesIO()
+        table = readers.pa.Table.from_pandas(df, preserve_index=False)
+        readers.pq.write_table(table, parquet)
+        with readers.pa.ipc.new_file(arrow_file, table.schema) as writer:
+            writer.write_table(table)
+        for payload, name in ((parquet, 'plant.parquet'), (arrow_file, 'plant.arrow')):
+            upload = io.BytesIO(payload.getvalue())
+            upload.name = name
+            with override_settings(UPLOAD_EXTRA_COLUMNS=['Vibration']):
+                self.assertEqual(list(readers.read_upload_frame(upload).columns), readers.REQUIRED_COLUMNS + ['Vibration'])
+                chunks = list(readers.iter_upload_frames(upload, 4))
+            self.assertEqual(list(chunks[0].columns), readers.REQUIRED_COLUMNS + ['Vibration'])
+
+    def test_malformed_numeric_cells_are_reported(self):
+        df = _sample_frame(10).astype({'Pressure': object, 'Temperature': object})
+        df.loc[3, 'Pressure'] = 'high'
+        df.loc[7, 'Temperature'] = '12,5'
+
+        for query in ('', '?stream=true'):
+            response = self.client.post(f'/api/upload/{query}', {'file': _csv_upload(df)}, format='multipart')
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['validation_errors'], [
+                {'line': 5, 'column': 'Pressure', 'value': 'high', 'message': "'high' is not a number"},
+                {'line': 9, 'column': 'Temperature', 'value': '12,5', 'message': "'12,5' is not a number"},
+            ])
+
+
+class ResumableUploadTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        overrides = override_settings(RESUMABLE_UPLOAD_DIR=self.tmp.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _put_chunk(self, upload_id, index, body):
+        return self.client.generic(
+            'PUT', f'/api/uploads/resumable/{upload_id}/chunks/{index}/', body,
+            content_type='application/octet-stream', HTTP_X_CHUNK_SHA256=hashlib.sha256(body).hexdigest()
+        )
+
+    def test_chunks_resume_and_finalize_through_pipeline(self):
+        content = _csv_upload(_sample_frame(40)).getvalue()
+        chunk_size = 300
+        chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        response = self.client.post('/api/uploads/resumable/', {
+            'filename': 'big.csv', 'total_size': len(content), 'chunk_size': chunk_size,
+            'sha256': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload_id = response.data['upload_id']
+        self.assertEqual(response.data['total_chunks'], len(chunks))
+
+        # Last chunk first, then a corrupted chunk that must not count as received
+        self.assertEqual(self._put_chunk(upload_id, len(chunks) - 1, chunks[-1]).status_code, 200)
+        bad = self.client.generic(
+            'PUT', f'/api/uploads/resumable/{upload_id}/chunks/0/', chunks[0],
+            content_type='application/octet-stream', HTTP_X_CHUNK_SHA256='0' * 64
+        )
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+        state = self.client.get(f'/api/uploads/resumable/{upload_id}/').data
+        self.assertEqual(state['received_chunks'], [len(chunks) - 1])
+        self.assertEqual(state['received_ranges'], [[(len(chunks) - 1) * chunk_size, len(content)]])
+        self.assertEqual(self.client.post(f'/api/uploads/resumable/{upload_id}/finalize/').status_code, 400)
+
+        for index in state['missing_chunks']:
+            self.assertEqual(self._put_chunk(upload_id, index, chunks[index]).status_code, 200)
+
+        response = self.client.post(f'/api/uploads/resumable/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_count'], 40)
+        self.assertEqual(UploadHistory.objects.get().filename, 'big.csv')
+        self.assertEqual(ResumableUpload.objects.get().status, 'finalized')
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def _complete_session(self, content):
+        upload_id = self.client.post('/api/uploads/resumable/', {
+            'filename': 'retry.csv', 'total_size': len(content), 'chunk_size': len(content),
+        }, format='json').data['upload_id']
+        self.assertEqual(self._put_chunk(upload_id, 0, content).status_code, 200)
+        return upload_id
+
+    def test_failed_finalize_keeps_chunks_for_retry(self):
+        upload_id = self._complete_session(_csv_upload(_sample_frame(10)).getvalue())
+        finalize = f'/api/uploads/resumable/{upload_id}/finalize/'
+
+        with mock.patch('api.views.process_upload', side_effect=RuntimeError('disk full')):
+            self.assertEqual(self.client.post(finalize).status_code, status.HTTP_400_BAD_REQUEST)
+        state = self.client.get(f'/api/uploads/resumable/{upload_id}/').data
+        self.assertEqual((state['status'], state['missing_chunks']), ('active', []))
+
+        # A finalize already in progress elsewhere wins the claim
+        ResumableUpload.objects.filter(pk=upload_id).update(status='finalizing')
+        self.assertEqual(self.client.post(finalize).status_code, status.HTTP_409_CONFLICT)
+        ResumableUpload.objects.filter(pk=upload_id).update(status='active')
+
+        self.assertEqual(self.client.post(finalize).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(ResumableUpload.objects.get().status, 'finalized')
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    def test_abandoned_sessions_expire(self):
+        stale = self._complete_session(b'a,b\n1,2\n')
+        ResumableUpload.objects.filter(pk=stale).update(updated_at=timezone.now() - timedelta(days=2))
+        orphan = os.path.join(self.tmp.name, 'orphan')
+        os.mkdir(orphan)
+        os.utime(orphan, (0, 0))
+
+        fresh = self._complete_session(b'c,d\n3,4\n')
+
+        self.assertEqual([str(pk) for pk in ResumableUpload.objects.values_list('pk', flat=True)], [fresh])
+        self.assertEqual(os.listdir(self.tmp.name), [fresh])
+
+
+class BatchUploadTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_batch_persists_each_file_and_combines_summaries(self):
+        first = _sample_frame(20)
+        second = _sample_frame(30)
+        second['Pressure'] += 50
+        broken = first.drop(columns=['Pressure'])
+        files = [
+            _csv_upload(first, 'area1.csv'),
+            _csv_upload(second, 'area2.csv'),
+            _csv_upload(broken, 'broken.csv'),
+            _csv_upload(first, 'area1-copy.csv'),
+        ]
+
+        response = self.client.post('/api/upload/batch/', {'files': files}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statuses = [(item['filename'], item['status']) for item in response.data['files']]
+        self.assertEqual(statuses, [
+            ('area1.csv', 'created'), ('area2.csv', 'created'),
+            ('broken.csv', 'failed'), ('area1-copy.csv', 'duplicate'),
+        ])
+        self.assertIn('Missing columns', response.data['files'][2]['error'])
+        self.assertEqual(UploadHistory.objects.count(), 2)
+        self.assertEqual(EquipmentHistory.objects.count(), 50)
+
+        fleet = response.data['fleet_summary']
+        self.assertEqual(fleet['total_count'], 50)
+        self.assertEqual(fleet['files_created'], 2)
+        self.assertEqual(fleet['files_failed'], 1)
+        self.assertAlmostEqual(fleet['avg_pressure'], (first['Pressure'].sum() + second['Pressure'].sum()) / 50)
+        self.assertEqual(fleet['type_distribution'], {'Pump': 25, 'Reactor': 25})
+
+    def test_a_crashed_worker_only_fails_its_file(self):
+        def submit(fn, source, name, thresholds):
+            future = Future()
+            if name == 'crash.csv':
+                future.set_exception(BrokenProcessPool('worker died'))
+            else:
+                future.set_result(fn(source, name, thresholds))
+            return future
+
+        df = _sample_frame(20)
+        crash = df.copy()
+        crash['Pressure'] += 1
+        files = [_csv_upload(df, 'ok.csv'), _csv_upload(crash, 'crash.csv')]
+        with mock.patch('api.batch._pool') as pool:
+            pool.return_value.submit.side_effect = submit
+            response = self.client.post('/api/upload/batch/', {'files': files}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['status'] for item in response.data['files']], ['created', 'failed'])
+        self.assertIn('worker died', response.data['files'][1]['error'])
+        # The sidecar written by the worker is the one stored with the upload
+        stored = load_upload_frame(UploadHistory.objects.get())
+        self.assertEqual(stored['Equipment Name'].tolist(), df['Equipment Name'].tolist())
+        self.assertEqual(EquipmentHistory.objects.count(), 20)
+
+
+class UploadProjectionTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_slim_and_fields_projection_with_paginated_rows(self):
+        df = _sample_frame(30)
+        full = self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart').data
+
+        slim = self.client.post('/api/upload/?view=slim&force=true', {'file': _csv_upload(df)}, format='multipart')
+        self.assertEqual(slim.status_code, status.HTTP_201_CREATED)
+        for section in ('data', 'critical_items', 'warning_items', 'predictions'):
+            self.assertNotIn(section, slim.data)
+            self.assertIn(section, slim.data['sections'])
+        self.assertEqual(slim.data['total_count'], 30)
+
+        picked = self.client.post(
+            '/api/upload/?fields=total_count,critical_items', {'file': _csv_upload(df)}, format='multipart'
+        )
+        self.assertEqual(picked.status_code, status.HTTP_200_OK)  # duplicate, served from storage
+        self.assertEqual(set(picked.data) - {'upload_id', 'sections'}, {'total_count', 'critical_items'})
+        self.assertEqual(picked.data['critical_items'], full['critical_items'])
+
+        predictions = []
+        url = slim.data['sections']['predictions'] + '?page_size=7'
+        while url:
+            page = self.client.get(url).data
+            self.assertEqual(page['count'], 30)
+            predictions += page['results']
+            url = page['next']
+        strip = lambda preds: [{k: v for k, v in p.items() if k != 'maintenance_date'} for p in preds]
+        self.assertEqual(strip(predictions), strip(full['predictions']))
+
+        rows = self.client.get(f"/api/uploads/{slim.data['upload_id']}/rows/warning_items/").data
+        self.assertEqual(rows['results'], full['warning_items'])
+        self.assertEqual(self.client.get(f"/api/uploads/{slim.data['upload_id']}/rows/bogus/").status_code, 400)
+
+    def test_fresh_projected_upload_builds_only_requested_sections(self):
+        df = _sample_frame(30)
+        df['Pressure'] = np.linspace(50, 300, 30)
+        thresholds = get_thresholds()
+        full = analyze_upload(df, thresholds)
+
+        with override_settings(UPLOAD_STREAM_TOP_N=2):
+            picked = analyze_upload(df, thresholds, sections=('warning_items',))
+        self.assertEqual(compact_summary(picked), compact_summary(full))
+        self.assertNotIn('data', picked)
+        self.assertNotIn('predictions', picked)
+        self.assertEqual(picked['warning_items'], full['warning_items'])
+        # Unrequested flagged items stay available to alerts, capped
+        self.assertEqual(picked['critical_items'], full['critical_items'][:2])
+
+        with mock.patch('api.views.predictions_from_scores', wraps=predictions_from_scores) as build:
+            response = self.client.post('/api/upload/?view=slim', {'file': _csv_upload(df)}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([len(call.args[0]) for call in build.call_args_list], [1])
+        self.assertEqual(response.data['prediction_summary'], full['prediction_summary'])
+
+
+class _SMTPStandIn:
+    """Minimal local SMTP server that records connections and delivered messages"""
+
+    def __init__(self, reject=()):
+        stand_in = self
+        self.connections = 0
+        self.messages = []
+        self.reject = set(reject)
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f"{line}\r\n".encode())
+
+            def handle(self):
+                stand_in.connections += 1
+                self.reply("220 stand-in ready")
+                recipients = []
+                for raw in self.rfile:
+                    command = raw.decode().strip()
+                    verb = command[:4].upper()
+                    if verb in ('EHLO', 'HELO'):
+                        self.reply("250 stand-in")
+                    elif verb == 'MAIL':
+                        recipients = []
+                        self.reply("250 OK")
+                    elif verb == 'RCPT':
+                        address = command.split(':', 1)[1].strip(' <>')
+                        if address in stand_in.reject:
+                            self.reply("550 mailbox unavailable")
+                        else:
+                            recipients.append(address)
+                            self.reply("250 OK")
+                    elif verb == 'DATA':
+                        self.reply("354 go ahead")
+                        body = []
+                        for data_line in self.rfile:
+                            if data_line.rstrip(b'\r\n') == b'.':
+                                break
+                            body.append(data_line)
+                        stand_in.messages.append((recipients, b''.join(body)))
+                        self.reply("250 queued")
+                    elif verb == 'QUIT':
+                        self.reply("221 bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def settings(self):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AlertOutboxTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+        alert_state.clear_cache()
+        self.addCleanup(config.clear_cache)
+        # Committed callbacks cache equipment ids that the test rollback removes
+        self.addCleanup(equipment.clear_cache)
+        AlertSettings.objects.create(pk=1, email_address='ops@example.com', alert_on_warning=True)
+        self.smtp = _SMTPStandIn(reject={'bounce@example.com'})
+        self.addCleanup(self.smtp.close)
+
+    def test_requests_only_enqueue_and_dispatcher_reuses_connection(self):
+        df = _sample_frame(20)
+        df.loc[0, 'Pressure'] = 500.0
+        df.loc[1, 'Pressure'] = 75.0
+        with mock.patch('api.alerts.wake_dispatcher') as wake, mock.patch('api.retention._submit'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart')
+            self.client.post('/api/maintenance/', {
+                'equipment_name': 'Unit 0', 'title': 'Inspect seals', 'scheduled_date': '2030-01-01'
+            }, format='json')
+
+        self.assertTrue(wake.called)
+        self.assertEqual(AlertOutbox.objects.filter(status='pending').count(), 3)
+        self.assertEqual(AlertLog.objects.count(), 0)
+        self.assertEqual(self.smtp.connections, 0)
+
+        with self.smtp.settings():
+            self.assertEqual(dispatch_pending(), 3)
+
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 3)
+        self.assertEqual(AlertOutbox.objects.filter(status='sent').count(), 3)
+        self.assertEqual(AlertLog.objects.filter(was_successful=True).count(), 3)
+
+    def test_failed_sends_back_off_then_give_up(self):
+        enqueue_alert('critical', 'Unit 1', 'Pressure high', 'ops@example.com')
+        bounced = enqueue_alert('critical', 'Unit 2', 'Pressure high', 'bounce@example.com')
+
+        with self.smtp.settings(), override_settings(ALERT_MAX_ATTEMPTS=2):
+            self.assertEqual(dispatch_pending(), 1)
+            bounced.refresh_from_db()
+            self.assertEqual((bounced.status, bounced.attempts), ('pending', 1))
+            self.assertGreater(bounced.next_attempt_at, timezone.now())
+
+            # Not due yet; once due, the second failure is final
+            self.assertEqual(dispatch_pending(), 0)
+            AlertOutbox.objects.filter(pk=bounced.pk).update(next_attempt_at=timezone.now())
+            dispatch_pending()
+
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('failed', 2))
+        self.assertIn('550', bounced.last_error)
+        self.assertEqual(AlertLog.objects.get(was_successful=False).sent_to, 'bounce@example.com')
+
+
+class AlertDigestTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.addCleanup(config.clear_cache)
+        self.settings = AlertSettings.objects.create(pk=1, email_address='ops@example.com', alert_frequency='hourly')
+
+    def test_repeats_collapse_into_one_digest_per_window(self):
+        df = _sample_frame(10)
+        df.loc[[0, 1], 'Pressure'] = 500.0
+        # The first alert goes out at once and starts the window
+        self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart')
+        self.assertEqual(AlertOutbox.objects.count(), 1)
+        self.settings.refresh_from_db()
+        self.assertIsNotNone(self.settings.last_alert_sent)
+
+        for shift in range(3):
+            self.client.post('/api/upload/?force=true', {'file': _csv_upload(df)}, format='multipart')
+        self.client.post('/api/maintenance/', {
+            'equipment_name': 'Unit 0', 'title': 'Inspect seals', 'scheduled_date': '2030-01-01'
+        }, format='json')
+
+        self.assertEqual(AlertOutbox.objects.count(), 1)
+        self.assertEqual(
+            sorted(AlertDigestEvent.objects.values_list('alert_type', 'equipment_name', 'occurrences')),
+            [('critical', 'Unit 0', 3), ('critical', 'Unit 1', 3), ('maintenance', 'Unit 0', 1)]
+        )
+
+        call_command('flush_alert_digests', stdout=io.StringIO())
+        self.assertEqual(AlertOutbox.objects.count(), 1)  # window not over yet
+
+        type(self.settings).objects.filter(pk=1).update(last_alert_sent=timezone.now() - timedelta(hours=2))
+        call_command('flush_alert_digests', stdout=io.StringIO())
+
+        digest = AlertOutbox.objects.latest('id')
+        self.assertEqual(AlertOutbox.objects.count(), 2)
+        self.assertEqual((digest.alert_type, digest.equipment_name), ('critical', 'Digest: 2 equipment'))
+        self.assertIn('Unit 0: 3x', digest.message)
+        self.assertIn('MAINTENANCE (1 equipment)', digest.message)
+        self.assertFalse(AlertDigestEvent.objects.exists())
+
+    def test_flush_leaves_the_cached_settings_snapshot_alone(self):
+        buffer_events('critical', [('Unit 1', 'Pressure high')])
+        snapshot = get_alert_settings()
+
+        self.assertIsNotNone(flush_digest(snapshot, force=True))
+
+        self.assertIsNone(snapshot.last_alert_sent)
+        self.assertIsNotNone(get_alert_settings().last_alert_sent)
+
+
+class AlertDeduplicationTests(MediaTestCase):
+    def setUp(self):
+        alert_state.clear_cache()
+        self.addCleanup(alert_state.clear_cache)
+        self.addCleanup(config.clear_cache)
+        # Committed callbacks remember equipment ids that the test rollback removes
+        self.addCleanup(equipment.clear_cache)
+        self.client = APIClient()
+        AlertSettings.objects.create(pk=1, email_address='ops@example.com', alert_on_warning=True)
+
+    def _upload(self, pressure):
+        df = _sample_frame(10)
+        df.loc[0, 'Pressure'] = pressure
+        before = AlertOutbox.objects.count()
+        # Run the commit hooks that record alert states, without background dispatch or retention
+        with mock.patch('api.alerts.wake_dispatcher'), mock.patch('api.retention._submit'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/upload/?force=true', {'file': _csv_upload(df)}, format='multipart')
+        return list(AlertOutbox.objects.order_by('id').values_list('alert_type', flat=True)[before:])
+
+    def test_repeats_suppressed_with_sticky_level_until_cooldown(self):
+        self.assertEqual(self._upload(75.0), ['warning'])
+        self.assertEqual(self._upload(75.0), [])           # same level: repeat
+        self.assertEqual(self._upload(500.0), ['critical'])  # escalation always alerts
+        self.assertEqual(self._upload(75.0), [])           # back to warning: level stays critical
+        self.assertEqual(self._upload(500.0), [])          # and no flapping back to critical
+
+        with mock.patch('api.alert_state.timezone.now', return_value=timezone.now() + timedelta(hours=2)):
+            alert_state.clear_cache()
+            self.assertEqual(self._upload(75.0), ['warning'])
+
+        states = EquipmentAlertState.objects.filter(equipment__name='Unit 0')
+        self.assertEqual(
+            sorted(states.values_list('level', 'total_suppressed', 'suppressed_count')),
+            [('critical', 1, 1), ('warning', 2, 0)]
+        )
+
+        response = self.client.get('/api/alerts/logs/?with_suppressed=true')
+        self.assertEqual(response.data['suppressed']['total_suppressed'], 3)
+        self.assertEqual(response.data['suppressed']['equipment'][0]['equipment_name'], 'Unit 0')
+        self.assertIsInstance(self.client.get('/api/alerts/logs/').data, list)
+
+    def test_states_are_per_equipment_and_level_and_kept_only_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(alert_state.filter_repeats('critical', ['Unit 7', ' unit  7']), (['Unit 7'], []))
+            # Listed at both levels: alerted once at each, no self-suppression
+            self.assertEqual(alert_state.filter_repeats('warning', ['UNIT 7']), (['UNIT 7'], []))
+        self.assertEqual(alert_state.filter_repeats('critical', ['unit 7']), ([], ['unit 7']))
+        self.assertEqual(EquipmentAlertState.objects.count(), 2)
+
+        # A rolled-back alert leaves neither the table nor this process's cache changed
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            alert_state.filter_repeats('critical', ['Unit 8'])
+            raise RuntimeError('rolled back')
+        self.assertEqual(alert_state.filter_repeats('critical', ['Unit 8']), (['Unit 8'], []))
+
+
+class ConfigSnapshotTests(MediaTestCase):
+    def setUp(self):
+        self.addCleanup(config.clear_cache)
+        config.clear_cache()
+        self.client = APIClient()
+
+    def test_hot_paths_skip_config_queries_until_settings_change(self):
+        # Creating the default rows invalidates the snapshot once; the next read caches them
+        for _ in range(2):
+            get_thresholds()
+            get_alert_settings()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                thresholds = get_thresholds()
+                get_alert_settings()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(thresholds.pressure_critical, 80.0)
+
+        version = config._current_version()
+        self.client.put('/api/thresholds/', {'pressure_critical': 90}, format='json')
+        self.assertNotEqual(config._current_version(), version)
+        self.assertEqual(get_thresholds().pressure_critical, 90.0)
+
+        self.client.put('/api/alerts/settings/', {'alert_frequency': 'daily'}, format='json')
+        self.assertEqual(get_alert_settings().alert_frequency, 'daily')
+
+        # Another worker's change is picked up at the next version check
+        get_thresholds()
+        ThresholdSettings.objects.update(pressure_critical=95)
+        ConfigVersion.objects.filter(pk=1).update(version=F('version') + 1)
+        with self.settings(CONFIG_VERSION_CHECK_SECONDS=60):
+            self.assertEqual(get_thresholds().pressure_critical, 90.0)
+        with self.settings(CONFIG_VERSION_CHECK_SECONDS=0):
+            self.assertEqual(get_thresholds().pressure_critical, 95.0)
+
+
+class ThresholdProfileTests(MediaTestCase):
+    def setUp(self):
+        self.addCleanup(config.clear_cache)
+        config.clear_cache()
+        self.client = APIClient()
+
+    def test_profiles_apply_per_equipment_type(self):
+        rng = np.random.default_rng(7)
+        n = 2000
+        df = pd.DataFrame({
+            'Equipment Name': [f'Unit {i}' for i in range(n)],
+            'Type': rng.choice(['Pump', 'Reactor', 'Tank'], n),
+            'Flowrate': np.round(rng.uniform(0, 260, n), 2),
+            'Pressure': np.round(rng.uniform(0, 110, n), 1),
+            'Temperature': np.round(rng.uniform(0, 200, n), 1),
+        })
+        default = {field: getattr(_Thresholds, field) for field in THRESHOLD_FIELDS}
+        pump = {'pressure_warning': 50.0, 'pressure_critical': 60.0, 'flowrate_max': None}
+        table = ThresholdTable(default, {'Pump': pump})
+
+        # Without profiles the table scores exactly like plain settings
+        self.assertEqual(predict_frame(df, ThresholdTable(default)), predict_frame(df, _Thresholds()))
+
+        class _Pump(_Thresholds):
+            pressure_warning = 50.0
+            pressure_critical = 60.0
+
+        pumps = df['Type'] == 'Pump'
+        expected = _row_by_row_predictions(df[pumps], _Pump()) + _row_by_row_predictions(df[~pumps], _Thresholds())
+        expected.sort(key=lambda x: x["risk_score"], reverse=True)
+        key = lambda pred: (pred['equipment_name'], pred['risk_score'], pred['risk_level'])
+        self.assertEqual(sorted(map(key, predict_frame(df, table))), sorted(map(key, expected)))
+
+    def test_profile_endpoints_invalidate_thresholds(self):
+        self.assertEqual(get_thresholds().profiles, {})
+        response = self.client.post('/api/thresholds/profiles/',
+                                    {'equipment_type': 'Pump', 'pressure_critical': 60}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_thresholds().profiles, {'Pump': {'pressure_critical': 60.0}})
+        self.assertEqual(self.client.get('/api/thresholds/').data['profiles'], {'Pump': {'pressure_critical': 60.0}})
+
+        # A Pump at 70 bar is critical under its profile, a Reactor only warning
+        frame = pd.DataFrame({
+            'Equipment Name': ['P1', 'R1'], 'Type': ['Pump', 'Reactor'],
+            'Flowrate': [100.0, 100.0], 'Pressure': [70.0, 75.0], 'Temperature': [60.0, 60.0],
+        })
+        response = self.client.post('/api/upload/', {'file': _csv_upload(frame)}, format='multipart')
+        self.assertEqual([item['Equipment Name'] for item in response.data['critical_items']], ['P1'])
+
+        response = self.client.delete('/api/thresholds/profiles/Pump/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_thresholds().profiles, {})
+
+
+class ThresholdSimulationTests(MediaTestCase):
+    def setUp(self):
+        self.addCleanup(config.clear_cache)
+        config.clear_cache()
+        self.client = APIClient()
+        self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(50))}, format='multipart')
+
+    def test_simulation_matches_rescoring_and_saves_nothing(self):
+        before = self.client.get('/api/thresholds/').data
+        history = EquipmentHistory.objects.count()
+        with self.settings(SIMULATION_CHUNK_ROWS=7):
+            response = self.client.post('/api/thresholds/simulate/', {'pressure_critical': 85, 'days': 7}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        frame = _sample_frame(50)
+        class _Candidate(_Thresholds):
+            pressure_critical = 85.0
+        current_critical, current_warning = threshold_flags(frame, _Thresholds())
+        critical, warning = threshold_flags(frame, _Candidate())
+
+        data = response.data
+        self.assertEqual(data['rows'], 50)
+        self.assertEqual(data['current']['critical_events'], int(current_critical.sum()))
+        self.assertEqual(data['candidate']['critical_events'], int(critical.sum()))
+        self.assertEqual(data['candidate']['warning_events'], int(warning.sum()))
+        health = max(0, 100 - int(critical.sum()) * 10 - int(warning.sum()) * 3)
+        self.assertEqual(data['health_score']['candidate_avg'], health)
+        self.assertEqual(data['equipment_changed'], int(((critical != current_critical) | (warning != current_warning)).sum()))
+        self.assertEqual(len(data['equipment_changes']), data['equipment_changed'])
+
+        # Nothing persisted
+        self.assertEqual(self.client.get('/api/thresholds/').data, before)
+        self.assertEqual(ThresholdSettings.objects.get().pressure_critical, 80.0)
+        self.assertEqual(EquipmentHistory.objects.count(), history)
+
+    def test_pruned_uploads_are_left_out_of_health_scores(self):
+        df = _sample_frame(10)
+        df['Pressure'] = 10.0
+        df['Temperature'] = 50.0
+        self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart')
+        both = self.client.post('/api/thresholds/simulate/', {'days': 7}, format='json').data
+        self.assertEqual((both['upload_count'], both['detached_rows']), (2, 0))
+
+        # Only the clean upload is kept; the other one's readings stay in the event totals
+        prune_uploads(1)
+        data = self.client.post('/api/thresholds/simulate/', {'days': 7}, format='json').data
+        self.assertEqual((data['rows'], data['upload_count'], data['detached_rows']), (60, 1, 50))
+        self.assertEqual(data['current'], both['current'])
+        self.assertEqual(data['health_score']['current_avg'], 100)
+
+    def test_invalid_input(self):
+        response = self.client.post('/api/thresholds/simulate/', {'pressure_critical': 'high'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PredictionCacheTests(MediaTestCase):
+    def setUp(self):
+        self.addCleanup(prediction_cache.clear, scorers=True)
+        self.addCleanup(config.clear_cache)
+        prediction_cache.clear(scorers=True)
+        config.clear_cache()
+        self.client = APIClient()
+        self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(50))}, format='multipart')
+
+    def test_repeat_calls_served_from_cache_until_thresholds_change(self):
+        first = self.client.get('/api/predict/').data
+        self.assertFalse(first['cached'])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/predict/').data
+        # Only the latest-upload id lookup
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['generated_at'], first['generated_at'])
+        self.assertEqual(second['predictions'], first['predictions'])
+
+        self.client.put('/api/thresholds/', {'pressure_critical': 60}, format='json')
+        third = self.client.get('/api/predict/').data
+        self.assertFalse(third['cached'])
+        self.assertNotEqual(third['threshold_version'], first['threshold_version'])
+        self.assertGreater(third['summary']['critical'], first['summary']['critical'])
+        # Re-scored incrementally from the kept scores; same result as scoring from scratch
+        expected = predict_frame(_sample_frame(50), get_thresholds())
+        key = lambda pred: (pred['equipment_name'], pred['risk_score'], pred['risk_level'], pred['risk_factors'])
+        self.assertEqual(list(map(key, third['predictions'])), list(map(key, expected)))
+
+    def test_lru_is_bounded(self):
+        with self.settings(PREDICTION_CACHE_SIZE=2):
+            for upload_id in range(3):
+                prediction_cache.put(upload_id, 'v', {'upload_id': upload_id})
+            prediction_cache.get(1, 'v')
+            prediction_cache.put(3, 'v', {'upload_id': 3})
+        self.assertIsNone(prediction_cache.get(0, 'v'))
+        self.assertIsNone(prediction_cache.get(2, 'v'))
+        self.assertIsNotNone(prediction_cache.get(1, 'v'))
+
+
+class EquipmentHistoryQueryTests(MediaTestCase):
+    def setUp(self):
+        now = timezone.now()
+        rows = []
+        for name, count in (('Pump 1', 150), ('Tank 1', 5)):
+            equipment = Equipment.objects.create(name=name, normalized_name=name.lower(), equipment_type=name.split()[0])
+            for i in range(count):
+                rows.append(EquipmentHistory(equipment=equipment, pressure=50.0 + i, temperature=80.0, flowrate=100.0))
+        EquipmentHistory.objects.bulk_create(rows)
+        # Spread Pump 1 over 150 hours and put Tank 1 two months back
+        for i, record in enumerate(EquipmentHistory.objects.filter(equipment__name='Pump 1').order_by('id')):
+            record.recorded_at = now - timedelta(hours=149 - i)
+            record.save(update_fields=['recorded_at'])
+        EquipmentHistory.objects.filter(equipment__name='Tank 1').update(recorded_at=now - timedelta(days=60))
+        rebuild_rollups()
+        self.client = APIClient()
+
+    def test_window_and_per_equipment_limit(self):
+        data = self.client.get('/api/equipment-history/', {'days': 30}).data
+        self.assertEqual(data['equipment_list'], ['Pump 1', 'Tank 1'])
+        # Tank 1 is outside the window; Pump 1 keeps its newest 100 points
+        self.assertEqual([series['equipment_name'] for series in data['history']], ['Pump 1'])
+        points = data['history'][0]['data_points']
+        self.assertEqual(len(points), 100)
+        self.assertEqual(points[0]['pressure'], 199.0)
+
+        # Names match regardless of case and spacing
+        data = self.client.get('/api/equipment-history/', {'days': 3, 'equipment': ' pump  1', 'limit': 500}).data
+        self.assertEqual(len(data['history'][0]['data_points']), 72)
+        self.assertEqual(self.client.get('/api/equipment-history/', {'equipment': 'Pump 9'}).data['history'], [])
+
+        data = self.client.get('/api/equipment-history/', {'days': 90, 'limit': 3, 'resolution': 'raw'}).data
+        self.assertEqual({series['equipment_name']: len(series['data_points']) for series in data['history']},
+                         {'Pump 1': 3, 'Tank 1': 3})
+
+    def test_max_points_downsamples_the_whole_window(self):
+        data = self.client.get('/api/equipment-history/',
+                               {'days': 30, 'equipment': 'Pump 1', 'max_points': 20, 'resolution': 'raw'}).data
+        series = data['history'][0]
+        self.assertTrue(data['downsampled'])
+        self.assertEqual(series['raw_points'], 150)
+        points = series['data_points']
+        self.assertEqual(len(points), 20)
+        # Spans the full window (not just the newest rows), newest first
+        self.assertEqual([points[0]['pressure'], points[-1]['pressure']], [199.0, 50.0])
+
+        response = self.client.get('/api/equipment-history/', {'max_points': 2})
+        self.assertEqual(response.status_code, 400)
+
+    def test_long_windows_read_rollups(self):
+        # 90 days at 50 points: daily buckets; Pump 1's 150 hours span at most 8 days
+        data = self.client.get('/api/equipment-history/', {'days': 90, 'limit': 50}).data
+        self.assertEqual(data['resolution'], 'day')
+        series = {item['equipment_name']: item for item in data['history']}
+        self.assertLessEqual(len(series['Pump 1']['data_points']), 8)
+        tank = series['Tank 1']['data_points']
+        self.assertEqual(len(tank), 1)
+        self.assertEqual((tank[0]['count'], tank[0]['pressure'], tank[0]['pressure_max']), (5, 52.0, 54.0))
+
+        points = self.client.get('/api/equipment-history/', {'days': 30, 'equipment': 'Pump 1'}).data
+        self.assertEqual(points['resolution'], 'hour')
+        self.assertEqual(points['history'][0]['data_points'][0]['pressure'], 199.0)
+
+        # Ingest merges into the stored buckets; the result matches a full rebuild
+        self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(10))}, format='multipart')
+        self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(12))}, format='multipart')
+        hourly = EquipmentRollup.objects.filter(resolution='hour', equipment__name='Unit 3').get()
+        self.assertEqual((hourly.count, hourly.pressure_sum), (2, 86.0))
+        snapshot = lambda: sorted(EquipmentRollup.objects.values_list(
+            'resolution', 'equipment_id', 'bucket', 'count', 'pressure_min', 'pressure_max', 'pressure_sum', 'pressure_last'))
+        incremental = snapshot()
+        self.assertEqual(rebuild_rollups(), EquipmentHistory.objects.count())
+        self.assertEqual(snapshot(), incremental)
+
+
+class EquipmentDimensionTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_names_are_normalized_into_one_equipment(self):
+        df = _sample_frame(4)
+        df.loc[1, 'Equipment Name'] = '  unit   0 '
+        df.loc[3, 'Equipment Name'] = 'UNIT 2'
+        self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart')
+
+        self.assertEqual(sorted(Equipment.objects.values_list('name', flat=True)), ['Unit 0', 'Unit 2'])
+        unit = Equipment.objects.get(normalized_name='unit 0')
+        self.assertEqual(EquipmentHistory.objects.filter(equipment=unit).count(), 2)
+
+        # Schedules resolve to the same row and still read and filter by name
+        self.client.post('/api/maintenance/', {
+            'equipment_name': 'UNIT 0', 'title': 'Inspect seals', 'scheduled_date': '2030-01-01'
+        }, format='json')
+        self.assertEqual(MaintenanceSchedule.objects.get().equipment, unit)
+        schedules = self.client.get('/api/maintenance/', {'equipment': 'unit'}).data['schedules']
+        self.assertEqual([item['equipment_name'] for item in schedules], ['Unit 0'])
+
+        response = self.client.post('/api/maintenance/', {'title': 'No equipment', 'scheduled_date': '2030-01-01'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_equipment_is_never_retyped(self):
+        self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(2))}, format='multipart')
+        df = _sample_frame(2)
+        df['Type'] = 'Compressor'
+        self.client.post('/api/upload/', {'file': _csv_upload(df)}, format='multipart')
+
+        # Readings keep the type they were reported with
+        unit = Equipment.objects.get(normalized_name='unit 0')
+        self.assertEqual(unit.equipment_type, 'Pump')
+        self.assertEqual(
+            sorted(EquipmentHistory.objects.filter(equipment=unit).values_list('equipment_type', flat=True)),
+            ['Compressor', 'Pump'],
+        )
+
+        response = self.client.post('/api/maintenance/', {
+            'equipment_name': 'Unit 0', 'equipment_type': 'Compressor', 'title': 'Inspect seals',
+            'scheduled_date': '2030-01-01'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        schedule = MaintenanceSchedule.objects.create(equipment=unit, title='Inspect seals', scheduled_date='2030-01-01')
+        response = self.client.put(f'/api/maintenance/{schedule.id}/', {'equipment_type': 'Compressor'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put(f'/api/maintenance/{schedule.id}/', {'equipment_type': 'Pump', 'title': 'Replace seals'},
+                                   format='json')
+        self.assertEqual(response.status_code, 200)
+        unit.refresh_from_db()
+        self.assertEqual(unit.equipment_type, 'Pump')
+
+    def test_unknown_types_are_filled_in(self):
+        # A rejected schedule leaves no equipment behind
+        response = self.client.post('/api/maintenance/', {'equipment_name': 'Unit 0', 'scheduled_date': '2030-01-01'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Equipment.objects.exists())
+
+        # Untyped equipment takes the first type reported for it, from a reading or a schedule
+        for name in ('Unit 0', 'Unit 1'):
+            response = self.client.post('/api/maintenance/', {
+                'equipment_name': name, 'title': 'Inspect seals', 'scheduled_date': '2030-01-01'
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(2).head(1))}, format='multipart')
+        response = self.client.post('/api/maintenance/', {
+            'equipment_name': 'unit 1', 'equipment_type': 'Reactor', 'title': 'Inspect seals',
+            'scheduled_date': '2030-01-02'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(dict(Equipment.objects.values_list('name', 'equipment_type')),
+                         {'Unit 0': 'Pump', 'Unit 1': 'Reactor'})
+
+
+class RetentionTests(MediaTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.now = timezone.now()
+        pump = Equipment.objects.create(name='Pump 1', normalized_name='pump 1', equipment_type='Pump')
+        EquipmentHistory.objects.bulk_create(
+            [EquipmentHistory(equipment=pump, equipment_type='Pump', pressure=50.0 + i, temperature=80.0, flowrate=100.0)
+             for i in range(40)]
+        )
+        # One reading a day going back 40 days
+        for i, record in enumerate(EquipmentHistory.objects.order_by('id')):
+            record.recorded_at = self.now - timedelta(days=i)
+            record.save(update_fields=['recorded_at'])
+        rebuild_rollups()
+
+    def test_old_history_is_archived_and_keeps_its_rollups(self):
+        daily = lambda: sorted(EquipmentRollup.objects.filter(resolution='day').values_list('bucket', 'count', 'pressure_sum'))
+        before = daily()
+        with override_settings(HISTORY_RETENTION_DAYS=30, HOURLY_ROLLUP_RETENTION_DAYS=20, RETENTION_BATCH_ROWS=4):
+            result = apply_retention(now=self.now)
+            # A second run has nothing left to do
+            self.assertEqual(apply_retention(now=self.now)['rows_archived'], 0)
+
+        archive = HistoryArchive.objects.get()
+        self.addCleanup(archive.file.delete, save=False)
+        remaining = EquipmentHistory.objects.count()
+        self.assertEqual((result['rows_archived'], result['rows_deleted']), (40 - remaining, 40 - remaining))
+        self.assertFalse(EquipmentHistory.objects.filter(recorded_at__lt=archive.archived_before).exists())
+        frame = load_archive_frame(archive)
+        self.assertEqual(len(frame), archive.rows)
+        self.assertEqual(set(frame['equipment_name']), {'Pump 1'})
+        self.assertEqual(set(frame['equipment_type']), {'Pump'})
+
+        # Old hourly buckets are gone; daily trends survive, also across a full rebuild
+        self.assertEqual(EquipmentRollup.objects.filter(resolution='hour').count(), 21)
+        self.assertEqual(result['hourly_rollups_deleted'], 40 - 21)
+        self.assertEqual(daily(), before)
+        rebuild_rollups()
+        self.assertEqual(daily(), before)
+
+    def test_pruned_uploads_keep_their_history(self):
+        for n in (10, 12, 14):
+            self.client.post('/api/upload/', {'file': _csv_upload(_sample_frame(n))}, format='multipart')
+        with override_settings(UPLOAD_RETENTION_COUNT=2, HISTORY_RETENTION_DAYS=0):
+            self.assertEqual(apply_retention()['uploads_deleted'], 1)
+
+        self.assertEqual(UploadHistory.objects.count(), 2)
+        self.assertEqual(EquipmentHistory.objects.count(), 40 + 10 + 12 + 14)
+        self.assertEqual(EquipmentHistory.objects.filter(upload_session__isnull=True).count(), 40 + 10)
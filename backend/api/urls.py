@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import (
-    UploadCSVView, HistoryView, PDFReportView, ThresholdView, PredictMaintenanceView,
+    UploadCSVView, BatchUploadView, UploadRowsView, UploadJobView, ResumableUploadView, ResumableUploadDetailView,
+    ResumableChunkView, ResumableFinalizeView, HistoryView, PDFReportView, ThresholdView, ThresholdProfileView,
+    ThresholdProfileDetailView, ThresholdSimulationView, PredictMaintenanceView,
     EquipmentHistoryView, AlertSettingsView, AlertLogView, TestAlertView,
     MaintenanceScheduleView, MaintenanceDetailView, AutoScheduleMaintenanceView
 )
@@ -8,10 +10,20 @@ from .views import (
 urlpatterns = [
     # Existing endpoints
     path('upload/', UploadCSVView.as_view(), name='upload'),
+    path('upload/batch/', BatchUploadView.as_view(), name='upload_batch'),
     path('history/', HistoryView.as_view(), name='history'),
     path('report_pdf/', PDFReportView.as_view(), name='report_pdf'),
     path('thresholds/', ThresholdView.as_view(), name='thresholds'),
+    path('thresholds/profiles/', ThresholdProfileView.as_view(), name='threshold_profiles'),
+    path('thresholds/profiles/<str:equipment_type>/', ThresholdProfileDetailView.as_view(), name='threshold_profile_detail'),
+    path('thresholds/simulate/', ThresholdSimulationView.as_view(), name='threshold_simulate'),
     path('predict/', PredictMaintenanceView.as_view(), name='predict'),
+    path('uploads/<int:pk>/rows/<str:section>/', UploadRowsView.as_view(), name='upload_rows'),
+    path('jobs/<int:pk>/', UploadJobView.as_view(), name='upload_job'),
+    path('uploads/resumable/', ResumableUploadView.as_view(), name='resumable_upload'),
+    path('uploads/resumable/<uuid:pk>/', ResumableUploadDetailView.as_view(), name='resumable_upload_detail'),
+    path('uploads/resumable/<uuid:pk>/chunks/<int:index>/', ResumableChunkView.as_view(), name='resumable_chunk'),
+    path('uploads/resumable/<uuid:pk>/finalize/', ResumableFinalizeView.as_view(), name='resumable_finalize'),
     
     # New Feature: Historical Trend Analysis
     path('equipment-history/', EquipmentHistoryView.as_view(), name='equipment_history'),
@@ -3,25 +3,71 @@ from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status
 from rest_framework.permissions import AllowAny
-from .models import UploadHistory, ThresholdSettings, EquipmentHistory, AlertSettings, AlertLog, MaintenanceSchedule
+from .models import UploadHistory, ThresholdSettings, ThresholdProfile, AlertSettings, AlertLog, MaintenanceSchedule, UploadJob, ResumableUpload
 from .serializers import UploadHistorySerializer
-import pandas as pd
+from .scoring import (
+    RISK_LEVELS, THRESHOLD_FIELDS, IncrementalScores, ThresholdTable, predict_frame, predictions_from_scores,
+    risk_order, score_frame, take_scores, threshold_flags, threshold_version, thresholds_used
+)
+from .ingest import ingest_equipment_history
+from .streaming import stream_upload
+from .readers import REQUIRED_COLUMNS, UploadValidationError, estimated_size, read_upload_frame, upload_columns
+from .jobs import create_upload_job, job_status
+from .storage import (
+    ROW_LEVEL_KEYS, ColumnarWriter, compact_summary, load_upload_frame, save_upload_frame, store_sidecar
+)
+from .dedup import file_fingerprint, find_duplicate_upload
+from .batch import process_batch
+from .alerts import alert_subject, enqueue_alert, from_email
+from .digests import buffer_events, digest_mode, flush_digest
+from .alert_state import filter_repeats, suppression_summary
+from . import config, prediction_cache
+from .resumable import ChunkError, assemble, claim, discard, expire_sessions, release, save_chunk, session_status
+from .simulation import candidate_thresholds, simulate
+from .history import (
+    choose_resolution, downsampled_buckets, downsampled_rows, equipment_names, group_buckets, group_series, recent_rows
+)
+from .rollups import RESOLUTIONS, recent_buckets
+from .equipment import equipment_ids, find_equipment, get_or_create_equipment, normalize_name, search_equipment
+from .retention import schedule_retention
 import numpy as np
 from django.http import HttpResponse
+from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.core.files import File
 from django.core.mail import send_mail
 from django.conf import settings as django_settings
+from django.utils import timezone
 from reportlab.pdfgen import canvas
 import io
+import os
 import random
 from datetime import datetime, timedelta, date
 
 
-def get_thresholds():
-    """Get or create default threshold settings"""
+def load_thresholds():
+    """Get or create default threshold settings from the database"""
     thresholds, _ = ThresholdSettings.objects.get_or_create(name="default")
     return thresholds
 
 
+def compile_thresholds():
+    """Default thresholds and all per-type profiles as one ``ThresholdTable``"""
+    default = load_thresholds()
+    profiles = {
+        profile.equipment_type: {field: getattr(profile, field) for field in THRESHOLD_FIELDS}
+        for profile in ThresholdProfile.objects.all()
+    }
+    return ThresholdTable(
+        {field: getattr(default, field) for field in THRESHOLD_FIELDS}, profiles, updated_at=default.updated_at
+    )
+
+
+def get_thresholds():
+    """Compiled thresholds from the process-local snapshot; treat as read-only"""
+    return config.cached('thresholds', compile_thresholds)
+
+
 def calculate_risk_score(pressure, temperature, flowrate, thresholds):
     """
     ML-inspired risk scoring algorithm
@@ -90,32 +136,407 @@ def predict_equipment_health(df, thresholds):
     Predict maintenance needs for all equipment
     Returns predictions with risk scores and maintenance timeline
     """
-    predictions = []
-    
-    for _, row in df.iterrows():
-        pressure = float(row.get('Pressure', 0))
-        temperature = float(row.get('Temperature', 0))
-        flowrate = float(row.get('Flowrate', 0))
-        
-        risk_data = calculate_risk_score(pressure, temperature, flowrate, thresholds)
-        
-        predictions.append({
-            "equipment_name": row.get('Equipment Name', 'Unknown'),
-            "type": row.get('Type', 'Unknown'),
-            "pressure": pressure,
-            "temperature": temperature,
-            "flowrate": flowrate,
-            "risk_score": risk_data["score"],
-            "risk_level": risk_data["level"],
-            "maintenance_in_days": risk_data["maintenance_days"],
-            "maintenance_date": (datetime.now() + timedelta(days=risk_data["maintenance_days"])).strftime("%Y-%m-%d"),
-            "risk_factors": risk_data["factors"]
-        })
-    
-    # Sort by risk score descending
-    predictions.sort(key=lambda x: x["risk_score"], reverse=True)
+    # Vectorized over the whole frame; gives the same results as calling
+    # calculate_risk_score on each row
+    return predict_frame(df, thresholds)
+
+
+def analyze_upload(df, thresholds, sections=ROW_LEVEL_KEYS):
+    """
+    Build the upload summary for an equipment DataFrame held in memory.
+
+    Only the row-level ``sections`` asked for are built. Critical and warning
+    items that were not asked for keep their first ``UPLOAD_STREAM_TOP_N``
+    entries, which is what upload alerts read; the counts are always exact.
+    """
+    # Analytics
+    total_count = len(df)
+    avg_flowrate = float(df['Flowrate'].mean())
+    avg_pressure = float(df['Pressure'].mean())
+    avg_temperature = float(df['Temperature'].mean())
+    type_counts = df['Type'].value_counts()
+    # A categorical Type also counts unused categories; keep only observed types
+    type_distribution = type_counts[type_counts > 0].to_dict()
+
+    # Advanced Analysis using configurable thresholds
+    critical_mask, warning_mask = threshold_flags(df, thresholds)
+    critical_item_count = int(critical_mask.sum())
+    warning_item_count = int(warning_mask.sum())
+
+    def items(mask, section):
+        flagged = df[mask]
+        if section not in sections:
+            flagged = flagged.head(django_settings.UPLOAD_STREAM_TOP_N)
+        return flagged.fillna('').to_dict(orient='records')
+
+    # Calculate health score
+    health_score = max(0, 100 - (critical_item_count * 10) - (warning_item_count * 3))
+
+    # Generate ML predictions; without the full list only the highest-risk row is built
+    scores = score_frame(df, thresholds)
+    if 'predictions' in sections:
+        predictions = predictions_from_scores(df, scores)
+        highest_risk = predictions[0] if predictions else None
+    else:
+        top = risk_order(scores)[:1]
+        highest_risk = next(iter(predictions_from_scores(df.iloc[top], take_scores(scores, top))), None)
+
+    # Calculate prediction summary
+    level_codes = scores["level_code"]
+    avg_maintenance_days = float(scores["maintenance_days"].sum()) / total_count if total_count else 0
+
+    summary = {
+        "total_count": total_count,
+        "avg_flowrate": avg_flowrate,
+        "avg_pressure": avg_pressure,
+        "avg_temperature": avg_temperature,
+        "type_distribution": type_distribution,
+        "critical_items": items(critical_mask, 'critical_items'),
+        "warning_items": items(warning_mask, 'warning_items'),
+        "critical_item_count": critical_item_count,
+        "warning_item_count": warning_item_count,
+        "health_score": health_score,
+    }
+    if 'data' in sections:
+        summary["data"] = df.fillna('').to_dict(orient='records')
+    if 'predictions' in sections:
+        # New ML prediction data
+        summary["predictions"] = predictions
+    summary.update({
+        "prediction_summary": {
+            "critical_count": int((level_codes == 3).sum()),
+            "warning_count": int((level_codes == 2).sum()),
+            "avg_maintenance_days": round(avg_maintenance_days, 1),
+            "next_maintenance": highest_risk["maintenance_date"] if highest_risk else None,
+            "highest_risk": highest_risk
+        },
+        # Store thresholds used for reference
+        "thresholds_used": thresholds_used(thresholds)
+    })
+    return summary
+
+
+def send_upload_alerts(summary, filename):
+    """Queue critical/warning alert emails for an analyzed upload"""
+    critical_items = summary.get('critical_items', [])
+    warning_items = summary.get('warning_items', [])
+    critical_total = summary.get('critical_item_count', len(critical_items))
+    warning_total = summary.get('warning_item_count', len(warning_items))
+
+    try:
+        alert_settings = get_alert_settings()
+        if alert_settings.email_enabled and alert_settings.email_address and digest_mode(alert_settings):
+            # Hourly/daily digests: buffer one event per equipment instead of sending now
+            def events(items):
+                return [
+                    (item.get('Equipment Name', 'Unknown'),
+                     f"Pressure {item.get('Pressure')} bar, Temperature {item.get('Temperature')}°C (upload {filename})")
+                    for item in items
+                ]
+
+            if alert_settings.alert_on_critical:
+                buffer_events('critical', events(critical_items))
+            if alert_settings.alert_on_warning:
+                buffer_events('warning', events(warning_items))
+            flush_digest(alert_settings)
+        elif alert_settings.email_enabled and alert_settings.email_address:
+            def new_alerts(level, items, total):
+                # Drop equipment already alerted at this level within the cooldown.
+                # Rows beyond the listed items (streamed uploads keep the top N) are always counted.
+                names = [item.get('Equipment Name', 'Unknown') for item in items]
+                fresh, suppressed = filter_repeats(level, names)
+                suppressed_keys = {normalize_name(name) for name in suppressed}
+                repeats = sum(1 for name in names if normalize_name(name) in suppressed_keys)
+                return fresh, total - repeats, len(suppressed)
+
+            # Alert for critical items
+            if alert_settings.alert_on_critical and critical_total > 0:
+                fresh, new_total, suppressed = new_alerts('critical', critical_items, critical_total)
+                if new_total > 0:
+                    message = f"🚨 CRITICAL ALERT: {new_total} equipment require immediate attention!\n\n"
+                    message += f"Equipment: {', '.join(fresh[:5])}\n\n"
+                    if suppressed:
+                        message += f"({suppressed} equipment already alerted recently not repeated)\n\n"
+                    message += f"Upload: {filename}\nHealth Score: {summary.get('health_score')}%"
+
+                    enqueue_alert(
+                        alert_type='critical',
+                        equipment_name=f"{new_total} equipment",
+                        message=message,
+                        email_address=alert_settings.email_address
+                    )
+            
+            # Alert for warning items
+            if alert_settings.alert_on_warning and warning_total > 0:
+                fresh, new_total, suppressed = new_alerts('warning', warning_items, warning_total)
+                if new_total > 0:
+                    message = f"⚠️ WARNING: {new_total} equipment have elevated readings.\n\n"
+                    message += f"Equipment: {', '.join(fresh[:5])}\n\n"
+                    if suppressed:
+                        message += f"({suppressed} equipment already alerted recently not repeated)\n\n"
+                    message += f"Upload: {filename}"
+
+                    enqueue_alert(
+                        alert_type='warning',
+                        equipment_name=f"{new_total} equipment",
+                        message=message,
+                        email_address=alert_settings.email_address
+                    )
+    except Exception as e:
+        print(f"Alert error: {e}")
+        pass  # Don't fail upload if alerts can't be queued
+
+
+def use_streaming(request, file_obj):
+    """Stream when asked to (?stream=true) or when the upload exceeds the size threshold"""
+    requested = request.query_params.get('stream', '').lower()
+    if requested in ('true', '1'):
+        return True
+    if requested in ('false', '0'):
+        return False
+    return estimated_size(file_obj) > django_settings.UPLOAD_STREAMING_THRESHOLD_BYTES
+
+
+def upload_row_sections(upload_record, thresholds, sections=ROW_LEVEL_KEYS):
+    """Rebuild the requested row-level summary sections of an upload from its columnar sidecar"""
+    if not sections:
+        return {}
+    df = load_upload_frame(upload_record)
+    if df is None:
+        return {}
+    critical_mask, warning_mask = threshold_flags(df, thresholds)
+    builders = {
+        "data": lambda: df.fillna('').to_dict(orient='records'),
+        "critical_items": lambda: df[critical_mask].fillna('').to_dict(orient='records'),
+        "warning_items": lambda: df[warning_mask].fillna('').to_dict(orient='records'),
+        "predictions": lambda: predict_equipment_health(df, thresholds),
+    }
+    return {section: builders[section]() for section in sections}
+
+
+def upload_row_page(upload_record, section, thresholds, offset, limit):
+    """
+    One page of a row-level section of an upload, rebuilt from its columnar
+    sidecar. Returns ``(rows, total)``, or None if the upload has no row data.
+    """
+    df = load_upload_frame(upload_record)
+    if df is None:
+        return None
+
+    if section == 'predictions':
+        # Score everything but only build prediction dicts for the page
+        scores = score_frame(df, thresholds)
+        idx = risk_order(scores)[offset:offset + limit]
+        return predictions_from_scores(df.iloc[idx], take_scores(scores, idx)), len(df)
+
+    if section == 'data':
+        selected = df
+    else:
+        critical_mask, warning_mask = threshold_flags(df, thresholds)
+        selected = df[critical_mask if section == 'critical_items' else warning_mask]
+    return selected.iloc[offset:offset + limit].fillna('').to_dict(orient='records'), len(selected)
+
+
+def cached_upload_summary(upload_record, thresholds, sections=ROW_LEVEL_KEYS):
+    """Summary of an already-processed upload, served without re-parsing or writing"""
+    summary = dict(upload_record.summary_data)
+    # Streamed uploads only ever kept bounded top-N lists; don't expand those
+    if not summary.get('streamed'):
+        summary.update(upload_row_sections(upload_record, thresholds, sections))
+    return {**summary, "cached": True, "upload_id": upload_record.id}
+
+
+def _requested_fields(request):
+    fields = request.query_params.get('fields', '')
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+def _slim_view(request):
+    return request.query_params.get('view', '').lower() == 'slim'
+
+
+def requested_row_sections(request):
+    """Row-level sections the response will include, given ``?fields=`` / ``?view=slim``"""
+    fields = _requested_fields(request)
+    if fields:
+        return tuple(section for section in ROW_LEVEL_KEYS if section in fields)
+    if _slim_view(request):
+        return ()
+    return ROW_LEVEL_KEYS
+
+
+def project_summary(summary, request):
+    """
+    Apply ``?fields=a,b`` (only those top-level keys) or ``?view=slim``
+    (everything but the row-level sections) to an upload summary. Projected
+    responses link to the paginated endpoints for the omitted sections.
+    """
+    fields = _requested_fields(request)
+    if not fields and not _slim_view(request):
+        return summary
+
+    if fields:
+        projected = {key: value for key, value in summary.items() if key in fields}
+    else:
+        projected = compact_summary(summary)
+
+    upload_id = summary.get('upload_id')
+    if upload_id is not None:
+        projected['upload_id'] = upload_id
+        projected['sections'] = {
+            section: f"/api/uploads/{upload_id}/rows/{section}/"
+            for section in ROW_LEVEL_KEYS if section not in projected
+        }
+    return projected
+
+
+def save_analyzed_upload(file_obj, df, summary, fingerprint, retention=True, sidecar=None):
+    """
+    Persist an analyzed in-memory upload: the upload record, its columnar
+    sidecar and its equipment rows. ``sidecar`` is the path of an archive
+    already written for ``df`` (see ``write_sidecar``), which is moved into
+    storage instead of writing ``df`` again. Unless ``retention`` is False,
+    old uploads and history are pruned in the background once it commits.
+    Returns the upload record and ingest metrics.
+    """
+    # Persist the upload and its equipment rows in one transaction so a
+    # failure part-way through leaves no partial history behind
+    with transaction.atomic():
+        if retention:
+            schedule_retention()
+
+        # Save upload history
+        file_obj.seek(0)
+        # Row-level data lives in the columnar sidecar, not in summary_data
+        upload_record = UploadHistory.objects.create(
+            filename=file_obj.name,
+            summary_data=compact_summary(summary),
+            file=file_obj,
+            **fingerprint
+        )
+        if sidecar:
+            store_sidecar(upload_record, sidecar)
+        else:
+            save_upload_frame(upload_record, df)
+
+        # Save individual equipment records for historical trend analysis
+        ingest_metrics = ingest_equipment_history(df, upload_record)
+    return upload_record, ingest_metrics
+
+
+def process_upload(file_obj, streaming=False, progress=None, content_hash=None, sections=ROW_LEVEL_KEYS):
+    """
+    Run the full upload pipeline: parse, score, persist and alert.
+
+    ``progress(stage, percent, rows=None)`` is called as the pipeline advances.
+    ``sections`` are the row-level sections the caller will return (see
+    ``analyze_upload``). Returns the upload record, its summary and the
+    ingest metrics. Raises ValueError if required columns are missing.
+    """
+    progress = progress or (lambda *args, **kwargs: None)
+    thresholds = get_thresholds()
+    fingerprint = {
+        "content_hash": content_hash or file_fingerprint(file_obj),
+        "threshold_version": threshold_version(thresholds),
+    }
+
+    if streaming:
+        # Chunked path for very large files: memory stays bounded by the chunk size
+        progress('parsing', 0)
+        missing = [col for col in REQUIRED_COLUMNS if col not in upload_columns(file_obj)]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+        total_bytes = file_obj.size or 1
+
+        def on_chunk(rows):
+            # Position in the stored (possibly compressed) file tracks progress
+            progress('persisting', min(95, 95 * file_obj.tell() / total_bytes), rows)
+
+        with transaction.atomic():
+            schedule_retention()
+
+            # The record is created first so each chunk can be persisted against it
+            file_obj.seek(0)
+            upload_record = UploadHistory.objects.create(
+                filename=file_obj.name,
+                summary_data={},
+                file=file_obj,
+                **fingerprint
+            )
+
+            sidecar = ColumnarWriter()
+            try:
+                summary, ingest_metrics = stream_upload(
+                    file_obj, upload_record, thresholds, on_chunk=on_chunk, sidecar=sidecar
+                )
+            except Exception:
+                sidecar.discard()
+                raise
+            sidecar.save_to(upload_record)
+            upload_record.summary_data = compact_summary(summary)
+            upload_record.save(update_fields=['summary_data'])
+    else:
+        progress('parsing', 0)
+        df = read_upload_frame(file_obj)
+        
+        # Validation
+        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+        progress('scoring', 30)
+        summary = analyze_upload(df, thresholds, sections)
+
+        progress('persisting', 60)
+        upload_record, ingest_metrics = save_analyzed_upload(file_obj, df, summary, fingerprint)
     
-    return predictions
+    # Send email alerts for critical equipment
+    progress('alerting', 95, summary['total_count'])
+    send_upload_alerts(summary, file_obj.name)
+
+    return upload_record, summary, ingest_metrics
+
+
+def handle_upload(request, file_obj):
+    """
+    Process an uploaded file according to the request's options
+    (``stream``, ``force``, ``async``, ``fields``, ``view``) and build the
+    API response.
+    """
+    try:
+        streaming = use_streaming(request, file_obj)
+
+        # Identical file already processed with the same thresholds: answer from
+        # the stored summary without re-parsing, writing or alerting (unless forced)
+        content_hash = file_fingerprint(file_obj)
+        force = str(request.query_params.get('force', request.data.get('force', ''))).lower() in ('true', '1')
+        if not force:
+            thresholds = get_thresholds()
+            duplicate = find_duplicate_upload(content_hash, threshold_version(thresholds))
+            if duplicate:
+                summary = cached_upload_summary(duplicate, thresholds, requested_row_sections(request))
+                return Response(project_summary(summary, request), status=status.HTTP_200_OK)
+
+        # Async mode: accept the file and process it in the background
+        if request.query_params.get('async', '').lower() in ('true', '1'):
+            job = create_upload_job(file_obj, streaming=streaming)
+            return Response({
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/api/jobs/{job.id}/"
+            }, status=status.HTTP_202_ACCEPTED)
+
+        upload_record, summary, ingest_metrics = process_upload(
+            file_obj, streaming=streaming, content_hash=content_hash, sections=requested_row_sections(request)
+        )
+        summary = {**summary, "ingest": ingest_metrics, "upload_id": upload_record.id}
+        return Response(project_summary(summary, request), status=status.HTTP_201_CREATED)
+
+    except UploadValidationError as e:
+        return Response({"error": str(e), "validation_errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class UploadCSVView(APIView):
@@ -126,142 +547,210 @@ class UploadCSVView(APIView):
         if 'file' not in request.FILES:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
             
-        file_obj = request.FILES['file']
+        return handle_upload(request, request.FILES['file'])
+
+
+class BatchUploadView(APIView):
+    """
+    Upload many files at once (``files`` form field, repeated). Files are
+    parsed and scored in parallel worker processes and each is persisted in
+    its own transaction.
+    """
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        files = request.FILES.getlist('files')
+        if not files:
+            return Response({"error": "No files uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+
+        force = str(request.query_params.get('force', request.data.get('force', ''))).lower() in ('true', '1')
+        results, fleet = process_batch(files, force=force)
+        created = any(result['status'] == 'created' for result in results)
+        return Response(
+            {"files": results, "fleet_summary": fleet},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class UploadRowsView(APIView):
+    """
+    Paginated row-level sections of an upload (``data``, ``critical_items``,
+    ``warning_items`` or ``predictions``), for clients that requested a
+    projected upload response.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk, section):
+        if section not in ROW_LEVEL_KEYS:
+            return Response(
+                {'error': f"Unknown section '{section}'. Use one of: {', '.join(ROW_LEVEL_KEYS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         try:
-            df = pd.read_csv(file_obj)
-            
-            # Validation
-            required_cols = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            missing = [col for col in required_cols if col not in df.columns]
-            if missing:
-                 return Response({"error": f"Missing columns: {missing}"}, status=status.HTTP_400_BAD_REQUEST)
+            upload_record = UploadHistory.objects.get(pk=pk)
+        except UploadHistory.DoesNotExist:
+            return Response({'error': 'Upload not found'}, status=404)
 
-            # Get configurable thresholds
-            thresholds = get_thresholds()
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = int(request.query_params.get('page_size', django_settings.UPLOAD_ROWS_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(max(1, page_size), django_settings.UPLOAD_ROWS_MAX_PAGE_SIZE)
 
-            # Analytics
-            total_count = len(df)
-            avg_flowrate = float(df['Flowrate'].mean())
-            avg_pressure = float(df['Pressure'].mean())
-            avg_temperature = float(df['Temperature'].mean())
-            type_distribution = df['Type'].value_counts().to_dict()
-
-            # Advanced Analysis using configurable thresholds
-            critical_items = df[
-                (df['Pressure'] > thresholds.pressure_critical) | 
-                (df['Temperature'] > thresholds.temperature_critical)
-            ].fillna('').to_dict(orient='records')
-            
-            warning_items = df[
-                ((df['Pressure'] > thresholds.pressure_warning) & (df['Pressure'] <= thresholds.pressure_critical)) |
-                ((df['Temperature'] > thresholds.temperature_warning) & (df['Temperature'] <= thresholds.temperature_critical))
-            ].fillna('').to_dict(orient='records')
+        result = upload_row_page(upload_record, section, get_thresholds(), (page - 1) * page_size, page_size)
+        if result is None:
+            return Response({'error': 'No row data stored for this upload'}, status=404)
+        rows, total = result
+
+        num_pages = max(1, -(-total // page_size))
+        return Response({
+            'upload_id': upload_record.id,
+            'section': section,
+            'page': page,
+            'page_size': page_size,
+            'count': total,
+            'num_pages': num_pages,
+            'next': f"/api/uploads/{pk}/rows/{section}/?page={page + 1}&page_size={page_size}" if page < num_pages else None,
+            'results': rows,
+        })
 
-            # Calculate health score
-            health_score = max(0, 100 - (len(critical_items) * 10) - (len(warning_items) * 3))
 
-            # Generate ML predictions
-            predictions = predict_equipment_health(df, thresholds)
-            
-            # Calculate prediction summary
-            critical_count = len([p for p in predictions if p["risk_level"] == "critical"])
-            warning_count = len([p for p in predictions if p["risk_level"] == "warning"])
-            avg_maintenance_days = sum(p["maintenance_in_days"] for p in predictions) / len(predictions) if predictions else 0
-
-            summary = {
-                "total_count": total_count,
-                "avg_flowrate": avg_flowrate,
-                "avg_pressure": avg_pressure,
-                "avg_temperature": avg_temperature,
-                "type_distribution": type_distribution,
-                "critical_items": critical_items,
-                "warning_items": warning_items,
-                "health_score": health_score,
-                "data": df.fillna('').to_dict(orient='records'),
-                # New ML prediction data
-                "predictions": predictions,
-                "prediction_summary": {
-                    "critical_count": critical_count,
-                    "warning_count": warning_count,
-                    "avg_maintenance_days": round(avg_maintenance_days, 1),
-                    "next_maintenance": predictions[0]["maintenance_date"] if predictions else None,
-                    "highest_risk": predictions[0] if predictions else None
-                },
-                # Store thresholds used for reference
-                "thresholds_used": {
-                    "pressure_critical": thresholds.pressure_critical,
-                    "pressure_warning": thresholds.pressure_warning,
-                    "temperature_critical": thresholds.temperature_critical,
-                    "temperature_warning": thresholds.temperature_warning,
-                    "flowrate_min": thresholds.flowrate_min,
-                    "flowrate_max": thresholds.flowrate_max,
-                }
-            }
+class UploadJobView(APIView):
+    """Status of a background upload job"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        try:
+            job = UploadJob.objects.select_related('upload').get(pk=pk)
+        except UploadJob.DoesNotExist:
+            return Response({'error': 'Job not found'}, status=404)
+        return Response(job_status(job))
 
-            # Manage history (Keep last 5)
-            existing_count = UploadHistory.objects.count()
-            if existing_count >= 5:
-                oldest_ids = UploadHistory.objects.order_by('upload_date').values_list('id', flat=True)[:existing_count - 4]
-                UploadHistory.objects.filter(id__in=oldest_ids).delete()
 
-            # Save upload history
-            file_obj.seek(0)
-            upload_record = UploadHistory.objects.create(
-                filename=file_obj.name,
-                summary_data=summary,
-                file=file_obj 
+class ResumableUploadView(APIView):
+    """Open a resumable chunked upload session"""
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        filename = request.data.get('filename')
+        try:
+            total_size = int(request.data.get('total_size', 0))
+            chunk_size = int(request.data.get('chunk_size') or django_settings.RESUMABLE_DEFAULT_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response({'error': 'total_size and chunk_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not filename:
+            return Response({'error': 'filename is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if total_size <= 0:
+            return Response({'error': 'total_size must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < chunk_size <= django_settings.RESUMABLE_MAX_CHUNK_SIZE:
+            return Response(
+                {'error': f'chunk_size must be between 1 and {django_settings.RESUMABLE_MAX_CHUNK_SIZE}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            
-            # NEW: Save individual equipment records for historical trend analysis
-            for _, row in df.iterrows():
-                EquipmentHistory.objects.create(
-                    equipment_name=row.get('Equipment Name', 'Unknown'),
-                    equipment_type=row.get('Type', 'Unknown'),
-                    pressure=float(row.get('Pressure', 0)),
-                    temperature=float(row.get('Temperature', 0)),
-                    flowrate=float(row.get('Flowrate', 0)),
-                    upload_session=upload_record
-                )
-            
-            # NEW: Send email alerts for critical equipment
+
+        expire_sessions()
+        session = ResumableUpload.objects.create(
+            filename=os.path.basename(filename),
+            total_size=total_size,
+            chunk_size=chunk_size,
+            checksum=request.data.get('sha256', '') or '',
+        )
+        return Response(session_status(session), status=status.HTTP_201_CREATED)
+
+
+def _get_session(pk):
+    try:
+        return ResumableUpload.objects.get(pk=pk)
+    except ResumableUpload.DoesNotExist:
+        return None
+
+
+class ResumableUploadDetailView(APIView):
+    """Received ranges of a resumable upload, or abort it"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        session = _get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=404)
+        return Response(session_status(session))
+
+    def delete(self, request, pk):
+        session = _get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=404)
+        discard(session)
+        session.delete()
+        return Response({'message': 'Upload session aborted'})
+
+
+class ResumableChunkView(APIView):
+    """
+    Receive one chunk as the raw request body. The optional ``X-Chunk-SHA256``
+    header is checked against the received bytes.
+    """
+    permission_classes = [AllowAny]
+
+    def put(self, request, pk, index):
+        session = _get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=404)
+        if session.status != 'active':
+            return Response({'error': f'Upload session is {session.status}'}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            # Read the body as a stream so chunks never count against DATA_UPLOAD_MAX_MEMORY_SIZE
+            chunk = save_chunk(session, index, request.stream, request.headers.get('X-Chunk-SHA256'))
+        except ChunkError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        session.save(update_fields=['updated_at'])
+        return Response(chunk)
+
+
+class ResumableFinalizeView(APIView):
+    """
+    Assemble a complete resumable upload and run it through the upload
+    pipeline. Accepts the same ``stream``, ``force`` and ``async`` options
+    as the regular upload endpoint.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request, pk):
+        session = _get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload session not found'}, status=404)
+        if not claim(session):
+            session.refresh_from_db(fields=['status'])
+            return Response({'error': f'Upload session is {session.status}'}, status=status.HTTP_409_CONFLICT)
+
+        # Chunks are only discarded once the pipeline accepted the file; on any
+        # failure the session is released so finalizing can be retried
+        finalized = False
+        try:
             try:
-                alert_settings = get_alert_settings()
-                if alert_settings.email_enabled and alert_settings.email_address:
-                    # Alert for critical items
-                    if alert_settings.alert_on_critical and len(critical_items) > 0:
-                        critical_names = [item.get('Equipment Name', 'Unknown') for item in critical_items[:5]]
-                        message = f"🚨 CRITICAL ALERT: {len(critical_items)} equipment require immediate attention!\n\n"
-                        message += f"Equipment: {', '.join(critical_names)}\n\n"
-                        message += f"Upload: {file_obj.name}\nHealth Score: {health_score}%"
-                        
-                        send_alert_email(
-                            alert_type='critical',
-                            equipment_name=f"{len(critical_items)} equipment",
-                            message=message,
-                            email_address=alert_settings.email_address
-                        )
-                    
-                    # Alert for warning items
-                    if alert_settings.alert_on_warning and len(warning_items) > 0:
-                        warning_names = [item.get('Equipment Name', 'Unknown') for item in warning_items[:5]]
-                        message = f"⚠️ WARNING: {len(warning_items)} equipment have elevated readings.\n\n"
-                        message += f"Equipment: {', '.join(warning_names)}\n\n"
-                        message += f"Upload: {file_obj.name}"
-                        
-                        send_alert_email(
-                            alert_type='warning',
-                            equipment_name=f"{len(warning_items)} equipment",
-                            message=message,
-                            email_address=alert_settings.email_address
-                        )
-            except Exception as e:
-                print(f"Alert error: {e}")
-                pass  # Don't fail upload if email fails
-
-            return Response(summary, status=status.HTTP_201_CREATED)
+                path = assemble(session)
+            except ChunkError as e:
+                return Response({'error': str(e), **session_status(session)}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                with open(path, 'rb') as fh:
+                    response = handle_upload(request, File(fh, name=session.filename))
+            finally:
+                os.remove(path)
+
+            if response.status_code < 400:
+                session.status = 'finalized'
+                session.save(update_fields=['status', 'updated_at'])
+                finalized = True
+                discard(session)
+            return response
+        finally:
+            if not finalized:
+                release(session)
 
 
 class HistoryView(APIView):
@@ -287,12 +776,15 @@ class ThresholdView(APIView):
             "temperature_critical": thresholds.temperature_critical,
             "flowrate_min": thresholds.flowrate_min,
             "flowrate_max": thresholds.flowrate_max,
-            "updated_at": thresholds.updated_at.isoformat() if thresholds.updated_at else None
+            "updated_at": thresholds.updated_at.isoformat() if thresholds.updated_at else None,
+            # Per-equipment-type overrides; fields not listed use the values above
+            "profiles": thresholds.profiles
         })
     
     def put(self, request):
         """Update threshold settings"""
-        thresholds = get_thresholds()
+        # Edit a fresh copy; saving invalidates the cached snapshot in every worker
+        thresholds = load_thresholds()
         data = request.data
         
         # Update fields if provided
@@ -322,33 +814,123 @@ class ThresholdView(APIView):
         })
 
 
+class ThresholdProfileView(APIView):
+    """
+    Per-equipment-type threshold profiles. POST creates or updates the
+    profile for ``equipment_type``; omitted or null fields use the default
+    thresholds.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response([{
+            "equipment_type": profile.equipment_type,
+            **{field: getattr(profile, field) for field in THRESHOLD_FIELDS},
+            "updated_at": profile.updated_at.isoformat(),
+        } for profile in ThresholdProfile.objects.all()])
+
+    def post(self, request):
+        data = request.data
+        equipment_type = data.get('equipment_type')
+        if not equipment_type:
+            return Response({"error": "equipment_type is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            values = {
+                field: None if data[field] in (None, '') else float(data[field])
+                for field in THRESHOLD_FIELDS if field in data
+            }
+        except (TypeError, ValueError):
+            return Response({"error": "Threshold values must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Saving invalidates the cached thresholds in every worker
+        profile, created = ThresholdProfile.objects.update_or_create(equipment_type=equipment_type, defaults=values)
+        return Response({
+            "message": "Threshold profile saved",
+            "equipment_type": profile.equipment_type,
+            **{field: getattr(profile, field) for field in THRESHOLD_FIELDS},
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class ThresholdProfileDetailView(APIView):
+    """Remove the threshold profile of one equipment type"""
+    permission_classes = [AllowAny]
+
+    def delete(self, request, equipment_type):
+        deleted, _ = ThresholdProfile.objects.filter(equipment_type=equipment_type).delete()
+        if not deleted:
+            return Response({"error": "Threshold profile not found"}, status=404)
+        return Response({"message": "Threshold profile deleted"})
+
+
+class ThresholdSimulationView(APIView):
+    """
+    What-if analysis for candidate thresholds: re-scores the stored equipment
+    history of the last ``days`` days (default 30) under the current and the
+    candidate thresholds. Nothing is saved.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        data = request.data
+        try:
+            days = int(data.get('days', 30))
+            values = {field: float(data[field]) for field in THRESHOLD_FIELDS if field in data}
+        except (TypeError, ValueError):
+            return Response({"error": "days and threshold values must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        if days < 1:
+            return Response({"error": "days must be at least 1"}, status=status.HTTP_400_BAD_REQUEST)
+
+        profiles = data.get('profiles')
+        if profiles is not None and not isinstance(profiles, dict):
+            return Response({"error": "profiles must map equipment types to thresholds"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        current = get_thresholds()
+        candidate = candidate_thresholds(current, values, profiles)
+        return Response(simulate(current, candidate, days))
+
+
 class PredictMaintenanceView(APIView):
     """Re-run predictions on existing data with current thresholds"""
     permission_classes = [AllowAny]
     
     def get(self, request):
         """Get predictions for the latest uploaded data"""
-        latest = UploadHistory.objects.order_by('-upload_date').first()
+        latest_id = UploadHistory.objects.order_by('-upload_date').values_list('id', flat=True).first()
         
-        if not latest:
+        if not latest_id:
             return Response({"error": "No data available"}, status=status.HTTP_404_NOT_FOUND)
         
         thresholds = get_thresholds()
-        data = latest.summary_data.get('data', [])
+        version = threshold_version(thresholds)
+        result = prediction_cache.get(latest_id, version)
+        if result is not None:
+            return Response({**result, "cached": True})
         
-        if not data:
-            return Response({"error": "No equipment data found"}, status=status.HTTP_404_NOT_FOUND)
+        # Scores kept from an earlier call are updated for the new thresholds
+        # instead of re-scoring every row
+        scorer = prediction_cache.take_scorer(latest_id)
+        if scorer is None:
+            df = load_upload_frame(UploadHistory.objects.get(pk=latest_id), columns=REQUIRED_COLUMNS)
+            
+            if df is None or df.empty:
+                return Response({"error": "No equipment data found"}, status=status.HTTP_404_NOT_FOUND)
+            
+            scorer = IncrementalScores(df, thresholds)
+        else:
+            scorer.rescore(thresholds)
         
-        # Convert to DataFrame for processing
-        df = pd.DataFrame(data)
-        predictions = predict_equipment_health(df, thresholds)
+        predictions = predictions_from_scores(scorer.df, scorer.scores)
+        level_counts = dict(zip(RISK_LEVELS.tolist(), scorer.level_counts.tolist()))
+        prediction_cache.keep_scorer(latest_id, scorer)
         
         # Calculate summary stats
-        critical_count = len([p for p in predictions if p["risk_level"] == "critical"])
-        warning_count = len([p for p in predictions if p["risk_level"] == "warning"])
-        healthy_count = len([p for p in predictions if p["risk_level"] == "healthy"])
+        critical_count = level_counts["critical"]
+        warning_count = level_counts["warning"]
+        healthy_count = level_counts["healthy"]
         
-        return Response({
+        result = {
             "predictions": predictions,
             "summary": {
                 "total": len(predictions),
@@ -358,8 +940,13 @@ class PredictMaintenanceView(APIView):
                 "highest_risk_equipment": predictions[0]["equipment_name"] if predictions else None,
                 "next_maintenance_date": predictions[0]["maintenance_date"] if predictions else None
             },
-            "generated_at": datetime.now().isoformat()
-        })
+            # When the predictions were computed; older than the request when served from cache
+            "generated_at": datetime.now().isoformat(),
+            "upload_id": latest_id,
+            "threshold_version": version,
+        }
+        prediction_cache.put(latest_id, version, result)
+        return Response({**result, "cached": False})
 
 
 class PDFReportView(APIView):
@@ -425,29 +1012,28 @@ class PDFReportView(APIView):
 # FEATURE 1: Historical Trend Analysis
 # ============================================================================
 
-def get_alert_settings():
-    """Get or create default alert settings"""
+def load_alert_settings():
+    """Get or create default alert settings from the database"""
     settings, _ = AlertSettings.objects.get_or_create(pk=1)
     return settings
 
 
+def get_alert_settings():
+    """Alert settings from the process-local snapshot; treat as read-only"""
+    return config.cached('alert_settings', load_alert_settings)
+
+
 def send_alert_email(alert_type, equipment_name, message, email_address):
-    """Send alert email and log it"""
+    """Send alert email right away and log it (used for test alerts; other alerts go through the outbox)"""
     try:
-        subject_map = {
-            'critical': '🚨 CRITICAL: Equipment Alert',
-            'warning': '⚠️ WARNING: Equipment Alert',
-            'maintenance': '🔧 Maintenance Reminder'
-        }
-        
-        subject = f"{subject_map.get(alert_type, 'Alert')} - {equipment_name}"
+        subject = alert_subject(alert_type, equipment_name)
         
         # Try to send email (will fail gracefully if not configured)
         try:
             send_mail(
                 subject=subject,
                 message=message,
-                from_email=django_settings.DEFAULT_FROM_EMAIL if hasattr(django_settings, 'DEFAULT_FROM_EMAIL') else 'noreply@chemviz.local',
+                from_email=from_email(),
                 recipient_list=[email_address],
                 fail_silently=False
             )
@@ -460,6 +1046,7 @@ def send_alert_email(alert_type, equipment_name, message, email_address):
         AlertLog.objects.create(
             alert_type=alert_type,
             equipment_name=equipment_name,
+            equipment=find_equipment(equipment_name),
             message=message,
             sent_to=email_address,
             was_successful=was_successful
@@ -477,38 +1064,55 @@ class EquipmentHistoryView(APIView):
     def get(self, request):
         """Get historical trend data for equipment"""
         equipment_name = request.query_params.get('equipment', None)
-        days = int(request.query_params.get('days', 30))
-        
-        cutoff_date = datetime.now() - timedelta(days=days)
+        try:
+            days = int(request.query_params.get('days', 30))
+            limit = int(request.query_params.get('limit', django_settings.EQUIPMENT_HISTORY_POINTS))
+        except ValueError:
+            return Response({"error": "days and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if days < 1 or limit < 1:
+            return Response({"error": "days and limit must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+        # Points per device, newest first within the window
+        limit = min(limit, django_settings.EQUIPMENT_HISTORY_MAX_POINTS)
+        max_points = request.query_params.get('max_points')
+        if max_points is not None:
+            try:
+                max_points = min(int(max_points), django_settings.EQUIPMENT_HISTORY_MAX_POINTS)
+            except ValueError:
+                return Response({"error": "max_points must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+            if max_points < 3:
+                return Response({"error": "max_points must be at least 3"}, status=status.HTTP_400_BAD_REQUEST)
         
-        queryset = EquipmentHistory.objects.order_by('-recorded_at')
+        resolution = request.query_params.get('resolution', 'auto')
+        if resolution not in ('auto', 'raw', *RESOLUTIONS):
+            return Response({"error": f"resolution must be one of auto, raw, {', '.join(RESOLUTIONS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if resolution == 'auto':
+            # Hourly/daily rollups whenever they still give enough points for the window
+            resolution = choose_resolution(days, max_points or limit)
         
+        cutoff_date = timezone.now() - timedelta(days=days)
+        equipment_id = None
         if equipment_name:
-            queryset = queryset.filter(equipment_name=equipment_name)
-        
-        # Limit to 100 points per device for performance
-        queryset = queryset[:100]
+            equipment = find_equipment(equipment_name)
+            # Unknown equipment: an id no row has, so the series come back empty
+            equipment_id = equipment.id if equipment else 0
         
         # Group by equipment and time
-        history_data = {}
-        for record in queryset:
-            name = record.equipment_name
-            if name not in history_data:
-                history_data[name] = {
-                    'equipment_name': name,
-                    'equipment_type': record.equipment_type,
-                    'data_points': []
-                }
-            
-            history_data[name]['data_points'].append({
-                'timestamp': record.recorded_at.isoformat(),
-                'pressure': record.pressure,
-                'temperature': record.temperature,
-                'flowrate': record.flowrate
-            })
+        if max_points:
+            # The whole window, downsampled per device instead of truncated
+            if resolution == 'raw':
+                rows, raw_counts = downsampled_rows(cutoff_date, equipment_id, max_points)
+                history_data = group_series(rows, raw_counts)
+            else:
+                rows, raw_counts = downsampled_buckets(resolution, cutoff_date, equipment_id, max_points)
+                history_data = group_buckets(rows, raw_counts)
+        elif resolution == 'raw':
+            history_data = group_series(recent_rows(cutoff_date, equipment_id, limit))
+        else:
+            history_data = group_buckets(recent_buckets(resolution, cutoff_date, equipment_id, limit))
         
         # Get list of all equipment names for dropdown
-        all_equipment = EquipmentHistory.objects.values_list('equipment_name', flat=True).distinct()
+        all_equipment = equipment_names()
         
         # Calculate trend summary
         trends = []
@@ -538,10 +1142,13 @@ class EquipmentHistoryView(APIView):
                 })
         
         return Response({
-            'equipment_list': list(all_equipment),
+            'equipment_list': all_equipment,
             'history': list(history_data.values()),
             'trends': trends,
-            'period_days': days
+            'period_days': days,
+            'points_per_equipment': max_points or limit,
+            'downsampled': bool(max_points),
+            'resolution': resolution
         })
 
 
@@ -566,7 +1173,8 @@ class AlertSettingsView(APIView):
     
     def put(self, request):
         """Update alert settings"""
-        settings = get_alert_settings()
+        # Edit a fresh copy; saving invalidates the cached snapshot in every worker
+        settings = load_alert_settings()
         data = request.data
         
         if 'email_enabled' in data:
@@ -602,7 +1210,7 @@ class AlertLogView(APIView):
         limit = int(request.query_params.get('limit', 50))
         logs = AlertLog.objects.all()[:limit]
         
-        return Response([{
+        entries = [{
             'id': log.id,
             'alert_type': log.alert_type,
             'equipment_name': log.equipment_name,
@@ -610,7 +1218,12 @@ class AlertLogView(APIView):
             'sent_to': log.sent_to,
             'sent_at': log.sent_at.isoformat(),
             'was_successful': log.was_successful
-        } for log in logs])
+        } for log in logs]
+
+        # ?with_suppressed=true adds per-equipment counts of repeat alerts that were not sent
+        if request.query_params.get('with_suppressed', '').lower() in ('true', '1'):
+            return Response({'logs': entries, 'suppressed': suppression_summary()})
+        return Response(entries)
 
 
 class TestAlertView(APIView):
@@ -644,6 +1257,23 @@ class TestAlertView(APIView):
 # FEATURE 3: Maintenance Scheduling
 # ============================================================================
 
+def schedule_type_error(name, equipment_type):
+    """
+    Error response when a schedule gives a type other than its equipment's.
+    The type is shared by every schedule of that equipment, so a schedule
+    can only fill it in while it is still unknown.
+    """
+    equipment = find_equipment(name)
+    if equipment is None or not equipment.equipment_type:
+        return None
+    if equipment_type and equipment_type != equipment.equipment_type:
+        return Response({
+            'error': f"{equipment.name} is of type '{equipment.equipment_type}'; "
+                     "equipment types cannot be changed from a maintenance schedule"
+        }, status=400)
+    return None
+
+
 class MaintenanceScheduleView(APIView):
     """API endpoint for maintenance scheduling"""
     permission_classes = [AllowAny]
@@ -654,7 +1284,7 @@ class MaintenanceScheduleView(APIView):
         equipment_filter = request.query_params.get('equipment', None)
         upcoming_days = request.query_params.get('upcoming_days', None)
         
-        queryset = MaintenanceSchedule.objects.all()
+        queryset = MaintenanceSchedule.objects.select_related('equipment')
         
         # Update overdue statuses
         today = date.today()
@@ -666,7 +1296,7 @@ class MaintenanceScheduleView(APIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
         if equipment_filter:
-            queryset = queryset.filter(equipment_name__icontains=equipment_filter)
+            queryset = queryset.filter(equipment__in=search_equipment(equipment_filter))
         if upcoming_days:
             end_date = today + timedelta(days=int(upcoming_days))
             queryset = queryset.filter(scheduled_date__lte=end_date, scheduled_date__gte=today)
@@ -710,11 +1340,16 @@ class MaintenanceScheduleView(APIView):
     def post(self, request):
         """Create a new maintenance schedule"""
         data = request.data
+        if not data.get('equipment_name'):
+            return Response({'error': 'equipment_name is required'}, status=400)
+        
+        equipment_type = data.get('equipment_type', '')
+        error = schedule_type_error(data['equipment_name'], equipment_type)
+        if error:
+            return error
         
         try:
-            schedule = MaintenanceSchedule.objects.create(
-                equipment_name=data.get('equipment_name'),
-                equipment_type=data.get('equipment_type', ''),
+            schedule = MaintenanceSchedule(
                 title=data.get('title'),
                 description=data.get('description', ''),
                 scheduled_date=data.get('scheduled_date'),
@@ -725,16 +1360,26 @@ class MaintenanceScheduleView(APIView):
                 estimated_duration=int(data.get('estimated_duration', 60)),
                 notes=data.get('notes', '')
             )
+            # Validate before resolving the equipment, so a rejected request leaves no equipment behind
+            schedule.full_clean(exclude=['equipment'])
+            with transaction.atomic():
+                schedule.equipment = get_or_create_equipment(data['equipment_name'], equipment_type)
+                schedule.save()
             
-            # Send alert if enabled
+            # Queue alert if enabled
             alert_settings = get_alert_settings()
             if alert_settings.email_enabled and alert_settings.alert_on_maintenance_due and alert_settings.email_address:
-                send_alert_email(
-                    alert_type='maintenance',
-                    equipment_name=schedule.equipment_name,
-                    message=f"New maintenance scheduled: {schedule.title}\n\nEquipment: {schedule.equipment_name}\nDate: {schedule.scheduled_date}\nPriority: {schedule.priority}\n\nDescription: {schedule.description}",
-                    email_address=alert_settings.email_address
-                )
+                message = f"New maintenance scheduled: {schedule.title}\n\nEquipment: {schedule.equipment_name}\nDate: {schedule.scheduled_date}\nPriority: {schedule.priority}\n\nDescription: {schedule.description}"
+                if digest_mode(alert_settings):
+                    buffer_events('maintenance', [(schedule.equipment_name, message)])
+                    flush_digest(alert_settings)
+                else:
+                    enqueue_alert(
+                        alert_type='maintenance',
+                        equipment_name=schedule.equipment_name,
+                        message=message,
+                        email_address=alert_settings.email_address
+                    )
             
             return Response({
                 'id': schedule.id,
@@ -760,7 +1405,7 @@ class MaintenanceDetailView(APIView):
     def get(self, request, pk):
         """Get a specific maintenance schedule"""
         try:
-            schedule = MaintenanceSchedule.objects.get(pk=pk)
+            schedule = MaintenanceSchedule.objects.select_related('equipment').get(pk=pk)
             return Response({
                 'id': schedule.id,
                 'equipment_name': schedule.equipment_name,
@@ -783,13 +1428,14 @@ class MaintenanceDetailView(APIView):
     def put(self, request, pk):
         """Update a maintenance schedule"""
         try:
-            schedule = MaintenanceSchedule.objects.get(pk=pk)
+            schedule = MaintenanceSchedule.objects.select_related('equipment').get(pk=pk)
             data = request.data
             
-            if 'equipment_name' in data:
-                schedule.equipment_name = data['equipment_name']
-            if 'equipment_type' in data:
-                schedule.equipment_type = data['equipment_type']
+            equipment_name = data.get('equipment_name') or schedule.equipment_name
+            equipment_type = data.get('equipment_type', '')
+            error = schedule_type_error(equipment_name, equipment_type)
+            if error:
+                return error
             if 'title' in data:
                 schedule.title = data['title']
             if 'description' in data:
@@ -812,7 +1458,11 @@ class MaintenanceDetailView(APIView):
             if 'notes' in data:
                 schedule.notes = data['notes']
             
-            schedule.save()
+            schedule.full_clean(exclude=['equipment'])
+            with transaction.atomic():
+                if data.get('equipment_name') or equipment_type:
+                    schedule.equipment = get_or_create_equipment(equipment_name, equipment_type)
+                schedule.save()
             
             return Response({
                 'message': 'Schedule updated successfully',
@@ -821,6 +1471,8 @@ class MaintenanceDetailView(APIView):
             })
         except MaintenanceSchedule.DoesNotExist:
             return Response({'error': 'Schedule not found'}, status=404)
+        except (ValueError, ValidationError) as e:
+            return Response({'error': str(e)}, status=400)
     
     def delete(self, request, pk):
         """Delete a maintenance schedule"""
@@ -844,45 +1496,45 @@ class AutoScheduleMaintenanceView(APIView):
             return Response({'error': 'No equipment data available'}, status=404)
         
         thresholds = get_thresholds()
-        data = latest.summary_data.get('data', [])
+        df = load_upload_frame(latest, columns=REQUIRED_COLUMNS)
         
-        if not data:
+        if df is None or df.empty:
             return Response({'error': 'No equipment data found'}, status=404)
         
-        df = pd.DataFrame(data)
         predictions = predict_equipment_health(df, thresholds)
         
         created_schedules = []
         today = date.today()
         
-        for pred in predictions:
-            if pred['risk_level'] in ['critical', 'warning']:
-                # Check if already scheduled
-                existing = MaintenanceSchedule.objects.filter(
-                    equipment_name=pred['equipment_name'],
-                    status__in=['scheduled', 'in_progress']
-                ).first()
+        at_risk = [pred for pred in predictions if pred['risk_level'] in ['critical', 'warning']]
+        ids = equipment_ids([pred['equipment_name'] for pred in at_risk], [pred['type'] for pred in at_risk])
+        # Equipment already scheduled, in one query
+        scheduled = set(MaintenanceSchedule.objects.filter(
+            equipment_id__in=ids,
+            status__in=['scheduled', 'in_progress']
+        ).values_list('equipment_id', flat=True))
+        
+        for pred, equipment_id in zip(at_risk, ids):
+            if equipment_id not in scheduled:
+                scheduled.add(equipment_id)
+                priority = 'critical' if pred['risk_level'] == 'critical' else 'high'
+                scheduled_date = today + timedelta(days=min(pred['maintenance_in_days'], 7))
                 
-                if not existing:
-                    priority = 'critical' if pred['risk_level'] == 'critical' else 'high'
-                    scheduled_date = today + timedelta(days=min(pred['maintenance_in_days'], 7))
-                    
-                    schedule = MaintenanceSchedule.objects.create(
-                        equipment_name=pred['equipment_name'],
-                        equipment_type=pred['type'],
-                        title=f"Predicted Maintenance - {pred['risk_level'].title()} Risk",
-                        description=f"Auto-generated based on ML predictions.\n\nRisk Score: {pred['risk_score']}%\nRisk Factors: {', '.join(pred['risk_factors']) if pred['risk_factors'] else 'None'}",
-                        scheduled_date=scheduled_date,
-                        priority=priority,
-                        status='scheduled'
-                    )
-                    
-                    created_schedules.append({
-                        'id': schedule.id,
-                        'equipment_name': schedule.equipment_name,
-                        'scheduled_date': schedule.scheduled_date.isoformat(),
-                        'priority': schedule.priority
-                    })
+                schedule = MaintenanceSchedule.objects.create(
+                    equipment_id=equipment_id,
+                    title=f"Predicted Maintenance - {pred['risk_level'].title()} Risk",
+                    description=f"Auto-generated based on ML predictions.\n\nRisk Score: {pred['risk_score']}%\nRisk Factors: {', '.join(pred['risk_factors']) if pred['risk_factors'] else 'None'}",
+                    scheduled_date=scheduled_date,
+                    priority=priority,
+                    status='scheduled'
+                )
+                
+                created_schedules.append({
+                    'id': schedule.id,
+                    'equipment_name': pred['equipment_name'],
+                    'scheduled_date': schedule.scheduled_date.isoformat(),
+                    'priority': schedule.priority
+                })
         
         return Response({
             'message': f'Created {len(created_schedules)} maintenance schedules',
@@ -100,6 +100,75 @@ else:
         }
     }
 
+# Equipment history ingest: rows per INSERT batch, and whether to use COPY on PostgreSQL
+EQUIPMENT_HISTORY_BATCH_SIZE = int(os.environ.get('EQUIPMENT_HISTORY_BATCH_SIZE', 1000))
+EQUIPMENT_HISTORY_USE_COPY = os.environ.get('EQUIPMENT_HISTORY_USE_COPY', 'True').lower() == 'true'
+
+# Streaming uploads: files above the threshold (or ?stream=true) are read in chunks
+# and only the top N items/predictions are kept in the summary
+UPLOAD_STREAMING_THRESHOLD_BYTES = int(os.environ.get('UPLOAD_STREAMING_THRESHOLD_BYTES', 50 * 1024 * 1024))
+UPLOAD_STREAM_CHUNK_ROWS = int(os.environ.get('UPLOAD_STREAM_CHUNK_ROWS', 50000))
+UPLOAD_STREAM_TOP_N = int(os.environ.get('UPLOAD_STREAM_TOP_N', 100))
+
+# CSV parsing profile: extra columns to read besides the required five, and the
+# dtype for Flowrate/Pressure/Temperature (float32 halves memory but changes scores slightly)
+UPLOAD_EXTRA_COLUMNS = [col for col in os.environ.get('UPLOAD_EXTRA_COLUMNS', '').split(',') if col]
+UPLOAD_NUMERIC_DTYPE = os.environ.get('UPLOAD_NUMERIC_DTYPE', 'float64')
+
+# Background upload jobs (?async=true): size of the in-process worker pool
+UPLOAD_JOB_WORKERS = int(os.environ.get('UPLOAD_JOB_WORKERS', 2))
+# Running jobs touch their heartbeat this often; jobs whose heartbeat is older than
+# the timeout are treated as lost (worker crash or restart) and requeued
+UPLOAD_JOB_HEARTBEAT_SECONDS = int(os.environ.get('UPLOAD_JOB_HEARTBEAT_SECONDS', 30))
+UPLOAD_JOB_TIMEOUT_SECONDS = int(os.environ.get('UPLOAD_JOB_TIMEOUT_SECONDS', 300))
+
+# Batch uploads: worker processes for parsing/scoring (0 = one per CPU core,
+# negative = analyze inline in the request process)
+UPLOAD_BATCH_WORKERS = int(os.environ.get('UPLOAD_BATCH_WORKERS', 0))
+
+# Paginated row-level upload sections (/api/uploads/<id>/rows/<section>/)
+UPLOAD_ROWS_PAGE_SIZE = int(os.environ.get('UPLOAD_ROWS_PAGE_SIZE', 100))
+UPLOAD_ROWS_MAX_PAGE_SIZE = int(os.environ.get('UPLOAD_ROWS_MAX_PAGE_SIZE', 1000))
+
+# Cached ThresholdSettings/AlertSettings snapshot: saving either model bumps the
+# ConfigVersion row, which every worker checks at most once per CONFIG_VERSION_CHECK_SECONDS
+CONFIG_VERSION_CHECK_SECONDS = float(os.environ.get('CONFIG_VERSION_CHECK_SECONDS', 1))
+CONFIG_CACHE_SECONDS = int(os.environ.get('CONFIG_CACHE_SECONDS', 300))
+
+# Memoized /api/predict/ results per (upload, threshold version), least recently used evicted first
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 32))
+# Uploads whose per-row scores are kept for incremental re-scoring after threshold changes
+PREDICTION_SCORER_CACHE_SIZE = int(os.environ.get('PREDICTION_SCORER_CACHE_SIZE', 4))
+
+# Equipment trend queries (/api/equipment-history/): default and maximum points per equipment
+EQUIPMENT_HISTORY_POINTS = int(os.environ.get('EQUIPMENT_HISTORY_POINTS', 100))
+EQUIPMENT_HISTORY_MAX_POINTS = int(os.environ.get('EQUIPMENT_HISTORY_MAX_POINTS', 5000))
+
+# Raw history rows read per chunk by the rebuild_rollups command
+ROLLUP_REBUILD_CHUNK_ROWS = int(os.environ.get('ROLLUP_REBUILD_CHUNK_ROWS', 100000))
+
+# Tiered retention (api/retention.py), run in the background after uploads and by the apply_retention command.
+# Raw history older than HISTORY_RETENTION_DAYS is archived to compressed files and deleted; hourly rollups
+# older than HOURLY_ROLLUP_RETENTION_DAYS are deleted (daily rollups are kept); only the newest
+# UPLOAD_RETENTION_COUNT uploads are kept. 0 disables each tier.
+HISTORY_RETENTION_DAYS = int(os.environ.get('HISTORY_RETENTION_DAYS', 90))
+HOURLY_ROLLUP_RETENTION_DAYS = int(os.environ.get('HOURLY_ROLLUP_RETENTION_DAYS', 365))
+UPLOAD_RETENTION_COUNT = int(os.environ.get('UPLOAD_RETENTION_COUNT', 5))
+# Rows archived or deleted per batch, and minimum seconds between background archive runs
+RETENTION_BATCH_ROWS = int(os.environ.get('RETENTION_BATCH_ROWS', 10000))
+RETENTION_INTERVAL_SECONDS = int(os.environ.get('RETENTION_INTERVAL_SECONDS', 3600))
+
+# Threshold what-if simulation: history rows scored per chunk, and equipment listed in the response
+SIMULATION_CHUNK_ROWS = int(os.environ.get('SIMULATION_CHUNK_ROWS', 100000))
+SIMULATION_MAX_EQUIPMENT = int(os.environ.get('SIMULATION_MAX_EQUIPMENT', 100))
+
+# Resumable chunked uploads: where partial chunks are kept, chunk size limits, and seconds an unfinished
+# session may sit untouched before it and its chunks are expired (0 disables)
+RESUMABLE_UPLOAD_DIR = os.environ.get('RESUMABLE_UPLOAD_DIR', str(BASE_DIR / 'uploads' / 'resumable'))
+RESUMABLE_DEFAULT_CHUNK_SIZE = int(os.environ.get('RESUMABLE_DEFAULT_CHUNK_SIZE', 8 * 1024 * 1024))
+RESUMABLE_MAX_CHUNK_SIZE = int(os.environ.get('RESUMABLE_MAX_CHUNK_SIZE', 64 * 1024 * 1024))
+RESUMABLE_UPLOAD_TTL_SECONDS = int(os.environ.get('RESUMABLE_UPLOAD_TTL_SECONDS', 24 * 60 * 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -187,4 +256,14 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER or 'al
 if not EMAIL_HOST_USER or 'your-email' in EMAIL_HOST_USER or not EMAIL_HOST_PASSWORD or 'your-app-password' in EMAIL_HOST_PASSWORD:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Alert outbox dispatcher: alerts per SMTP connection, and retry policy for failed sends
+ALERT_DISPATCH_BATCH_SIZE = int(os.environ.get('ALERT_DISPATCH_BATCH_SIZE', 50))
+ALERT_MAX_ATTEMPTS = int(os.environ.get('ALERT_MAX_ATTEMPTS', 5))
+ALERT_RETRY_BASE_SECONDS = int(os.environ.get('ALERT_RETRY_BASE_SECONDS', 30))
+
+# Per-equipment alert deduplication: repeats within the cooldown are suppressed;
+# the state cache is refreshed from the database at most this often
+ALERT_COOLDOWN_MINUTES = int(os.environ.get('ALERT_COOLDOWN_MINUTES', 60))
+ALERT_STATE_CACHE_SECONDS = int(os.environ.get('ALERT_STATE_CACHE_SECONDS', 30))
+
 
@@ -0,0 +1,79 @@
+"""
+Benchmark: CSV vs Parquet upload parsing and analysis.
+
+Usage (from backend/):
+    python benchmarks/bench_formats.py [rows]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from api.models import ThresholdSettings  # noqa: E402
+from api.readers import read_upload_frame  # noqa: E402
+from api.views import analyze_upload  # noqa: E402
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    sys.exit("pyarrow is required for this benchmark")
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Equipment Name': [f'Unit {i}' for i in range(n)],
+        'Type': rng.choice(['Pump', 'Reactor', 'Tank', 'Heat Exchanger'], n),
+        'Flowrate': np.round(rng.uniform(0, 260, n), 2),
+        'Pressure': np.round(rng.uniform(0, 110, n), 1),
+        'Temperature': np.round(rng.uniform(0, 200, n), 1),
+        # Extra historian columns that the columnar path never reads
+        'Tag': [f'TAG-{i:08d}' for i in range(n)],
+        'Vibration': rng.uniform(0, 5, n),
+    })
+
+
+class _Upload(io.BytesIO):
+    """BytesIO with the ``size``/``chunks`` API of a Django upload"""
+
+    @property
+    def size(self):
+        return len(self.getbuffer())
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    df = make_frame(n)
+    thresholds = ThresholdSettings()  # unsaved instance with model defaults
+
+    csv_file = _Upload(df.to_csv(index=False).encode('utf-8'))
+    parquet_buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), parquet_buffer)
+    parquet_file = _Upload(parquet_buffer.getvalue())
+
+    print(f"rows: {n:,}")
+    for label, upload in (("csv", csv_file), ("parquet", parquet_file)):
+        parse, frame = timed(read_upload_frame, upload)
+        analyze, _ = timed(analyze_upload, frame, thresholds)
+        print(f"{label:8s} size {upload.size / 1e6:7.1f} MB  parse {parse:7.3f} s  analyze {analyze:7.3f} s")
+
+
+if __name__ == '__main__':
+    main()
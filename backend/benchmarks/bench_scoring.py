@@ -0,0 +1,68 @@
+"""
+Benchmark: row-by-row vs vectorized equipment risk scoring.
+
+Usage (from backend/):
+    python benchmarks/bench_scoring.py [rows]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from api.models import ThresholdSettings  # noqa: E402
+from api.scoring import predict_frame, score_frame  # noqa: E402
+from api.views import calculate_risk_score  # noqa: E402
+
+
+def make_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Equipment Name': [f'Unit {i}' for i in range(n)],
+        'Type': rng.choice(['Pump', 'Reactor', 'Tank', 'Heat Exchanger'], n),
+        'Flowrate': np.round(rng.uniform(0, 260, n), 2),
+        'Pressure': np.round(rng.uniform(0, 110, n), 1),
+        'Temperature': np.round(rng.uniform(0, 200, n), 1),
+    })
+
+
+def row_by_row(df, thresholds):
+    results = []
+    for _, row in df.iterrows():
+        results.append(calculate_risk_score(
+            float(row['Pressure']), float(row['Temperature']), float(row['Flowrate']), thresholds
+        ))
+    return results
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    df = make_frame(n)
+    thresholds = ThresholdSettings()  # unsaved instance with model defaults
+
+    arrays_only = timed(score_frame, df, thresholds)
+    vectorized = timed(predict_frame, df, thresholds)
+    scalar = timed(row_by_row, df, thresholds)
+
+    print(f"rows:          {n:,}")
+    print(f"row-by-row:    {scalar:8.3f} s")
+    print(f"vectorized:    {vectorized:8.3f} s  (array scoring {arrays_only:.3f} s, rest is building dicts)")
+    print(f"speedup:       {scalar / vectorized:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
 import sys
+import os
+import hashlib
 import requests
 import json
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QLabel, QFileDialog, 
                              QTabWidget, QTableWidget, QTableWidgetItem, QMessageBox,
                              QLineEdit, QFormLayout, QHeaderView, QFrame, QComboBox,
-                             QDateEdit, QTimeEdit, QCheckBox)
+                             QDateEdit, QTimeEdit, QCheckBox, QProgressDialog)
 from PyQt5.QtCore import Qt, QDate, QTime
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
@@ -14,6 +16,19 @@ from datetime import datetime, date, timedelta
 
 API_URL = "http://127.0.0.1:8000/api/"
 
+# Files above this size are sent in checksummed chunks that survive dropped connections
+RESUMABLE_THRESHOLD_BYTES = 20 * 1024 * 1024
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+RESUMABLE_CHUNK_RETRIES = 3
+
+# Upload summary sections the Upload tab and Visualizer render; the rest are skipped server-side
+UPLOAD_FIELDS = ("total_count,health_score,avg_flowrate,avg_pressure,avg_temperature,"
+                 "type_distribution,critical_items,critical_item_count,data")
+
+# Trend series are downsampled server-side to this many points; markers are drawn up to the limit below
+TREND_MAX_POINTS = 500
+TREND_MARKER_LIMIT = 60
+
 LIGHT_STYLESHEET = """
 QMainWindow, QWidget {
     background-color: #f8fafc;
@@ -268,6 +283,8 @@ class MainWindow(QMainWindow):
     def __init__(self, auth):
         super().__init__()
         self.auth = auth
+        # (path, size) -> resumable upload session id, so an interrupted upload can continue
+        self.resumable_sessions = {}
         # Apply Default Theme (Light)
         self.is_dark_mode = False
         self.setStyleSheet(LIGHT_STYLESHEET)
@@ -399,10 +416,18 @@ class MainWindow(QMainWindow):
         fname, _ = QFileDialog.getOpenFileName(self, 'Open CSV', '.', "CSV Files (*.csv)")
         if fname:
             self.lbl_status.setText(f"Processing {fname}...")
-            files = {'file': open(fname, 'rb')}
             try:
-                r = requests.post(API_URL + "upload/", files=files, auth=self.auth)
-                if r.status_code == 201:
+                if os.path.getsize(fname) > RESUMABLE_THRESHOLD_BYTES:
+                    r = self.upload_resumable(fname)
+                    if r is None:
+                        self.lbl_status.setText("Upload cancelled (it can be resumed by uploading the same file again)")
+                        return
+                else:
+                    with open(fname, 'rb') as fh:
+                        r = requests.post(API_URL + "upload/", files={'file': fh}, auth=self.auth,
+                                          params={'fields': UPLOAD_FIELDS})
+                # 200 means the same file was already analyzed and the stored result was returned
+                if r.status_code in (200, 201):
                     data = r.json()
                     self.current_data = data
                     self.display_upload_results(data)
@@ -417,7 +442,7 @@ class MainWindow(QMainWindow):
                     self.load_maintenance()
                     
                     # Show notification for critical items
-                    critical_count = len(data.get('critical_items', []))
+                    critical_count = data.get('critical_item_count', len(data.get('critical_items', [])))
                     if critical_count > 0:
                         QMessageBox.warning(self, "Critical Alert", 
                                           f"🚨 {critical_count} equipment require immediate attention!\nAlert notifications have been processed.")
@@ -426,6 +451,75 @@ class MainWindow(QMainWindow):
             except Exception as e:
                 self.lbl_status.setText(f"❌ Connection Error: {e}")
 
+    def upload_resumable(self, fname):
+        """
+        Send a large file in checksummed chunks, skipping chunks the server
+        already has from an earlier interrupted attempt. Returns the finalize
+        response, or None if the user cancelled.
+        """
+        size = os.path.getsize(fname)
+        sessions = self.resumable_sessions
+
+        received = set()
+        upload_id = sessions.get((fname, size))
+        if upload_id:
+            r = requests.get(API_URL + f"uploads/resumable/{upload_id}/", auth=self.auth)
+            if r.status_code == 200 and r.json().get('status') == 'active':
+                received = set(r.json()['received_chunks'])
+            else:
+                upload_id = None
+
+        if not upload_id:
+            r = requests.post(API_URL + "uploads/resumable/", auth=self.auth, json={
+                'filename': os.path.basename(fname),
+                'total_size': size,
+                'chunk_size': RESUMABLE_CHUNK_SIZE,
+            })
+            r.raise_for_status()
+            upload_id = r.json()['upload_id']
+            sessions[(fname, size)] = upload_id
+
+        total_chunks = max(1, -(-size // RESUMABLE_CHUNK_SIZE))
+        progress = QProgressDialog(f"Uploading {os.path.basename(fname)}...", "Cancel", 0, total_chunks, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        try:
+            with open(fname, 'rb') as fh:
+                for index in range(total_chunks):
+                    progress.setValue(index)
+                    QApplication.processEvents()
+                    if progress.wasCanceled():
+                        return None
+                    if index in received:
+                        continue
+
+                    fh.seek(index * RESUMABLE_CHUNK_SIZE)
+                    body = fh.read(RESUMABLE_CHUNK_SIZE)
+                    headers = {'Content-Type': 'application/octet-stream',
+                               'X-Chunk-SHA256': hashlib.sha256(body).hexdigest()}
+                    for attempt in range(RESUMABLE_CHUNK_RETRIES):
+                        try:
+                            r = requests.put(API_URL + f"uploads/resumable/{upload_id}/chunks/{index}/",
+                                             data=body, headers=headers, auth=self.auth)
+                            if r.status_code == 200:
+                                break
+                        except requests.ConnectionError:
+                            if attempt == RESUMABLE_CHUNK_RETRIES - 1:
+                                raise
+                    else:
+                        r.raise_for_status()
+
+            progress.setLabelText("Analyzing...")
+            progress.setValue(total_chunks)
+            QApplication.processEvents()
+            r = requests.post(API_URL + f"uploads/resumable/{upload_id}/finalize/", auth=self.auth,
+                              params={'fields': UPLOAD_FIELDS})
+        finally:
+            progress.close()
+        sessions.pop((fname, size), None)
+        return r
+
     def create_stat_card(self, title, value, color_hex):
         card = QWidget()
         card.setObjectName("Card")
@@ -458,7 +552,7 @@ class MainWindow(QMainWindow):
         c_health = "#10b981" if health > 70 else "#f43f5e"
         stats_box.addWidget(self.create_stat_card("HEALTH SCORE", f"{health}%", c_health))
 
-        critical_count = len(data.get('critical_items', []))
+        critical_count = data.get('critical_item_count', len(data.get('critical_items', [])))
         c_crit = "#f43f5e" if critical_count > 0 else "#94a3b8"
         stats_box.addWidget(self.create_stat_card("CRITICAL ALERTS", str(critical_count), c_crit))
 
@@ -930,7 +1024,8 @@ class MainWindow(QMainWindow):
             equipment = ""
             
         try:
-            params = {'days': days}
+            # The server downsamples the whole window to a plottable number of points
+            params = {'days': days, 'max_points': TREND_MAX_POINTS}
             if equipment: params['equipment'] = equipment
             
             r = requests.get(API_URL + "equipment-history/", auth=self.auth, params=params)
@@ -965,8 +1060,12 @@ class MainWindow(QMainWindow):
                 pressures = [p['pressure'] for p in points]
                 temps = [p['temperature'] for p in points]
                 
-                ax.plot(times, pressures, label='Pressure (bar)', color='#fb7185', linewidth=2, marker='o')
-                ax.plot(times, temps, label='Temp (°C)', color='#fbbf24', linewidth=2, marker='s')
+                # Markers only help while individual readings can be told apart
+                sparse = len(points) <= TREND_MARKER_LIMIT
+                ax.plot(times, pressures, label='Pressure (bar)', color='#fb7185',
+                        linewidth=2 if sparse else 1.2, marker='o' if sparse else None)
+                ax.plot(times, temps, label='Temp (°C)', color='#fbbf24',
+                        linewidth=2 if sparse else 1.2, marker='s' if sparse else None)
                 
                 ax.set_title(f"Trends for {equipment['equipment_name']}", color='white', pad=20)
                 ax.legend()